@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark do extrator multi-layout v41 com extratos sintéticos.
+
+Os extratos reais de clientes não podem sair da rede, então este pacote gera
+PDFs com camada de texto (PyMuPDF) em cada layout reconhecido por
+parse_one_pdf, além de arquivos OFX, e mede cada etapa da leitura.
+
+Uso (a partir da pasta dos scripts):
+    python -m benchmark.executar --paginas 1 10 100 --saida bench_v41.json
+    python -m benchmark.executar --paginas 1 10 100 --comparar bench_anterior.json
+    python -m benchmark.exportacao --linhas 400000
+    python -m benchmark.leitura_ofx --transacoes 200000
+"""
+
+import os
+import sys
+import importlib.util
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPT_V41 = "extratos_PDFmultilayout_&_ofx_consolidado_v41.py"
+MODULO_V41 = "consolidado_v41"
+
+
+def carregar_v41():
+    # o nome do script tem "&", então não dá para usar import normal
+    if MODULO_V41 in sys.modules:
+        return sys.modules[MODULO_V41]
+    spec = importlib.util.spec_from_file_location(MODULO_V41, os.path.join(RAIZ, SCRIPT_V41))
+    modulo = importlib.util.module_from_spec(spec)
+    sys.modules[MODULO_V41] = modulo
+    spec.loader.exec_module(modulo)
+    return modulo
@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+"""
+Mede extração, detecção, parse, standardize e exportação de cada layout.
+
+    python -m benchmark.executar --paginas 1 10 100 1000 2000 --ofx 1000 100000 --saida bench.json
+    python -m benchmark.executar --layouts bb_layout1 itau --paginas 500 --comparar bench_antigo.json
+
+O relatório JSON traz uma entrada por (layout, tamanho) com os tempos de
+cada etapa em segundos; --comparar imprime a razão contra um relatório anterior.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import subprocess
+from datetime import datetime
+
+import pandas as pd
+
+from benchmark import RAIZ, carregar_v41
+from benchmark import sinteticos
+
+V41 = carregar_v41()
+
+
+def versao_git():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ,
+                              capture_output=True, text=True, timeout=10).stdout.strip()
+    except Exception:
+        return ""
+
+
+def medir_arquivo(caminho, repeticoes=1):
+    """Lê o arquivo com o relógio por etapa do v41 ligado e exporta o resultado; fica a repetição mais rápida."""
+    melhor = None
+    for _ in range(repeticoes):
+        V41._CLOCK = clock = V41.StageClock()
+        inicio = time.perf_counter()
+        try:
+            layout, df = V41.parse_one_file(caminho)
+        finally:
+            V41._CLOCK = None
+        t_leitura = time.perf_counter() - inicio
+
+        df = df.copy()
+        df.insert(0, "Arquivo", os.path.basename(caminho))
+        if "Conta" not in df.columns:
+            # como em processar_pasta: só o OFX traz a conta
+            df["Conta"] = ""
+        logs = pd.DataFrame([[os.path.basename(caminho), len(df)]], columns=["Arquivo", "n_transações_obtidas"])
+        saida = caminho + ".xlsx"
+        inicio = time.perf_counter()
+        V41.export_xlsx(saida, df, logs)
+        t_export = time.perf_counter() - inicio
+        os.remove(saida)
+
+        r = {
+            "layout_detectado": layout,
+            "transacoes": int(len(df)),
+            "paginas": clock.pages,
+            "tempos_s": {k: round(v, 5) for k, v in clock.totals.items()},
+            "exportacao_s": round(t_export, 5),
+            "leitura_s": round(t_leitura, 5),
+        }
+        r["total_s"] = round(t_leitura + t_export, 5)
+        r["transacoes_por_s"] = round(r["transacoes"] / t_leitura, 1) if t_leitura > 0 else None
+        if melhor is None or r["total_s"] < melhor["total_s"]:
+            melhor = r
+    return melhor
+
+
+def executar(layouts, paginas, ofx, pasta, repeticoes=1):
+    resultados = []
+    for layout in layouts:
+        for n_paginas in paginas:
+            caminho = os.path.join(pasta, f"{layout}_{n_paginas}p.pdf")
+            esperado = sinteticos.gerar_pdf(layout, n_paginas, caminho)
+            r = medir_arquivo(caminho, repeticoes)
+            r.update({
+                "layout": layout,
+                "tamanho": n_paginas,
+                "unidade": "paginas",
+                "transacoes_esperadas": esperado,
+                "ok": r["layout_detectado"] == sinteticos.LAYOUT_ESPERADO[layout] and r["transacoes"] == esperado,
+            })
+            resultados.append(r)
+            imprimir(r)
+            os.remove(caminho)
+
+    for n_trans in ofx:
+        for sgml in (True, False):
+            nome = "ofx_sgml" if sgml else "ofx_xml"
+            caminho = os.path.join(pasta, f"{nome}_{n_trans}.ofx")
+            sinteticos.gerar_ofx(n_trans, caminho, sgml=sgml)
+            r = medir_arquivo(caminho, repeticoes)
+            r.update({
+                "layout": nome,
+                "tamanho": n_trans,
+                "unidade": "transacoes",
+                "transacoes_esperadas": n_trans,
+                "ok": r["layout_detectado"] == "ofx" and r["transacoes"] == n_trans,
+            })
+            resultados.append(r)
+            imprimir(r)
+            os.remove(caminho)
+    return resultados
+
+
+def imprimir(r):
+    t = r["tempos_s"]
+    print(
+        f"{r['layout']:<18} {r['tamanho']:>7} {r['unidade'][:3]} | "
+        f"ext {t['extracao']:7.3f} det {t['deteccao']:6.3f} parse {t['parse']:7.3f} "
+        f"std {t['standardize']:7.3f} xlsx {r['exportacao_s']:7.3f} | "
+        f"{r['transacoes']:>7} trans {'' if r['ok'] else ' <<< DIVERGENTE'}"
+    )
+
+
+def comparar(resultados, caminho_antigo):
+    with open(caminho_antigo, encoding="utf-8") as f:
+        antigo = {(r["layout"], r["tamanho"]): r for r in json.load(f)["resultados"]}
+    print(f"\nComparação com {caminho_antigo} (tempo antigo / tempo atual; > 1 = mais rápido agora):")
+    for r in resultados:
+        a = antigo.get((r["layout"], r["tamanho"]))
+        if not a:
+            continue
+        razoes = [f"{k} {a['tempos_s'][k] / r['tempos_s'][k]:5.2f}x"
+                  for k in ("extracao", "parse", "standardize") if r["tempos_s"][k] > 0]
+        razoes.append(f"total {a['total_s'] / r['total_s']:5.2f}x")
+        print(f"  {r['layout']:<18} {r['tamanho']:>7} | " + "  ".join(razoes))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do extrator v41 com extratos sintéticos")
+    parser.add_argument("--layouts", nargs="*", default=list(sinteticos.LAYOUTS),
+                        choices=list(sinteticos.LAYOUTS), help="Layouts de PDF (padrão: todos)")
+    parser.add_argument("--paginas", nargs="*", type=int, default=[1, 10, 100],
+                        help="Tamanhos dos PDFs em páginas (padrão: 1 10 100)")
+    parser.add_argument("--ofx", nargs="*", type=int, default=[1000, 10000],
+                        help="Tamanhos dos OFX em transações (padrão: 1000 10000)")
+    parser.add_argument("--repeticoes", type=int, default=1, help="Repetições por arquivo (fica a mais rápida)")
+    parser.add_argument("--saida", help="Arquivo JSON do relatório (padrão: bench_v41_<data>.json)")
+    parser.add_argument("--comparar", help="Relatório JSON anterior para comparar")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="bench_v41_") as pasta:
+        resultados = executar(args.layouts, args.paginas, args.ofx, pasta, args.repeticoes)
+
+    relatorio = {
+        "gerado_em": datetime.now().isoformat(timespec="seconds"),
+        "script": os.path.basename(V41.__file__),
+        "git": versao_git(),
+        "python": platform.python_version(),
+        "pymupdf": getattr(V41.fitz, "VersionBind", ""),
+        "pandas": pd.__version__,
+        "plataforma": platform.platform(),
+        "resultados": resultados,
+    }
+    saida = args.saida or f"bench_v41_{datetime.now():%Y%m%d_%H%M%S}.json"
+    with open(saida, "w", encoding="utf-8") as f:
+        json.dump(relatorio, f, ensure_ascii=False, indent=2)
+    print(f"\nRelatório: {saida}")
+
+    if args.comparar:
+        comparar(resultados, args.comparar)
+
+    if not all(r["ok"] for r in resultados):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
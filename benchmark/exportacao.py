@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""
+Compara a exportação XLSX atual do v41 (XlsxExporter, em fluxo) com a
+anterior (pd.ExcelWriter + formatação célula a célula), nos dois motores.
+
+    python -m benchmark.exportacao --linhas 400000
+    python -m benchmark.exportacao --linhas 400000 --motores openpyxl
+
+Cada variante roda num processo separado, para que o pico de memória
+(RSS) medido seja só dela.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+
+import pandas as pd
+
+from benchmark import RAIZ, carregar_v41
+
+V41 = carregar_v41()
+
+VARIANTES = ("anterior", "atual")
+
+
+def export_xlsx_anterior(out_path, df_all, df_logs, engine):
+    """Cópia da exportação anterior ao XlsxExporter, mantida só para comparação."""
+    with pd.ExcelWriter(out_path, engine=engine) as writer:
+        df_all.to_excel(writer, index=False, sheet_name="Consolidado")
+        df_logs.to_excel(writer, index=False, sheet_name="Logs")
+
+        if engine == "xlsxwriter":
+            wb = writer.book
+            ws = writer.sheets["Consolidado"]
+            ws_logs = writer.sheets["Logs"]
+
+            money_fmt = wb.add_format({"num_format": "R$ #,##0.00;[Red]-R$ #,##0.00"})
+            date_fmt = wb.add_format({"num_format": "dd/mm/yyyy"})
+
+            ws.set_column("A:A", 35)
+            ws.set_column("B:B", 12, date_fmt)
+            ws.set_column("C:C", 110)
+            ws.set_column("D:D", 22)
+            ws.set_column("E:E", 16, money_fmt)
+            ws.set_column("F:F", 6)
+            ws.set_column("G:H", 16, money_fmt)
+
+            ws_logs.set_column("A:A", 35)
+            ws_logs.set_column("B:B", 20)
+            ws_logs.set_column("C:L", 14)
+        else:
+            ws = writer.sheets["Consolidado"]
+            ws_logs = writer.sheets["Logs"]
+            widths = {"A": 35, "B": 12, "C": 110, "D": 22, "E": 16, "F": 6, "G": 16, "H": 16}
+            for col, width in widths.items():
+                ws.column_dimensions[col].width = width
+            ws_logs.column_dimensions["A"].width = 35
+            ws_logs.column_dimensions["B"].width = 20
+            for col in "CDEFGHIJKL":
+                ws_logs.column_dimensions[col].width = 14
+            for row in ws.iter_rows(min_row=2):
+                row[1].number_format = 'DD/MM/YYYY'
+                for idx in (4, 6, 7):
+                    row[idx].number_format = 'R$ #,##0.00;[Red]-R$ #,##0.00'
+
+
+def consolidado_sintetico(n):
+    """Frame já padronizado, no formato que processar_pasta exporta."""
+    from benchmark.standardize import frame_sintetico
+    df = V41.standardize(frame_sintetico(int(n * 1.15)))
+    df = df.iloc[:n].reset_index(drop=True)
+    df.insert(0, "Arquivo", [f"extrato_{k // 5000:03d}.pdf" for k in range(len(df))])
+    # conta em branco, como nos PDFs
+    df["Conta"] = ""
+    return df
+
+
+def pico_memoria_mb():
+    try:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    except ImportError:
+        import psutil
+        return psutil.Process().memory_info().peak_wset / 2**20
+
+
+def medir(variante, motor, linhas):
+    """Roda uma variante neste processo e devolve tempo e memória."""
+    df = consolidado_sintetico(linhas)
+    logs = pd.DataFrame([[f"extrato_{k:03d}.pdf", 5000] for k in range(linhas // 5000 + 1)],
+                        columns=["Arquivo", "n_transações_obtidas"])
+    base_mb = pico_memoria_mb()
+    with tempfile.TemporaryDirectory() as pasta:
+        saida = os.path.join(pasta, "saida.xlsx")
+        inicio = time.perf_counter()
+        if variante == "anterior":
+            export_xlsx_anterior(saida, df, logs, motor)
+        else:
+            with V41.XlsxExporter(saida, engine=motor) as xlsx:
+                xlsx.append(df)
+                xlsx.close(logs)
+        tempo = time.perf_counter() - inicio
+        tamanho = os.path.getsize(saida)
+    pico_mb = pico_memoria_mb()
+    return {"variante": variante, "motor": motor, "linhas": len(df), "tempo_s": round(tempo, 2),
+            "pico_rss_mb": round(pico_mb, 1), "acrescimo_rss_mb": round(pico_mb - base_mb, 1),
+            "arquivo_mb": round(tamanho / 2**20, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exportação XLSX atual x anterior")
+    parser.add_argument("--linhas", type=int, default=400_000)
+    parser.add_argument("--motores", nargs="*", default=["xlsxwriter", "openpyxl"],
+                        choices=["xlsxwriter", "openpyxl"])
+    parser.add_argument("--filho", nargs=2, metavar=("VARIANTE", "MOTOR"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.filho:
+        print(json.dumps(medir(args.filho[0], args.filho[1], args.linhas)))
+        return
+
+    print(f"{args.linhas:,} linhas")
+    for motor in args.motores:
+        for variante in VARIANTES:
+            proc = subprocess.run(
+                [sys.executable, "-m", "benchmark.exportacao", "--linhas", str(args.linhas),
+                 "--filho", variante, motor],
+                cwd=RAIZ, capture_output=True, text=True,
+            )
+            if proc.returncode != 0:
+                print(f"{motor:<10} {variante:<8} falhou:\n{proc.stderr}")
+                continue
+            r = json.loads(proc.stdout.strip().splitlines()[-1])
+            print(f"{motor:<10} {variante:<8} {r['tempo_s']:8.2f} s  pico RSS {r['pico_rss_mb']:8.1f} MB"
+                  f"  (+{r['acrescimo_rss_mb']:.1f} MB na exportação)  arquivo {r['arquivo_mb']:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
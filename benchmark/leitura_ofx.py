@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""
+Compara a leitura de OFX atual do v41 (extratos_comum.leitor_ofx, uma
+passada em fluxo) com a anterior (re.findall dos blocos + um re.search
+por tag), em SGML e em XML.
+
+    python -m benchmark.leitura_ofx --transacoes 200000
+    python -m benchmark.leitura_ofx --transacoes 200000 --formatos sgml
+
+Cada variante roda num processo separado, para que o pico de memória
+(RSS) medido seja só dela. As duas têm de produzir o mesmo DataFrame.
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+
+import pandas as pd
+
+from benchmark import RAIZ, carregar_v41
+from benchmark.sinteticos import gerar_ofx
+from benchmark.exportacao import pico_memoria_mb
+
+V41 = carregar_v41()
+
+VARIANTES = ("anterior", "atual")
+
+
+def parse_ofx_anterior(ofx_path):
+    """Cópia da leitura anterior ao leitor_ofx, mantida só para comparação."""
+    texto = open(ofx_path, "r", encoding="latin1", errors="ignore").read()
+    blocos = re.findall(r"<STMTTRN>(.*?)</STMTTRN>", texto, flags=re.S | re.I)
+    rows = []
+
+    def campo(raw, tag):
+        m = re.search(rf"<{tag}>(.*?)(?:$|<)", raw, flags=re.I | re.S)
+        return V41.norm_space(m.group(1)) if m else ""
+
+    for raw in blocos:
+        data = V41.normalize_ofx_date(campo(raw, "DTPOSTED"))
+        valor_txt = campo(raw, "TRNAMT")
+        if not data or not valor_txt:
+            continue
+        descricao = campo(raw, "MEMO") or campo(raw, "NAME") or campo(raw, "TRNTYPE") or "Lançamento OFX"
+        documento = campo(raw, "CHECKNUM") or campo(raw, "REFNUM") or campo(raw, "FITID")
+        rows.append([data, descricao, documento, valor_txt])
+
+    df = pd.DataFrame(rows, columns=["Data", "Descrição", "Documento", "Valor"])
+    df["Valor"] = V41.serie_reais(V41.serie_centavos(df["Valor"], "ofx"))
+    return V41.standardize(df, doc_cleaner=lambda x: V41.norm_space(str(x))[:80])
+
+
+def medir(variante, caminho):
+    """Lê o arquivo com uma variante neste processo e devolve tempo, memória e um resumo do resultado."""
+    base_mb = pico_memoria_mb()
+    inicio = time.perf_counter()
+    df = parse_ofx_anterior(caminho) if variante == "anterior" else V41.parse_ofx_file(caminho)
+    tempo = time.perf_counter() - inicio
+    pico_mb = pico_memoria_mb()
+    return {"variante": variante, "transacoes": len(df), "tempo_s": round(tempo, 2),
+            "acrescimo_rss_mb": round(pico_mb - base_mb, 1),
+            "assinatura": int(pd.util.hash_pandas_object(df, index=False).sum())}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Leitura de OFX atual x anterior")
+    parser.add_argument("--transacoes", type=int, default=200_000)
+    parser.add_argument("--formatos", nargs="*", default=["sgml", "xml"], choices=["sgml", "xml"])
+    parser.add_argument("--filho", nargs=2, metavar=("VARIANTE", "ARQUIVO"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.filho:
+        print(json.dumps(medir(*args.filho)))
+        return
+
+    with tempfile.TemporaryDirectory() as pasta:
+        for formato in args.formatos:
+            caminho = os.path.join(pasta, f"sintetico_{formato}.ofx")
+            gerar_ofx(args.transacoes, caminho, sgml=formato == "sgml")
+            print(f"{formato}: {args.transacoes:,} transações, {os.path.getsize(caminho) / 2**20:.1f} MB")
+            assinaturas = set()
+            for variante in VARIANTES:
+                proc = subprocess.run(
+                    [sys.executable, "-m", "benchmark.leitura_ofx", "--filho", variante, caminho],
+                    cwd=RAIZ, capture_output=True, text=True,
+                )
+                if proc.returncode != 0:
+                    print(f"  {variante:<8} falhou:\n{proc.stderr}")
+                    continue
+                r = json.loads(proc.stdout.strip().splitlines()[-1])
+                assinaturas.add(r["assinatura"])
+                print(f"  {variante:<8} {r['tempo_s']:8.2f} s  +{r['acrescimo_rss_mb']:.1f} MB de pico RSS"
+                      f"  {r['transacoes']:,} transações")
+            if len(assinaturas) > 1:
+                print("  DIVERGENTE: as variantes produziram resultados diferentes")
+
+
+if __name__ == "__main__":
+    main()
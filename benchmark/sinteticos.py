@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+"""
+Geradores de extratos sintéticos (PDF com camada de texto e OFX).
+
+Cada layout é descrito por um cabeçalho e por uma função que devolve as
+linhas de uma transação (ou de um bloco de transações, no caso da Unicred)
+exatamente no formato que o parser correspondente do v41 espera.
+"""
+
+import random
+
+import fitz  # PyMuPDF
+
+
+LINHAS_POR_PAGINA = 50
+# colunas usadas quando a linha tem tabulação (layouts lidos pelas linhas visuais)
+TABULACOES = (40, 80, 330, 420, 500)
+DIAS_SEMANA = ("Segunda", "Terça", "Quarta", "Quinta", "Sexta")
+
+
+def fmt_br(centavos):
+    inteiro, cent = divmod(abs(centavos), 100)
+    return f"{inteiro:,}".replace(",", ".") + f",{cent:02d}"
+
+
+def _valor(rng):
+    return rng.randint(100, 2_500_000)
+
+
+def _dia(k):
+    return k % 28 + 1
+
+
+# ---------------- Banco do Brasil ----------------
+
+def _bb_layout1(k, rng):
+    sinal = "+" if k % 2 else "-"
+    return [f"{fmt_br(_valor(rng))} ({sinal})", f"{_dia(k):02d}/03/2024", f"PIX - RECEBIDO CLIENTE {k}", f"{1234567 + k}"]
+
+
+def _bb_layout2(k, rng):
+    return [f"{_dia(k):02d}.03.2024", "0000", f"PIX - RECEBIDO {k}", f"{1234567 + k}",
+            f"{fmt_br(_valor(rng))} {'C' if k % 2 else 'D'}"]
+
+
+def _bb_layout3(k, rng):
+    return [f"{_dia(k):02d}.03.2024", f"PAGAMENTO BOLETO {k}", f"DOC{k % 10000:04d}", "13105",
+            f"{fmt_br(_valor(rng))} {'C' if k % 2 else 'D'}"]
+
+
+def _bb_layout4(k, rng):
+    return [f"{_dia(k):02d}/03/2024", "0000 13105 PIX - ENVIADO",
+            f"{1234567 + k} {fmt_br(_valor(rng))} {'C' if k % 2 else 'D'}", f"FORNECEDOR {k} LTDA"]
+
+
+def _bb_report(k, rng):
+    return [f"{_dia(k):02d}/03/2024 FORNECEDOR {k} LTDA", "CNPJ: 00.000.000/0001-00", f"R$ {fmt_br(_valor(rng))}"]
+
+
+# ---------------- Demais bancos ----------------
+
+def _abc(k, rng):
+    credito = k % 2 == 0
+    return [f"{_dia(k):02d}/03/2024", f"{9876543 + k}", f"TED RECEBIDA {k}",
+            "Crédito" if credito else "Débito", ("" if credito else "-") + fmt_br(_valor(rng))]
+
+
+def _banrisul(k, rng):
+    return [f"{_dia(k):02d} PIX RECEBIDO {k} {12345678 + k} {fmt_br(_valor(rng))}{'' if k % 2 else '-'}"]
+
+
+def _sicredi(k, rng):
+    sinal = "" if k % 2 else "-"
+    return [f"{_dia(k):02d}/03/2024 PIX RECEBIDO {k}", f"DOC{k}",
+            f"{sinal}{fmt_br(_valor(rng))} {fmt_br(_valor(rng))}"]
+
+
+def _inter(k, rng):
+    sinal = "" if k % 2 else "-"
+    return [f"{DIAS_SEMANA[k % 5]}, {_dia(k)} de março de 2024", f"Pix enviado: Fornecedor {k}",
+            f"{sinal}R$ {fmt_br(_valor(rng))}", f"R$ {fmt_br(_valor(rng))}"]
+
+
+def _santander_layout1(k, rng):
+    return [f"{_dia(k):02d}/03\tPIX ENVIADO FORNECEDOR {k}\t{100000 + k}\t{fmt_br(_valor(rng))}{'' if k % 2 else '-'}"]
+
+
+def _santander_layout2(k, rng):
+    return [f"{DIAS_SEMANA[k % 5]}, {_dia(k)} de março de 2024", f"PIX RECEBIDO {k}",
+            "CREDITO" if k % 2 else "DEBITO", f"R$ {fmt_br(_valor(rng))}"]
+
+
+def _itau(k, rng):
+    return [f"{_dia(k):02d}/03", f"PIX RECEBIDO {k}", f"{fmt_br(_valor(rng))}{'' if k % 2 else '-'}"]
+
+
+class _Unicred:
+    """Blocos de quatro lançamentos fechados por saldo, dois deles sem C/D explícito."""
+
+    def __init__(self):
+        self.saldo = 100_000_000
+
+    def __call__(self, k, rng):
+        data = f"{_dia(k):02d}/04/2024"
+        movimentos = [
+            ("RECEB PIX", _valor(rng), 1),
+            ("INTEGR PARC CAPITAL", _valor(rng), -1),
+            (f"TARIFA {k}", _valor(rng), -1),
+            (f"MOVIMENTO {k}", _valor(rng), 1),
+        ]
+        linhas = []
+        for i, (hist, valor, sinal) in enumerate(movimentos):
+            self.saldo += sinal * valor
+            linha = f"{data} {hist} {fmt_br(valor)}"
+            if i == len(movimentos) - 1:
+                linha += f" {'-' if self.saldo < 0 else ''}{fmt_br(self.saldo)}"
+            linhas.append(linha)
+        return linhas
+
+
+def _efi(k, rng):
+    sinal = "+" if k % 2 else "-"
+    return [f"{_dia(k):02d}/03/2024", f"Pix recebido de Cliente {k}", f"{55000000 + k}", f"{sinal}{fmt_br(_valor(rng))}"]
+
+
+# layout -> (cabeçalho da primeira página, gerador das linhas de cada transação, transações por grupo)
+LAYOUTS = {
+    "bb_layout1": (["Consultas - Extrato de conta corrente", "Cliente"], _bb_layout1, 1),
+    "bb_layout2": (["SISBB - Sistema de Informações Banco do Brasil", "Extrato conta corrente",
+                    "Data contábil", "Saldo - R$"], _bb_layout2, 1),
+    "bb_layout3": (["SISBB - Sistema de Informações Banco do Brasil", "Extrato"], _bb_layout3, 1),
+    "bb_layout4": (["Consultas - Extrato de conta corrente", "Dt. balancete"], _bb_layout4, 1),
+    "bb_report": (["Consultas - Extrato de conta corrente", "Relatório de pagamentos"], _bb_report, 1),
+    "abc": (["Banco ABC Brasil", "Extrato de conta corrente"], _abc, 1),
+    "banrisul": (["Banrisul", "PERIODO: MARCO/2024", "DIA HISTORICO DOCUMENTO VALOR"], _banrisul, 1),
+    "sicredi": (["Sicredi", "Associado: EMPRESA SINTETICA LTDA", "Data", "Descrição", "Documento",
+                 "Valor (R$)", "Saldo (R$)"], _sicredi, 1),
+    "inter": (["Banco Inter", "Extrato"], _inter, 1),
+    "santander_layout1": (["Santander", "Extrato Consolidado Inteligente", "Março/2024", "Movimentação"],
+                          _santander_layout1, 1),
+    "santander_layout2": (["Santander", "Extrato"], _santander_layout2, 1),
+    "itau": (["Itaú Unibanco", "Extrato mensal 2024", "Conta Corrente | Movimentação"], _itau, 1),
+    "unicred": (["Unicred", f"Saldo Anterior {fmt_br(100_000_000)}"], None, 4),
+    "efi": (["Efí S.A. Instituição de Pagamento", "Extrato financeiro"], _efi, 1),
+}
+
+# nome que parse_one_pdf devolve para cada layout sintético
+LAYOUT_ESPERADO = {nome: nome for nome in LAYOUTS}
+LAYOUT_ESPERADO.update({"santander_layout1": "santander", "santander_layout2": "santander"})
+
+
+def linhas_layout(layout, paginas, semente=0):
+    """Linhas do extrato e número de transações esperadas para preencher `paginas` páginas."""
+    cabecalho, gerador, por_grupo = LAYOUTS[layout]
+    if gerador is None:
+        gerador = _Unicred()
+    rng = random.Random(semente)
+    linhas = list(cabecalho)
+    n = 0
+    k = 0
+    while len(linhas) < paginas * LINHAS_POR_PAGINA:
+        linhas.extend(gerador(k, rng))
+        n += por_grupo
+        k += 1
+    return linhas, n
+
+
+def escrever_pdf(linhas, caminho):
+    doc = fitz.open()
+    for inicio in range(0, len(linhas), LINHAS_POR_PAGINA):
+        page = doc.new_page()
+        y = 40
+        for linha in linhas[inicio:inicio + LINHAS_POR_PAGINA]:
+            for x, coluna in zip(TABULACOES, linha.split("\t")):
+                page.insert_text((x, y), coluna, fontsize=8)
+            y += 14
+    doc.save(caminho)
+    doc.close()
+
+
+def gerar_pdf(layout, paginas, caminho, semente=0):
+    """Gera o PDF e devolve o número de transações que o parser deve encontrar."""
+    linhas, n = linhas_layout(layout, paginas, semente)
+    escrever_pdf(linhas, caminho)
+    return n
+
+
+def gerar_ofx(n_transacoes, caminho, sgml=True, semente=0):
+    """
+    OFX de uma conta com `n_transacoes` lançamentos.
+
+    sgml=True gera tags-folha sem fechamento (<TRNAMT>-10.00), como a maioria
+    dos bancos exporta; sgml=False gera o mesmo conteúdo em XML fechado.
+    """
+    rng = random.Random(semente)
+
+    def tag(nome, valor):
+        return f"<{nome}>{valor}" if sgml else f"<{nome}>{valor}</{nome}>"
+
+    cab = (
+        "OFXHEADER:100\nDATA:OFXSGML\nVERSION:102\nSECURITY:NONE\nENCODING:USASCII\n"
+        "CHARSET:1252\nCOMPRESSION:NONE\nOLDFILEUID:NONE\nNEWFILEUID:NONE\n\n"
+    ) if sgml else '<?xml version="1.0" encoding="UTF-8"?>\n<?OFX OFXHEADER="200" VERSION="220"?>\n'
+
+    with open(caminho, "w", encoding="latin1", newline="\n") as f:
+        f.write(cab)
+        f.write("<OFX>\n<BANKMSGSRSV1>\n<STMTTRNRS>\n<STMTRS>\n" + tag("CURDEF", "BRL") + "\n")
+        f.write("<BANKACCTFROM>\n" + tag("BANKID", "001") + "\n" + tag("ACCTID", "12345-6") + "\n"
+                + tag("ACCTTYPE", "CHECKING") + "\n</BANKACCTFROM>\n")
+        f.write("<BANKTRANLIST>\n" + tag("DTSTART", "20240101") + "\n" + tag("DTEND", "20241231") + "\n")
+        for k in range(n_transacoes):
+            centavos = _valor(rng) * (1 if k % 2 else -1)
+            linhas = [
+                "<STMTTRN>",
+                tag("TRNTYPE", "CREDIT" if centavos > 0 else "DEBIT"),
+                tag("DTPOSTED", f"2024{k % 12 + 1:02d}{_dia(k):02d}120000[-3:BRT]"),
+                tag("TRNAMT", f"{centavos / 100:.2f}"),
+                tag("FITID", f"{k:010d}"),
+                tag("CHECKNUM", f"{100000 + k}"),
+                tag("MEMO", f"PIX TRANSF {k} - CLIENTE SINTETICO"),
+                "</STMTTRN>",
+            ]
+            f.write("\n".join(linhas) + "\n")
+        f.write("</BANKTRANLIST>\n<LEDGERBAL>\n" + tag("BALAMT", "0.00") + "\n" + tag("DTASOF", "20241231")
+                + "\n</LEDGERBAL>\n</STMTRS>\n</STMTTRNRS>\n</BANKMSGSRSV1>\n</OFX>\n")
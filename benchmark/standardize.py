@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""
+Compara o standardize atual do v41 com a versão anterior (lambdas por linha).
+
+    python -m benchmark.standardize --linhas 1000000
+
+Confere também que as duas versões devolvem o mesmo resultado.
+"""
+
+import re
+import time
+import random
+import argparse
+
+import pandas as pd
+
+from benchmark import carregar_v41
+
+V41 = carregar_v41()
+
+
+def standardize_anterior(df, doc_cleaner=V41.clean_document_token):
+    """Cópia da versão anterior ao filtro vetorizado, mantida só para comparação."""
+    if df is None or df.empty:
+        return pd.DataFrame(columns=["Data", "Descrição", "Documento", "Valor", "Tipo", "Débito", "Crédito"])
+
+    def is_balance_or_summary_line(s):
+        low = V41.norm_space(s).lower()
+        if not low:
+            return True
+        return any(x in low for x in V41.BALANCE_SUMMARY_TERMS)
+
+    out = df.copy()
+    out["Data"] = out["Data"].astype(str).str.strip()
+    out["Descrição"] = out["Descrição"].astype(str).map(V41.norm_space).str.strip(" -")
+    if "Documento" not in out.columns:
+        out["Documento"] = ""
+    out["Documento"] = out["Documento"].fillna("").astype(str).map(doc_cleaner)
+    out["Valor"] = pd.to_numeric(out["Valor"], errors="coerce")
+
+    out = out[out["Valor"].notna()]
+    out = out[out["Data"].str.match(r"^\d{2}/\d{2}/\d{4}$", na=False)]
+    out = out[out["Valor"] != 0]
+    out = out[~out["Descrição"].map(is_balance_or_summary_line)]
+    out = out[~out["Descrição"].str.contains(re.compile(V41.NON_TRANSACTION_PATTERN, re.IGNORECASE), na=False)]
+
+    out["Tipo"] = out["Valor"].apply(lambda x: "C" if x > 0 else "D")
+    out["Débito"] = out["Valor"].apply(lambda x: x if x < 0 else "")
+    out["Crédito"] = out["Valor"].apply(lambda x: x if x > 0 else "")
+
+    return out[["Data", "Descrição", "Documento", "Valor", "Tipo", "Débito", "Crédito"]]
+
+
+def frame_sintetico(n, semente=0):
+    """Linhas no formato que os parsers entregam, com ~10% de saldos, cabeçalhos e lixo."""
+    rng = random.Random(semente)
+    descricoes = [
+        "PIX RECEBIDO  CLIENTE\xa0{k}", " - TED ENVIADA FORNECEDOR {k} - ", "PAGAMENTO BOLETO {k}",
+        "TARIFA PACOTE SERVIÇOS", "SALDO DO DIA", "Saldo anterior", "Resumo - mês", "Lançamentos", "",
+    ]
+    pesos = [30, 25, 20, 15, 3, 2, 2, 2, 1]
+    rows = []
+    for k in range(n):
+        desc = rng.choices(descricoes, pesos)[0].format(k=k)
+        data = f"{rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/2024" if k % 97 else "sem data"
+        valor = round(rng.uniform(-50000, 50000), 2) if k % 89 else 0.0
+        doc = f"{rng.randint(10**6, 10**9)}" if k % 3 else ""
+        rows.append([data, desc, doc, valor])
+    return pd.DataFrame(rows, columns=["Data", "Descrição", "Documento", "Valor"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="standardize atual x anterior")
+    parser.add_argument("--linhas", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    df = frame_sintetico(args.linhas)
+    print(f"{len(df):,} linhas")
+
+    inicio = time.perf_counter()
+    antigo = standardize_anterior(df)
+    t_antigo = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    novo = V41.standardize(df)
+    t_novo = time.perf_counter() - inicio
+
+    iguais = antigo.reset_index(drop=True).astype(str).equals(novo.reset_index(drop=True).astype(str))
+    print(f"anterior: {t_antigo:8.2f} s")
+    print(f"atual:    {t_novo:8.2f} s  ({t_antigo / t_novo:.1f}x)")
+    print(f"mesmo resultado: {'sim' if iguais else 'NÃO'} ({len(novo):,} linhas mantidas)")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,8 @@ from tkinter import Tk, filedialog
 import fitz  # PyMuPDF
 import pandas as pd
 
+from extratos_comum.valores import centavos_br
+
 
 # ============================================================
 # Util: extrair linhas do PDF
@@ -27,8 +29,10 @@ def norm_space(s: str) -> str:
 
 def money_to_float_br(s: str) -> float:
     # aceita "R$ 1.234,56" ou "1.234,56"
-    s = s.replace("R$", "").strip()
-    return float(s.replace(".", "").replace(",", "."))
+    centavos = centavos_br(s)
+    if centavos is None:
+        raise ValueError(f"valor inválido: {s!r}")
+    return centavos / 100
 
 
 def is_numeric_token(s: str) -> bool:
@@ -4,6 +4,8 @@ from datetime import datetime
 import fitz  # PyMuPDF
 import pandas as pd
 
+from extratos_comum.valores import centavos_br
+
 from tkinter import Tk, filedialog
 
 
@@ -47,16 +49,10 @@ def money_to_float_br(token: str) -> float:
       - "73,26-"  -> -73.26
       - "1.690,37"-> 1690.37
     """
-    t = token.strip()
-    neg = False
-    if t.endswith("-"):
-        neg = True
-        t = t[:-1]
-    if t.startswith("-"):
-        neg = True
-        t = t[1:]
-    val = float(t.replace(".", "").replace(",", "."))
-    return -val if neg else val
+    centavos = centavos_br(token)
+    if centavos is None:
+        raise ValueError(f"valor inválido: {token!r}")
+    return centavos / 100
 
 
 # 1) linhas de SALDO / POSIÇÃO / TOTALIZADORES (não são transação)
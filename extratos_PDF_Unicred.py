@@ -2,8 +2,9 @@ import pandas as pd
 import re
 import os
 import pdfplumber
-import itertools
-from decimal import Decimal, ROUND_HALF_UP
+
+from extratos_comum.valores import centavos_br, serie_reais
+from extratos_comum.sinais import resolver_sinais, OK, AMBIGUO, TEMPO_ESGOTADO, LIMITE_BLOCO_S
 
 # =====================================================
 # CONFIGURAÇÃO
@@ -16,15 +17,15 @@ ARQUIVO_SAIDA = "Extrato_Unicred_Auditoria_V5.xlsx"
 CAMINHO_PDF = os.path.join(PASTA, ARQUIVO_PDF)
 CAMINHO_SAIDA = os.path.join(PASTA, ARQUIVO_SAIDA)
 
-TOLERANCIA = Decimal("0.01")
+# valores e saldos em centavos inteiros (int); conversão para reais só na exportação
+TOLERANCIA = 1
 
 # =====================================================
 # FUNÇÕES AUXILIARES
 # =====================================================
 
-def br_to_decimal(valor_str):
-    valor_str = valor_str.replace('.', '').replace(',', '.')
-    return Decimal(valor_str).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+def br_to_centavos(valor_str):
+    return centavos_br(valor_str)
 
 def extrair_valores_linha(linha):
     padrao = r'(-?\d{1,3}(?:\.\d{3})*,\d{2})'
@@ -58,7 +59,7 @@ def processar_extrato(texto):
         if "Saldo Anterior" in linha:
             valores = extrair_valores_linha(linha)
             if valores:
-                saldo_anterior = br_to_decimal(valores[-1])
+                saldo_anterior = br_to_centavos(valores[-1])
             continue
         
         if re.match(r"\d{2}/\d{2}/\d{4}", linha):
@@ -69,8 +70,8 @@ def processar_extrato(texto):
             if not valores:
                 continue
             
-            valor_mov = br_to_decimal(valores[0])
-            saldo_info = br_to_decimal(valores[1]) if len(valores) > 1 else None
+            valor_mov = br_to_centavos(valores[0])
+            saldo_info = br_to_centavos(valores[1]) if len(valores) > 1 else None
             
             historico = linha[11:]
             
@@ -82,6 +83,9 @@ def processar_extrato(texto):
             })
     
     df = pd.DataFrame(registros).reset_index(drop=True)
+    if not df.empty:
+        df["Valor"] = df["Valor"].astype("Int64")
+        df["Saldo_Informado"] = df["Saldo_Informado"].astype("Int64")
     return df, saldo_anterior
 
 # =====================================================
@@ -118,28 +122,18 @@ def resolver_bloco(bloco, saldo_anterior, saldo_final):
         elif row["Tipo"] == "D":
             saldo_base -= row["Valor"]
     
-    # Testar combinações
-    n = len(indices_livres)
+    # Sinais dos livres: subset-sum em centavos (ver extratos_comum/sinais.py)
+    valores_livres = [bloco.at[idx, "Valor"] for idx in indices_livres]
     
-    for combinacao in itertools.product(["C","D"], repeat=n):
-        
-        saldo_teste = saldo_base
-        
-        for idx, tipo in zip(indices_livres, combinacao):
-            valor = bloco.at[idx, "Valor"]
-            if tipo == "C":
-                saldo_teste += valor
-            else:
-                saldo_teste -= valor
-        
-        if abs(saldo_teste - saldo_final) <= TOLERANCIA:
-            
-            for idx, tipo in zip(indices_livres, combinacao):
-                bloco.at[idx, "Tipo"] = tipo
-            
-            return bloco, True
+    tipos, n_solucoes, status = resolver_sinais(
+        valores_livres, saldo_base, saldo_final, TOLERANCIA
+    )
     
-    return bloco, False
+    if status in (OK, AMBIGUO):
+        for idx, tipo in zip(indices_livres, tipos):
+            bloco.at[idx, "Tipo"] = tipo
+    
+    return bloco, status, n_solucoes
 
 # =====================================================
 # CLASSIFICAÇÃO POR INTERVALO
@@ -160,19 +154,30 @@ def classificar_por_intervalo(df, saldo_inicial):
             
             bloco = df.loc[inicio_bloco:i].copy()
             
-            bloco_resolvido, ok = resolver_bloco(
+            bloco_resolvido, status, n_solucoes = resolver_bloco(
                 bloco,
                 saldo_confirmado,
                 saldo_final
             )
             
-            if ok:
+            if status in (OK, AMBIGUO):
                 df.loc[inicio_bloco:i, "Tipo"] = bloco_resolvido["Tipo"]
-            else:
+            
+            if status == AMBIGUO:
+                logs.append(
+                    f"Bloco {inicio_bloco}-{i} ambíguo | "
+                    f"{n_solucoes} combinações de C/D fecham o saldo, usada a primeira"
+                )
+            elif status == TEMPO_ESGOTADO:
+                logs.append(
+                    f"Bloco {inicio_bloco}-{i} sem sinal | "
+                    f"tempo limite de {LIMITE_BLOCO_S:.0f} s esgotado"
+                )
+            elif status != OK:
                 logs.append(
                     f"Bloco {inicio_bloco}-{i} não fechou | "
-                    f"Saldo anterior: {saldo_confirmado} | "
-                    f"Saldo final: {saldo_final}"
+                    f"Saldo anterior: {saldo_confirmado / 100:.2f} | "
+                    f"Saldo final: {saldo_final / 100:.2f}"
                 )
             
             saldo_confirmado = saldo_final
@@ -234,16 +239,17 @@ print("💾 Gerando Excel...")
 colunas_monetarias = [
     "Valor",
     "Saldo_Informado",
-    "Saldo_Recalculado"
+    "Saldo_Recalculado",
+    "Diferenca_Saldo"
 ]
 
-# 🔹 Apenas garantir tipo numérico (SEM replace)
+# 🔹 Centavos -> reais só aqui, na saída
 for col in colunas_monetarias:
     if col in df.columns:
-        df[col] = pd.to_numeric(df[col], errors="coerce")
+        df[col] = serie_reais(pd.to_numeric(df[col], errors="coerce").astype("Int64"))
 
     if col in inconsistencias.columns:
-        inconsistencias[col] = pd.to_numeric(inconsistencias[col], errors="coerce")
+        inconsistencias[col] = serie_reais(pd.to_numeric(inconsistencias[col], errors="coerce").astype("Int64"))
 
 # ==========================
 # EXPORTAÇÃO
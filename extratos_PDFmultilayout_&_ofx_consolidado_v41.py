@@ -6,16 +6,66 @@ Uso:
     python extrator_multilayout_consolidado_v41.py
 ou
     python extrator_multilayout_consolidado_v41.py --pasta "C:\\caminho\\dos\\pdfs"
+    python extrator_multilayout_consolidado_v41.py --pasta "C:\\caminho\\dos\\pdfs" --workers 8
+
+Com --workers N os arquivos são processados em N processos paralelos
+(0 = todos os núcleos da máquina). A ordem do Consolidado e dos Logs é
+sempre a mesma de list_input_files. PDFs com mais de 300 páginas, quando
+lidos fora do pool, têm o texto extraído em paralelo por faixas de páginas.
+
+Os resultados de cada arquivo ficam em cache em <pasta>\\_cache_extratos
+(chave = SHA-256 do conteúdo + versão do parser do layout). Numa nova
+rodada só os arquivos novos ou alterados são lidos de novo. Use
+--sem-cache para desligar ou --cache-dir para mudar o local.
 
 Gera um XLSX com duas abas:
     - Consolidado
     - Logs
 
+Acima de 1.048.575 transações o Consolidado continua em Consolidado_2,
+Consolidado_3... Com --linhas-por-arquivo N o resultado é dividido em
+arquivos de até N transações (..._parte2.xlsx etc.; o Logs fica no último).
+
+Com --formato parquet|feather|csv o Consolidado (com a coluna layout) e o
+Logs saem nesse formato, com datas e valores tipados, em vez do XLSX;
+--particionar grava o Consolidado em pastas layout=.../ano_mes=aaaa-mm.
+
+Com --formato sqlite os lançamentos vão para <pasta>\\extratos.sqlite (ou
+--banco), que acumula as rodadas: tabelas arquivos e transacoes, com
+upsert pelo SHA-256 do arquivo. Arquivos já gravados não são lidos de novo.
+
+Em qualquer formato cada arquivo é gravado na saída assim que termina de
+ser lido; só o Logs fica na memória. Se a rodada for interrompida no meio,
+a saída é fechada com os arquivos já gravados e o Logs indica onde parou.
+Os arquivos concluídos ficam registrados em <pasta>\\_retomada_extratos;
+com --retomar a rodada seguinte reaproveita esses resultados (gerando uma
+saída nova e completa) e continua do primeiro arquivo não concluído.
+
+Com --scan nada é lido: cada arquivo é só aberto para a triagem (tipo,
+tamanho, páginas, se tem camada de texto, layout pela primeira página e
+tempo estimado pela vazão das rodadas anteriores), gravada em
+triagem_<data>.csv, com o tempo total estimado para cada nº de --workers.
+
+Com --limite-tempo SEG e/ou --limite-memoria MB cada arquivo é lido num
+processo isolado; o que passar do limite é encerrado, aparece no Logs como
+timeout ou oom e a rodada segue com os demais.
+
 Colunas do Consolidado:
-    Arquivo | Data | Descrição | Documento | Valor | Tipo | Débito | Crédito
+    Arquivo | Data | Descrição | Documento | Valor | Tipo | Débito | Crédito | Conta
+    (Conta: banco/agência/conta do extrato OFX; em branco nos PDFs)
 
 Colunas do Logs:
-    Arquivo | n_transações_obtidas
+    Arquivo | n_transações_obtidas | layout | páginas | cache |
+    t_abertura_s | t_extração_s | t_detecção_s | t_parse_s | t_standardize_s |
+    t_total_s | transações_por_s | observações
+    (a última linha, TOTAL, soma as etapas de todos os arquivos; observações
+    traz avisos do parser, como blocos da Unicred com sinal ambíguo ou
+    páginas escaneadas sem camada de texto)
+
+PDFs em que nenhuma página tem camada de texto (digitalizações sem OCR)
+são reconhecidos pela contagem de caracteres e pela área coberta por
+imagens em cada página, sem passar pelos parsers, e saem no Logs como
+sem_texto.
 """
 
 import sys
@@ -23,7 +73,19 @@ import os
 import re
 import glob
 import argparse
+import hashlib
+import json
+import pickle
+import shutil
+import time
+from contextlib import contextmanager, nullcontext
 from datetime import datetime
+from functools import partial
+from itertools import islice
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+from multiprocessing.connection import wait as wait_connections
 
 try:
     import fitz  # PyMuPDF
@@ -33,14 +95,107 @@ except Exception:
     input("Pressione ENTER para sair...")
     sys.exit()
 
+try:
+    # opcional: só relê Santander/Unicred quando as linhas visuais do PyMuPDF não dão lançamentos
+    import pdfplumber
+except Exception:
+    pdfplumber = None
+
 try:
     import pandas as pd
+    import numpy as np
 except Exception:
     print("\nERRO: biblioteca 'pandas' não está instalada.")
     print("Instale com:\n    pip install pandas\n")
     input("Pressione ENTER para sair...")
     sys.exit()
 
+try:
+    from extratos_comum.valores import centavos_br, serie_centavos, serie_reais
+    from extratos_comum.datas import serie_datas, serie_texto
+    from extratos_comum.sinais import resolver_sinais, OK as SINAIS_OK, AMBIGUO as SINAIS_AMBIGUO
+    from extratos_comum.saida import FORMATOS, SaidaColunar
+    from extratos_comum.banco import BancoTransacoes, MAPA_V41, NOME_PADRAO as DB_FILENAME
+    from extratos_comum.leitor_ofx import ler_transacoes, EXTRATO as OFX_STATEMENT
+except Exception as e:
+    if isinstance(e, ModuleNotFoundError) and (e.name or "").startswith("extratos_comum"):
+        print("\nERRO: pasta 'extratos_comum' não encontrada.")
+        print("Ela deve ficar na mesma pasta deste script.\n")
+    else:
+        # a pasta existe, mas algo dentro dela falhou (biblioteca faltando, erro no código...)
+        print(f"\nERRO ao carregar 'extratos_comum': {type(e).__name__}: {e}\n")
+    input("Pressione ENTER para sair...")
+    sys.exit()
+
+
+# ---------------- Medição de tempo por etapa ----------------
+
+STAGES = ("abertura", "extracao", "deteccao", "parse", "standardize")
+STAGE_COLUMNS = {
+    "abertura": "t_abertura_s",
+    "extracao": "t_extração_s",
+    "deteccao": "t_detecção_s",
+    "parse": "t_parse_s",
+    "standardize": "t_standardize_s",
+}
+LOG_COLUMNS = (
+    ["Arquivo", "n_transações_obtidas", "layout", "páginas", "cache"]
+    + list(STAGE_COLUMNS.values())
+    + ["t_total_s", "transações_por_s", "observações"]
+)
+
+
+class StageClock:
+    """
+    Soma o tempo de cada etapa da leitura de um arquivo.
+
+    Os tempos são exclusivos: ao entrar numa etapa aninhada (por exemplo,
+    standardize chamado de dentro do parse) a etapa de fora fica pausada.
+    """
+
+    def __init__(self):
+        self.totals = dict.fromkeys(STAGES, 0.0)
+        self.pages = None
+        self.cache_hit = False
+        # sha256 do arquivo, quando lido com o cache de resultados
+        self.digest = None
+        self.notes = []
+        self._stack = []
+        self._mark = None
+
+    @contextmanager
+    def stage(self, name):
+        now = time.perf_counter()
+        if self._stack:
+            self.totals[self._stack[-1]] += now - self._mark
+        self._stack.append(name)
+        self._mark = now
+        try:
+            yield
+        finally:
+            now = time.perf_counter()
+            self.totals[self._stack.pop()] += now - self._mark
+            self._mark = now
+
+
+# relógio do arquivo em leitura neste processo (None fora de processar_pasta)
+_CLOCK = None
+
+
+def stage(name):
+    return _CLOCK.stage(name) if _CLOCK is not None else nullcontext()
+
+
+def note_pages(n):
+    if _CLOCK is not None:
+        _CLOCK.pages = n
+
+
+def note(msg):
+    # aviso do parser que vai para a coluna observações do Logs
+    if _CLOCK is not None:
+        _CLOCK.notes.append(msg)
+
 
 MESES_PT = {
     "janeiro": 1, "fevereiro": 2, "março": 3, "marco": 3, "abril": 4, "maio": 5, "junho": 6,
@@ -57,16 +212,10 @@ def norm_space(s: str) -> str:
 
 
 def money_to_float(tok: str) -> float:
-    t = tok.replace("R$", "").strip().replace("−", "-")
-    neg = False
-    if t.endswith("-"):
-        neg = True
-        t = t[:-1]
-    if t.startswith("-"):
-        neg = True
-        t = t[1:]
-    val = float(t.replace(".", "").replace(",", "."))
-    return -val if neg else val
+    centavos = centavos_br(tok)
+    if centavos is None:
+        raise ValueError(f"valor inválido: {tok!r}")
+    return centavos / 100
 
 
 DOC_LABELS = {"documento", "doc", "nº documento", "no documento", "nr documento", "nro. documento", "nro documento"}
@@ -137,16 +286,73 @@ def extract_document_from_block_sicredi(block):
     return candidates[-1][1]
 
 
+BALANCE_SUMMARY_TERMS = [
+    "saldo anterior", "saldo do dia", "saldo final", "saldo total", "saldo disponível", "saldo disponivel",
+    "saldo bloqueado", "saldo em c/c", "saldo da conta", "saldo na data", "saldo após", "saldo apos",
+    "saldo de conta corrente", "saldo por transação", "saldo por transacao", "saldo dev", "saldo cred", "resumo", "a transportar",
+    "totalizador", "totais"
+]
+RE_BALANCE_SUMMARY = re.compile("|".join(map(re.escape, BALANCE_SUMMARY_TERMS)), re.IGNORECASE)
+
+# linhas de cabeçalho/rodapé que alguns parsers deixam passar como descrição
+NON_TRANSACTION_PATTERN = (
+    r"saldo anterior|saldo do dia|saldo final|saldo total|saldo disponível|saldo disponivel|saldo bloqueado|"
+    r"solicitado em:|fale com a gente|ouvidoria|sac:|cpf/cnpj:|instituição:|instituicao:|agência:|agencia:|"
+    r"conta:|período:|periodo:|filtros aplicados|relatório gerado em|relatorio gerado em|extrato financeiro|"
+    r"tipo de saldo|tipo de transação|tipo de transacao|a transportar|versão |versao |extrato consolidado inteligente|"
+    r"internet banking empresarial|consultas, informações|consultas, informacoes|redes sociais|resumo - |"
+    r"saldo de conta corrente em|movimentação|movimentacao|lançamentos|lancamentos$|saldo dev|saldo cred"
+)
+# filtro único do standardize: saldos/resumos + cabeçalhos, numa só passada por linha
+RE_NOT_A_TRANSACTION = re.compile(RE_BALANCE_SUMMARY.pattern + "|" + NON_TRANSACTION_PATTERN, re.IGNORECASE)
+# mesmas trocas do norm_space, para uso em colunas inteiras (caracteres literais:
+# o padrão também precisa valer no motor de regex das colunas string do pandas)
+SPECIAL_SPACES_PATTERN = "[\xa0\uf166\ue90a\uf18f]"
+# documento formado por um único dígito repetido (000000000, 1.111.111 ...)
+SAME_DIGIT_PATTERN = "|".join(rf"[./-]*(?:{d}[./-]*)+" for d in "0123456789")
+
+
+def norm_space_series(s: pd.Series) -> pd.Series:
+    return (
+        s.astype(str)
+        .str.replace(SPECIAL_SPACES_PATTERN, " ", regex=True)
+        .str.strip()
+        .str.replace(r"\s{2,}", " ", regex=True)
+    )
+
+
+def clean_document_series(s: pd.Series) -> pd.Series:
+    t = norm_space_series(s)
+    ok = (
+        t.str.fullmatch(r"[\d./-]+", na=False).to_numpy(dtype=bool)
+        & (t.str.count(r"\d") > 6).to_numpy(dtype=bool)
+        & ~t.str.fullmatch(SAME_DIGIT_PATTERN, na=False).to_numpy(dtype=bool)
+    )
+    return t.where(ok, "").astype(object)
+
+
+def clean_document_flexible_series(s: pd.Series) -> pd.Series:
+    t = norm_space_series(s)
+    ok = (
+        t.str.fullmatch(r"[\d./-]{4,}", na=False).to_numpy(dtype=bool)
+        & (t.str.count(r"\d") > 0).to_numpy(dtype=bool)
+        & ~t.str.fullmatch(SAME_DIGIT_PATTERN, na=False).to_numpy(dtype=bool)
+    )
+    return t.where(ok, "").astype(object)
+
+
+# versões em coluna dos limpadores de documento mais usados; os demais rodam linha a linha
+SERIES_DOC_CLEANERS = {
+    clean_document_token: clean_document_series,
+    clean_document_token_flexible: clean_document_flexible_series,
+}
+
+
 def is_balance_or_summary_line(s: str) -> bool:
-    low = norm_space(s).lower()
+    low = norm_space(s)
     if not low:
         return True
-    return any(x in low for x in [
-        "saldo anterior", "saldo do dia", "saldo final", "saldo total", "saldo disponível", "saldo disponivel",
-        "saldo bloqueado", "saldo em c/c", "saldo da conta", "saldo na data", "saldo após", "saldo apos",
-        "saldo de conta corrente", "saldo por transação", "saldo por transacao", "saldo dev", "saldo cred", "resumo", "a transportar",
-        "totalizador", "totais"
-    ])
+    return RE_BALANCE_SUMMARY.search(low) is not None
 
 
 def normalize_text_for_dedupe(s: str) -> str:
@@ -189,49 +395,274 @@ def extract_document_from_block(block, doc_labels=None):
 
 
 def standardize(df: pd.DataFrame, doc_cleaner=clean_document_token) -> pd.DataFrame:
+    with stage("standardize"):
+        return _standardize(df, doc_cleaner)
+
+
+def _standardize(df, doc_cleaner):
     if df is None or df.empty:
         return pd.DataFrame(columns=["Data", "Descrição", "Documento", "Valor", "Tipo", "Débito", "Crédito"])
 
-    out = df.copy()
-    out["Data"] = out["Data"].astype(str).str.strip()
-    out["Descrição"] = out["Descrição"].astype(str).map(norm_space).str.strip(" -")
-    if "Documento" not in out.columns:
-        out["Documento"] = ""
-    out["Documento"] = out["Documento"].fillna("").astype(str).map(doc_cleaner)
-    out["Valor"] = pd.to_numeric(out["Valor"], errors="coerce")
+    data = df["Data"].astype(str).str.strip()
+    desc = norm_space_series(df["Descrição"]).str.strip(" -")
+    valor = pd.to_numeric(df["Valor"], errors="coerce")
 
-    out = out[out["Valor"].notna()]
-    out = out[out["Data"].str.match(r"^\d{2}/\d{2}/\d{4}$", na=False)]
-    out = out[out["Valor"] != 0]
-    out = out[~out["Descrição"].map(is_balance_or_summary_line)]
-
-    bad = re.compile(
-        r"saldo anterior|saldo do dia|saldo final|saldo total|saldo disponível|saldo disponivel|saldo bloqueado|"
-        r"solicitado em:|fale com a gente|ouvidoria|sac:|cpf/cnpj:|instituição:|instituicao:|agência:|agencia:|"
-        r"conta:|período:|periodo:|filtros aplicados|relatório gerado em|relatorio gerado em|extrato financeiro|"
-        r"tipo de saldo|tipo de transação|tipo de transacao|a transportar|versão |versao |extrato consolidado inteligente|"
-        r"internet banking empresarial|consultas, informações|consultas, informacoes|redes sociais|resumo - |"
-        r"saldo de conta corrente em|movimentação|movimentacao|lançamentos|lancamentos$|saldo dev|saldo cred",
-        re.IGNORECASE
+    keep = (
+        valor.notna().to_numpy()
+        & (valor != 0).to_numpy()
+        & data.str.match(r"^\d{2}/\d{2}/\d{4}$", na=False).to_numpy(dtype=bool)
+        & (desc != "").to_numpy()
+        & ~desc.str.contains(RE_NOT_A_TRANSACTION, na=False).to_numpy(dtype=bool)
     )
-    out = out[~out["Descrição"].str.contains(bad, na=False)]
 
-    out["Tipo"] = out["Valor"].apply(lambda x: "C" if x > 0 else "D")
-    out["Débito"] = out["Valor"].apply(lambda x: x if x < 0 else "")
-    out["Crédito"] = out["Valor"].apply(lambda x: x if x > 0 else "")
+    valor = valor[keep]
+    if "Documento" in df.columns:
+        # só as linhas que ficaram passam pelo limpador de documento
+        doc = df["Documento"][keep].fillna("").astype(str)
+        doc = SERIES_DOC_CLEANERS[doc_cleaner](doc) if doc_cleaner in SERIES_DOC_CLEANERS else doc.map(doc_cleaner)
+    else:
+        doc = pd.Series(doc_cleaner(""), index=valor.index, dtype=object)
+
+    return pd.DataFrame({
+        "Data": data[keep],
+        "Descrição": desc[keep],
+        "Documento": doc,
+        "Valor": valor,
+        "Tipo": np.where(valor > 0, "C", "D"),
+        "Débito": valor.where(valor < 0, "").astype(object),
+        "Crédito": valor.where(valor > 0, "").astype(object),
+    })
+
+# Acima deste número de páginas o texto é extraído em paralelo, em faixas de páginas
+# distribuídas entre processos (cada um abre o PDF por conta própria).
+PARALLEL_EXTRACTION_PAGES = 300
+PARALLEL_EXTRACTION_WORKERS = min(os.cpu_count() or 1, 8)
+# arquivos em leitura/lidos à espera da gravação, por processo do pool (--workers)
+PARSE_AHEAD = 2
+
+# ligado nos processos do pool de arquivos (--workers): ali os núcleos já estão ocupados
+_IN_POOL_WORKER = False
+
+
+def _mark_pool_worker():
+    global _IN_POOL_WORKER
+    _IN_POOL_WORKER = True
+
+
+def page_text_lines(page):
+    out = []
+    for ln in (page.get_text("text") or "").splitlines():
+        ln = norm_space(ln)
+        if ln:
+            out.append(ln)
+    return out
+
+
+# Camada de texto por página: com menos de TEXT_MIN_GLYPHS caracteres e imagens
+# cobrindo ao menos IMAGE_MIN_COVERAGE da área, a página é uma digitalização
+TEXT_MIN_GLYPHS = 40
+IMAGE_MIN_COVERAGE = 0.5
+
+
+def page_text_layer(page, lines=None):
+    """"texto", "imagem" (escaneada, sem camada de texto) ou "vazia"."""
+    if lines is None:
+        lines = page_text_lines(page)
+    glyphs = sum(len(ln) - ln.count(" ") for ln in lines)
+    if glyphs >= TEXT_MIN_GLYPHS:
+        return "texto"
+    area = page.rect.width * page.rect.height
+    coberta = 0.0
+    for info in page.get_image_info():
+        r = fitz.Rect(info["bbox"]) & page.rect
+        coberta += r.width * r.height
+    if area > 0 and coberta / area >= IMAGE_MIN_COVERAGE:
+        return "imagem"
+    return "texto" if glyphs else "vazia"
+
+
+def page_ranges(indices):
+    """[0, 1, 2, 5] -> "1-3, 6" (páginas contadas a partir de 1)."""
+    faixas = []
+    for i in indices:
+        if faixas and i == faixas[-1][1] + 1:
+            faixas[-1][1] = i
+        else:
+            faixas.append([i, i])
+    return ", ".join(f"{a + 1}" if a == b else f"{a + 1}-{b + 1}" for a, b in faixas)
+
+
+def extract_page_range_lines(pdf_path, start, stop):
+    with fitz.open(pdf_path) as doc:
+        return [page_text_lines(doc[i]) for i in range(start, stop)]
+
+
+def extract_lines_parallel(pdf_path, page_count, workers=None):
+    workers = max(1, min(workers or PARALLEL_EXTRACTION_WORKERS, page_count))
+    step = -(-page_count // workers)
+    starts = list(range(0, page_count, step))
+    stops = [min(start + step, page_count) for start in starts]
+    pages = []
+    with ProcessPoolExecutor(max_workers=len(starts)) as executor:
+        # map devolve as faixas na ordem das páginas
+        for chunk in executor.map(partial(extract_page_range_lines, pdf_path), starts, stops):
+            pages.extend(chunk)
+    return pages
+
+
+class PdfDocument:
+    """
+    PDF aberto uma única vez (PyMuPDF) durante toda a leitura do arquivo.
+
+    Cada forma de extração é feita sob demanda, por página, e guardada:
+        page_lines(i)         linhas do get_text("text"), já com norm_space
+        page_blocks(i)        get_text("blocks")
+        page_spans(i)         spans do get_text("dict")
+        page_words(i)         get_text("words")
+        page_visual_lines(i)  palavras agrupadas por altura, no formato do
+                              extract_text do pdfplumber
+        page_layer(i)         "texto", "imagem" ou "vazia" (page_text_layer)
+        head_lines(n)         linhas das primeiras páginas, só até juntar n
+    """
+
+    # mesma tolerância vertical do pdfplumber ao montar linhas
+    Y_TOLERANCE = 3
+
+    def __init__(self, pdf_path):
+        self.path = pdf_path
+        with stage("abertura"):
+            self.doc = fitz.open(pdf_path)
+        self.page_count = self.doc.page_count
+        self._cache = {}
+        note_pages(self.page_count)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self.doc is not None:
+            self.doc.close()
+            self.doc = None
+
+    def _get(self, kind, i, func):
+        key = (kind, i)
+        if key not in self._cache:
+            with stage("extracao"):
+                self._cache[key] = func(self.doc[i])
+        return self._cache[key]
+
+    def page_lines(self, i):
+        return self._get("lines", i, page_text_lines)
+
+    def page_blocks(self, i):
+        return self._get("blocks", i, lambda page: page.get_text("blocks"))
+
+    def page_dict(self, i):
+        return self._get("dict", i, lambda page: page.get_text("dict"))
+
+    def page_spans(self, i):
+        spans = []
+        for block in self.page_dict(i).get("blocks", []):
+            for line in block.get("lines", []):
+                spans.extend(line.get("spans", []))
+        return spans
+
+    def page_words(self, i):
+        return self._get("words", i, lambda page: page.get_text("words"))
+
+    def page_layer(self, i):
+        # conta os caracteres pelo que o parser já extraiu (linhas ou palavras)
+        if ("lines", i) not in self._cache and ("words", i) in self._cache:
+            textos = [w[4] for w in self.page_words(i)]
+        else:
+            textos = self.page_lines(i)
+        return self._get("layer", i, lambda page: page_text_layer(page, textos))
+
+    def head_lines(self, n):
+        """Linhas das primeiras páginas, até juntar n; as demais páginas não são extraídas."""
+        out = []
+        for i in range(self.page_count):
+            if len(out) >= n:
+                break
+            out.extend(self.page_lines(i))
+        return out
+
+    def page_visual_lines(self, i):
+        def _visual(_page):
+            words = sorted(self.page_words(i), key=lambda w: (w[1], w[0]))
+            rows = []
+            last_top = None
+            for w in words:
+                if last_top is None or w[1] - last_top > self.Y_TOLERANCE:
+                    rows.append([])
+                rows[-1].append(w)
+                last_top = w[1]
+            return [" ".join(w[4] for w in sorted(row, key=lambda w: w[0])) for row in rows]
+        return self._get("visual", i, _visual)
+
+    def _extract_all_lines_parallel(self):
+        pending = [i for i in range(self.page_count) if ("lines", i) not in self._cache]
+        if len(pending) < PARALLEL_EXTRACTION_PAGES or PARALLEL_EXTRACTION_WORKERS < 2 or _IN_POOL_WORKER:
+            return
+        try:
+            with stage("extracao"):
+                pages = extract_lines_parallel(self.path, self.page_count)
+        except Exception:
+            return  # segue na extração serial
+        for i, page_lines in enumerate(pages):
+            self._cache.setdefault(("lines", i), page_lines)
+
+    @property
+    def lines(self):
+        self._extract_all_lines_parallel()
+        out = []
+        for i in range(self.page_count):
+            out.extend(self.page_lines(i))
+        return out
+
+    def visual_text(self):
+        return "".join(
+            "\n".join(self.page_visual_lines(i)) + "\n"
+            for i in range(self.page_count)
+            if self.page_visual_lines(i)
+        )
 
-    return out[["Data", "Descrição", "Documento", "Valor", "Tipo", "Débito", "Crédito"]]
 
 def extract_lines(pdf_path: str):
-    doc = fitz.open(pdf_path)
-    lines = []
-    for page in doc:
-        txt = page.get_text("text") or ""
-        for ln in txt.splitlines():
-            ln = norm_space(ln)
-            if ln:
-                lines.append(ln)
-    return lines
+    with PdfDocument(pdf_path) as doc:
+        return doc.lines
+
+
+def plumber_text(pdf_path):
+    texto = ""
+    with pdfplumber.open(pdf_path) as pdf:
+        for page in pdf.pages:
+            t = page.extract_text()
+            if t:
+                texto += t + "\n"
+    return texto
+
+
+def parse_visual_text(doc, parse_text):
+    """
+    parse_text(texto) sobre as linhas visuais do PyMuPDF. Se não sair nenhum
+    lançamento, relê com o extract_text do pdfplumber (quando instalado): em
+    PDFs reais, com glifos com kerning ou partidos, as palavras podem não se
+    alinhar do mesmo jeito que nos testes.
+    """
+    df = parse_text(doc.visual_text())
+    if not df.empty or pdfplumber is None:
+        return df
+    with stage("extracao"):
+        texto = plumber_text(doc.path)
+    df_plumber = parse_text(texto)
+    if not df_plumber.empty:
+        note("linhas visuais sem lançamentos; lido com pdfplumber")
+        return df_plumber
+    return df
 
 
 def list_input_files(folder: str):
@@ -258,37 +689,83 @@ def normalize_ofx_date(dt: str) -> str:
         return ""
 
 
+def normalize_dates(df: pd.DataFrame, formato="br", year=None) -> pd.DataFrame:
+    # coluna Data convertida de uma vez para dd/mm/aaaa (extratos_comum.datas);
+    # data inválida vira "" e a linha sai no standardize
+    df["Data"] = serie_texto(serie_datas(df["Data"], formato, ano=year))
+    return df
+
+
 def parse_ofx_file(ofx_path):
-    try:
-        texto = open(ofx_path, "r", encoding="latin1", errors="ignore").read()
-    except Exception:
-        texto = open(ofx_path, "r", encoding="utf-8", errors="ignore").read()
+    # leitura e tokenização acontecem juntas, em fluxo (extratos_comum.leitor_ofx)
+    avisos = []
+    with stage("parse"):
+        df = _parse_ofx_transactions(ler_transacoes(ofx_path, avisos=avisos))
+    # corpo fora do charset do cabeçalho: lido como cp1252, e fica registrado
+    for aviso in avisos:
+        note(aviso)
+    return df
 
-    blocos = re.findall(r"<STMTTRN>(.*?)</STMTTRN>", texto, flags=re.S | re.I)
-    rows = []
 
-    def campo(raw: str, tag: str) -> str:
-        m = re.search(rf"<{tag}>(.*?)(?:$|<)", raw, flags=re.I | re.S)
-        return norm_space(m.group(1)) if m else ""
+def ofx_account_label(extrato: dict) -> str:
+    partes = [norm_space(extrato.get(tag, "")) for tag in ("BANKID", "BRANCHID", "ACCTID")]
+    return "/".join(p for p in partes if p)
 
-    for raw in blocos:
-        data = normalize_ofx_date(campo(raw, "DTPOSTED"))
-        valor_txt = campo(raw, "TRNAMT")
-        if not data or not valor_txt:
-            continue
 
-        try:
-            valor = float(str(valor_txt).replace(",", "."))
-        except Exception:
-            continue
+def note_ofx_statements(extratos: dict, contagem: dict):
+    # OFX exportado de várias contas de uma vez: um aviso por extrato, com a
+    # conta e o saldo (LEDGERBAL) que ele informa, para conferência
+    if len(extratos) < 2:
+        return
+    for seq, extrato in extratos.items():
+        n = contagem.get(seq, 0)
+        msg = f"extrato {extrato['SEQ'] + 1} conta {ofx_account_label(extrato) or 'sem conta'}: {n} lançamento(s)"
+        saldo = norm_space(extrato.get("LEDGERBAL.BALAMT", ""))
+        if saldo:
+            data_saldo = normalize_ofx_date(norm_space(extrato.get("LEDGERBAL.DTASOF", "")))
+            msg += f", saldo {saldo}" + (f" em {data_saldo}" if data_saldo else "")
+        note(msg)
 
-        descricao = campo(raw, "MEMO") or campo(raw, "NAME") or campo(raw, "TRNTYPE") or "Lançamento OFX"
-        documento = campo(raw, "CHECKNUM") or campo(raw, "REFNUM") or campo(raw, "FITID")
 
-        rows.append([data, descricao, documento, valor])
+def _parse_ofx_transactions(transacoes):
+    rows = []
+    seqs = []
+    # SEQ do extrato -> extrato; os saldos chegam depois das transações,
+    # então só são lidos ao fim
+    extratos = {}
+
+    def campo(trn: dict, tag: str) -> str:
+        return norm_space(trn[tag]) if tag in trn else ""
+
+    for trn in transacoes:
+        dtposted = campo(trn, "DTPOSTED")
+        valor_txt = campo(trn, "TRNAMT")
+        if not dtposted or not valor_txt:
+            continue
 
-    return standardize(pd.DataFrame(rows, columns=["Data", "Descrição", "Documento", "Valor"]),
-                      doc_cleaner=lambda x: norm_space(str(x))[:80])
+        descricao = campo(trn, "MEMO") or campo(trn, "NAME") or campo(trn, "TRNTYPE") or "Lançamento OFX"
+        documento = campo(trn, "CHECKNUM") or campo(trn, "REFNUM") or campo(trn, "FITID")
+
+        rows.append([dtposted, descricao, documento, valor_txt])
+        extrato = trn[OFX_STATEMENT]
+        seqs.append(extrato["SEQ"])
+        extratos.setdefault(extrato["SEQ"], extrato)
+
+    df = normalize_dates(pd.DataFrame(rows, columns=["Data", "Descrição", "Documento", "Valor"]), "ofx")
+    # DTPOSTED sem data válida fica de fora, como antes
+    validas = (df["Data"] != "").to_numpy()
+    seqs = pd.Series(seqs, dtype="int64")
+    if not validas.all():
+        df = df[validas].reset_index(drop=True)
+        seqs = seqs[validas].reset_index(drop=True)
+    note_ofx_statements(extratos, seqs.value_counts().to_dict())
+    # TRNAMT convertido de uma vez só; valor inválido vira NaN e sai no standardize
+    df["Valor"] = serie_reais(serie_centavos(df["Valor"], "ofx"))
+    out = standardize(df, doc_cleaner=lambda x: norm_space(str(x))[:80])
+    # conta de cada lançamento, pelo extrato de onde veio (o standardize mantém o índice)
+    contas = {seq: ofx_account_label(extrato) for seq, extrato in extratos.items()}
+    out["Conta"] = seqs.loc[out.index].map(contas).to_numpy(dtype=object)
+    return out
 
 
 # ---------------- Banco do Brasil ----------------
@@ -359,7 +836,7 @@ def parse_bb_layout2(lines):
             i += 1
             continue
 
-        dt = datetime.strptime(lines[i].replace(".", "/"), "%d/%m/%Y").strftime("%d/%m/%Y")
+        dt = lines[i]
         block = []
         j = i + 1
         while j < N and not re_date.match(lines[j]):
@@ -413,7 +890,7 @@ def parse_bb_layout2(lines):
 
         i = j
 
-    return standardize(pd.DataFrame(rows, columns=["Data", "Descrição", "Documento", "Valor"]))
+    return standardize(normalize_dates(pd.DataFrame(rows, columns=["Data", "Descrição", "Documento", "Valor"])))
 
 def parse_bb_layout3(lines):
     re_date = re.compile(r"^\d{2}\.\d{2}\.\d{4}$")
@@ -427,7 +904,7 @@ def parse_bb_layout3(lines):
             i += 1
             continue
 
-        dt = datetime.strptime(lines[i].replace(".", "/"), "%d/%m/%Y").strftime("%d/%m/%Y")
+        dt = lines[i]
         j = i + 1
 
         if j < N and re.fullmatch(r"\d{1,4}", lines[j]):
@@ -470,7 +947,8 @@ def parse_bb_layout3(lines):
         rows.append([dt, hist, doc, val])
         i = j + 1
 
-    return standardize(pd.DataFrame(rows, columns=["Data", "Descrição", "Documento", "Valor"]), doc_cleaner=clean_document_token_flexible)
+    return standardize(normalize_dates(pd.DataFrame(rows, columns=["Data", "Descrição", "Documento", "Valor"])),
+                       doc_cleaner=clean_document_token_flexible)
 
 def parse_bb_layout4(lines):
     date_re = re.compile(r"^\d{2}/\d{2}/\d{4}$")
@@ -595,15 +1073,87 @@ def parse_bb_payments_report(lines):
     return standardize(pd.DataFrame(rows, columns=["Data", "Descrição", "Documento", "Valor"]))
 
 
-def parse_bb_auto(lines):
-    candidates = [
-        ("bb_layout1", parse_bb_layout1(lines)),
-        ("bb_layout2", parse_bb_layout2(lines)),
-        ("bb_layout3", parse_bb_layout3(lines)),
-        ("bb_layout4", parse_bb_layout4(lines)),
-        ("bb_report", parse_bb_payments_report(lines)),
-    ]
-    return max(candidates, key=lambda t: len(t[1]))
+BB_PARSERS = {
+    "bb_layout1": parse_bb_layout1,
+    "bb_layout2": parse_bb_layout2,
+    "bb_layout3": parse_bb_layout3,
+    "bb_layout4": parse_bb_layout4,
+    "bb_report": parse_bb_payments_report,
+}
+
+# formatos de linha que identificam cada layout do BB (mesmas regexes dos parsers)
+RE_BB_DATE_SLASH = re.compile(r"^\d{2}/\d{2}/\d{4}$")
+RE_BB_DATE_DOT = re.compile(r"^\d{2}\.\d{2}\.\d{4}$")
+RE_BB_VAL_PM = re.compile(r"^\d{1,3}(?:\.\d{3})*,\d{2}\s+\([+-]\)\s*$")
+RE_BB_AMT_CD = re.compile(r"^\d{1,3}(?:\.\d{3})*,\d{2}\s+[CD]$")
+RE_BB_VAL4 = re.compile(
+    r"^(?:[\d./-]{3,25}\s+\d{1,3}(?:\.\d{3})*,\d{2}\s+[CD](?:\s+\d{1,3}(?:\.\d{3})*,\d{2}\s+[CD])?"
+    r"|\d{1,3}(?:\.\d{3})*,\d{2}\s+[CD]\s+\d{1,3}(?:\.\d{3})*,\d{2}\s+[CD])$"
+)
+RE_BB_REPORT_ROW = re.compile(r"^\d{2}/\d{2}/\d{4}\s+\S")
+RE_BB_REPORT_VAL = re.compile(r"^R\$\s*\d{1,3}(?:\.\d{3})*,\d{2}$")
+BB_MARKERS = {
+    "bb_layout2": {"saldo - r$", "valor - r$", "agência (prefixo/dv)", "conta nº / dv", "data contábil",
+                   "data lançamento", "data da emissão", "posição", "folha"},
+    "bb_layout4": {"dt. balancete", "dt. movimento ag. origem lote histórico", "valor r$"},
+}
+BB_MIN_SCORE = 4
+BB_SAMPLE_LINES = 250
+
+
+def score_bb_layouts(sample):
+    n = dict.fromkeys(("date_slash", "date_dot", "val_pm", "amt_cd", "val4", "report_row", "report_val"), 0)
+    markers = dict.fromkeys(BB_MARKERS, 0)
+    for ln in sample:
+        if RE_BB_DATE_SLASH.match(ln):
+            n["date_slash"] += 1
+        elif RE_BB_DATE_DOT.match(ln):
+            n["date_dot"] += 1
+        elif RE_BB_VAL_PM.match(ln):
+            n["val_pm"] += 1
+        elif RE_BB_AMT_CD.match(ln):
+            n["amt_cd"] += 1
+        elif RE_BB_VAL4.match(ln):
+            n["val4"] += 1
+        elif RE_BB_REPORT_VAL.match(ln):
+            n["report_val"] += 1
+        elif RE_BB_REPORT_ROW.match(ln):
+            n["report_row"] += 1
+        low = ln.lower()
+        for layout, labels in BB_MARKERS.items():
+            if low in labels:
+                markers[layout] += 1
+
+    # cada layout pontua pelo par (data, valor) no formato dele; rótulos de cabeçalho desempatam
+    return {
+        "bb_layout1": 2 * min(n["val_pm"], n["date_slash"]),
+        "bb_layout2": 2 * min(n["amt_cd"], n["date_dot"]) + 5 * markers["bb_layout2"],
+        "bb_layout3": 2 * min(n["amt_cd"], n["date_dot"]),
+        "bb_layout4": 2 * min(n["val4"] + n["amt_cd"], n["date_slash"]) + 5 * markers["bb_layout4"],
+        "bb_report": 2 * min(n["report_val"], n["report_row"]),
+    }
+
+
+def parse_bb_auto(lines, sample=None):
+    results = {}
+
+    def run(layout):
+        if layout not in results:
+            results[layout] = BB_PARSERS[layout](lines)
+        return results[layout]
+
+    with stage("deteccao"):
+        scores = score_bb_layouts(lines[:BB_SAMPLE_LINES] if sample is None else sample)
+    best = max(scores.values())
+    if best >= BB_MIN_SCORE:
+        # só os layouts empatados no topo disputam; em geral é um só
+        tied = [layout for layout in BB_PARSERS if scores[layout] == best]
+        layout, df = max(((layout, run(layout)) for layout in tied), key=lambda t: len(t[1]))
+        if not df.empty:
+            return layout, df
+
+    # pontuação baixa ou parser escolhido sem resultado: disputa completa entre os cinco
+    return max(((layout, run(layout)) for layout in BB_PARSERS), key=lambda t: len(t[1]))
 
 
 # ---------------- ABC ----------------
@@ -878,16 +1428,12 @@ RE_SANT_DAY = re.compile(r"^(Segunda|Terça|Terca|Quarta|Quinta|Sexta|Sábado|Sa
 
 # ---------------- Santander ----------------
 
-def parse_santander_layout1_from_pdf(pdf_path):
-    import pdfplumber, re, pandas as pd
+def parse_santander_layout1(doc):
+    # layout em colunas: precisa das linhas visuais (palavras agrupadas por altura)
+    return parse_visual_text(doc, parse_santander_layout1_text)
 
-    texto = ""
-    with pdfplumber.open(pdf_path) as pdf:
-        for page in pdf.pages:
-            t = page.extract_text()
-            if t:
-                texto += t + "\n"
 
+def parse_santander_layout1_text(texto):
     linhas = [re.sub(r"\s{2,}", " ", l.strip()) for l in texto.splitlines() if l.strip()]
 
     start_idx = None
@@ -1025,14 +1571,14 @@ def parse_santander_layout2(lines):
     return standardize(pd.DataFrame(rows, columns=["Data", "Descrição", "Documento", "Valor"]))
 
 
-def parse_santander(pdf_path, lines):
+def parse_santander(doc):
     re_sant_day_local = re.compile(
         r"^(Segunda|Terça|Terca|Quarta|Quinta|Sexta|Sábado|Sabado|Domingo),\s+(\d{1,2})\s+de\s+([A-Za-zç]+)\s+de\s+(\d{4})$",
         re.I
     )
-    if any(re_sant_day_local.match(ln) for ln in lines[:200]):
-        return parse_santander_layout2(lines)
-    return parse_santander_layout1_from_pdf(pdf_path)
+    if any(re_sant_day_local.match(ln) for ln in doc.head_lines(200)[:200]):
+        return parse_santander_layout2(doc.lines)
+    return parse_santander_layout1(doc)
 
 def detect_year(lines):
     sample = " ".join(lines[:400]).lower()
@@ -1075,11 +1621,11 @@ def parse_itau(lines):
 
         # datas
         if re.fullmatch(r"\d{2}/\d{2}", ln):
-            current = datetime.strptime(f"{ln}/{year}", "%d/%m/%Y")
+            current = ln
             i += 1
             continue
         if re.fullmatch(r"\d{2}/\d{2}/\d{4}", ln):
-            current = datetime.strptime(ln, "%d/%m/%Y")
+            current = ln
             i += 1
             continue
 
@@ -1109,13 +1655,14 @@ def parse_itau(lines):
         # próxima linha deve ser valor da transação
         if i + 1 < N and re.fullmatch(r"\d{1,3}(?:\.\d{3})*,\d{2}-?", lines[i + 1]):
             val = money_to_float(lines[i + 1])
-            rows.append([current.strftime("%d/%m/%Y"), desc, "", val])
+            rows.append([current, desc, "", val])
             i += 2
             continue
 
         i += 1
 
-    return standardize(pd.DataFrame(rows, columns=["Data", "Descrição", "Documento", "Valor"]))
+    # dd/mm sem ano ganha o ano do cabeçalho, na conversão da coluna inteira
+    return standardize(normalize_dates(pd.DataFrame(rows, columns=["Data", "Descrição", "Documento", "Valor"]), year=year))
 
 def parse_efi(lines):
     date_re = re.compile(r"^\d{2}/\d{2}/\d{4}$")
@@ -1174,34 +1721,17 @@ def parse_efi(lines):
 
 # ---------------- Unicred ----------------
 
-try:
-    import pdfplumber
-except Exception:
-    pdfplumber = None
-
-def parse_unicred(pdf_path):
-    # parser fiel ao script individual, com adaptação para saída padronizada
-    if pdfplumber is None:
-        return pd.DataFrame(columns=["Data", "Descrição", "Documento", "Valor", "Tipo", "Débito", "Crédito"])
-
-    import itertools
-    from decimal import Decimal, ROUND_HALF_UP
+def parse_unicred(doc):
+    return parse_visual_text(doc, parse_unicred_text)
 
-    TOL = Decimal("0.01")
 
-    def br_to_decimal(valor_str):
-        return Decimal(valor_str.replace('.', '').replace(',', '.')).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+def parse_unicred_text(texto):
+    # parser fiel ao script individual, com adaptação para saída padronizada
+    TOL = 1  # centavos
 
     def extrair_valores_linha(linha):
         return re.findall(r'(-?\d{1,3}(?:\.\d{3})*,\d{2})', linha)
 
-    texto = ""
-    with pdfplumber.open(pdf_path) as pdf:
-        for pagina in pdf.pages:
-            t = pagina.extract_text()
-            if t:
-                texto += t + "\n"
-
     linhas = texto.splitlines()
     registros = []
     saldo_anterior = None
@@ -1210,7 +1740,7 @@ def parse_unicred(pdf_path):
         if "Saldo Anterior" in linha:
             valores = extrair_valores_linha(linha)
             if valores:
-                saldo_anterior = br_to_decimal(valores[-1])
+                saldo_anterior = centavos_br(valores[-1])
             continue
 
         if re.match(r"\d{2}/\d{2}/\d{4}", linha):
@@ -1218,8 +1748,8 @@ def parse_unicred(pdf_path):
             valores = extrair_valores_linha(linha)
             if not valores:
                 continue
-            valor_mov = br_to_decimal(valores[0])
-            saldo_info = br_to_decimal(valores[1]) if len(valores) > 1 else None
+            valor_mov = centavos_br(valores[0])
+            saldo_info = centavos_br(valores[1]) if len(valores) > 1 else None
             historico = linha[11:].strip()
             if len(valores) > 1:
                 historico = re.sub(r'\s+' + re.escape(valores[-1]) + r'\s*$', '', historico).strip()
@@ -1233,59 +1763,58 @@ def parse_unicred(pdf_path):
     df = pd.DataFrame(registros).reset_index(drop=True)
     if df.empty or saldo_anterior is None:
         return pd.DataFrame(columns=["Data", "Descrição", "Documento", "Valor", "Tipo", "Débito", "Crédito"])
+    df["Saldo_Informado"] = df["Saldo_Informado"].astype("Int64")
 
-    def resolver_bloco(bloco, saldo_ant, saldo_final):
-        bloco = bloco.copy()
-        bloco["Tipo"] = None
-        livres = []
-        for i, row in bloco.iterrows():
-            hist = row["Historico"].upper()
-            if "INTEGR PARC CAPITAL" in hist:
-                bloco.at[i, "Tipo"] = "D"
-            elif "RECEB" in hist:
-                bloco.at[i, "Tipo"] = "C"
-            else:
-                livres.append(i)
+    historicos = df["Historico"].str.upper().tolist()
+    valores = df["Valor"].tolist()
+    saldos = df["Saldo_Informado"].tolist()
+    tipos = [None] * len(df)
 
+    def resolver_bloco(inicio, fim, saldo_ant, saldo_final):
+        # sinal pelo histórico quando ele diz; o resto sai do saldo que fecha o bloco
+        bloco = [None] * (fim - inicio)
+        livres = []
         saldo_base = saldo_ant
-        for i, row in bloco.iterrows():
-            if row["Tipo"] == "C":
-                saldo_base += row["Valor"]
-            elif row["Tipo"] == "D":
-                saldo_base -= row["Valor"]
-
-        for combinacao in itertools.product(["C","D"], repeat=len(livres)):
-            saldo_teste = saldo_base
-            for idx, tipo in zip(livres, combinacao):
-                valor = bloco.at[idx, "Valor"]
-                saldo_teste = saldo_teste + valor if tipo == "C" else saldo_teste - valor
-            if abs(saldo_teste - saldo_final) <= TOL:
-                for idx, tipo in zip(livres, combinacao):
-                    bloco.at[idx, "Tipo"] = tipo
-                return bloco, True
-
-        return bloco, False
+        for k, i in enumerate(range(inicio, fim)):
+            if "INTEGR PARC CAPITAL" in historicos[i]:
+                bloco[k] = "D"
+                saldo_base -= valores[i]
+            elif "RECEB" in historicos[i]:
+                bloco[k] = "C"
+                saldo_base += valores[i]
+            else:
+                livres.append(k)
+
+        sinais, n_solucoes, status = resolver_sinais(
+            [valores[inicio + k] for k in livres], saldo_base, saldo_final, TOL
+        )
+        if status == SINAIS_AMBIGUO:
+            note(f"bloco {df.at[inicio, 'Data']} (linhas {inicio + 1}-{fim}): "
+                 f"{n_solucoes} combinações de C/D fecham o saldo, usada a primeira")
+        elif status != SINAIS_OK:
+            note(f"bloco {df.at[inicio, 'Data']} (linhas {inicio + 1}-{fim}): {status.replace('_', ' ')}")
+            return
+        for k, tipo in zip(livres, sinais):
+            bloco[k] = tipo
+        tipos[inicio:fim] = bloco
 
     saldo_confirmado = saldo_anterior
     inicio_bloco = 0
-    df["Tipo"] = None
-
-    for i in range(len(df)):
-        if pd.notna(df.loc[i, "Saldo_Informado"]):
-            saldo_final = df.loc[i, "Saldo_Informado"]
-            bloco = df.loc[inicio_bloco:i].copy()
-            bloco_resolvido, ok = resolver_bloco(bloco, saldo_confirmado, saldo_final)
-            if ok:
-                df.loc[inicio_bloco:i, "Tipo"] = bloco_resolvido["Tipo"]
+
+    for i, saldo_final in enumerate(saldos):
+        if saldo_final is not pd.NA:
+            resolver_bloco(inicio_bloco, i + 1, saldo_confirmado, saldo_final)
             saldo_confirmado = saldo_final
             inicio_bloco = i + 1
 
+    df["Tipo"] = tipos
+
     out = pd.DataFrame({
         "Data": df["Data"],
         "Descrição": df["Historico"],
         "Documento": "",
         "Valor": [
-            float(v) if t == "C" else -float(v) if t == "D" else None
+            v / 100 if t == "C" else -v / 100 if t == "D" else None
             for v, t in zip(df["Valor"], df["Tipo"])
         ]
     })
@@ -1295,45 +1824,88 @@ def parse_unicred(pdf_path):
 
 # ---------------- Dispatcher ----------------
 
+# linhas do início do documento usadas na detecção do banco
+DETECTION_LINES = 250
+
+
 def parse_one_pdf(pdf_path):
-    lines = extract_lines(pdf_path)
-    if not lines:
-        return "", pd.DataFrame()
+    with PdfDocument(pdf_path) as doc:
+        return parse_pdf_document(doc)
 
-    txt = " ".join(lines[:250]).lower()
-    name = os.path.basename(pdf_path).lower()
 
+def detect_layout(txt, name):
+    """Banco pelo texto das primeiras linhas (minúsculo) e pelo nome do arquivo; "" = não reconhecido."""
     if ("consultas - extrato de conta corrente" in txt) or ("sisbb" in txt) or name.startswith("bb_layout"):
-        layout, df = parse_bb_auto(lines)
-        return layout, df
-
+        return "bb"
     if "banco abc" in txt or name == "abc.pdf":
-        return "abc", parse_abc(lines)
-
+        return "abc"
     if "banrisul" in txt:
-        return "banrisul", parse_banrisul(lines)
-
+        return "banrisul"
     if "sicredi" in txt or "cooperativa:" in txt:
-        return "sicredi", parse_sicredi(lines)
-
+        return "sicredi"
     if "banco inter" in txt or "saldo por transação" in txt or name.startswith("inter"):
-        return "inter", parse_inter(lines)
-
+        return "inter"
     if "santander" in txt or "contamax" in txt or name.startswith("santander"):
-        return "santander", parse_santander(pdf_path, lines)
-
+        return "santander"
     if "itaú" in txt or "itau" in txt or "extrato mensal" in txt or name == "itau.pdf":
-        return "itau", parse_itau(lines)
-
+        return "itau"
     if "unicred" in txt or "instituição financeira:  136" in txt.lower() or name == "unicred.pdf":
-        return "unicred", parse_unicred(pdf_path)
-
+        return "unicred"
     if re.search(r"\bef[ií]\b", txt) or "extrato financeiro" in txt or name == "efi_bank.pdf":
-        return "efi", parse_efi(lines)
+        return "efi"
+    return ""
+
+
+# parsers que trabalham sobre as linhas de texto e os que precisam do documento
+LINE_PARSERS = {
+    "abc": parse_abc,
+    "banrisul": parse_banrisul,
+    "sicredi": parse_sicredi,
+    "inter": parse_inter,
+    "itau": parse_itau,
+    "efi": parse_efi,
+}
+DOC_PARSERS = {
+    "santander": parse_santander,
+    "unicred": parse_unicred,
+}
+
+
+def parse_pdf_document(doc):
+    # a detecção só extrai as primeiras páginas; o resto fica para o parser,
+    # no formato que ele usa (linhas de texto ou palavras)
+    with stage("deteccao"):
+        head = doc.head_lines(DETECTION_LINES)
+        has_text = any(doc.page_layer(i) == "texto" for i in range(doc.page_count))
+    if not has_text:
+        images = [i for i in range(doc.page_count) if doc.page_layer(i) == "imagem"]
+        if images:
+            # digitalização sem OCR: nenhum parser tem o que ler
+            note(f"sem camada de texto ({len(images)} página(s) de imagem)")
+            return "sem_texto", pd.DataFrame()
+    if not head:
+        return "", pd.DataFrame()
+
+    with stage("deteccao"):
+        layout = detect_layout(" ".join(head[:DETECTION_LINES]).lower(), os.path.basename(doc.path).lower())
+
+    layout, df = parse_pdf_layout(doc, layout)
+    images = [i for i in range(doc.page_count) if doc.page_layer(i) == "imagem"]
+    if images:
+        note(f"páginas sem camada de texto: {page_ranges(images)} de {doc.page_count}")
+    return layout, df
+
 
-    layout, df = parse_bb_auto(lines)
-    if not df.empty:
-        return layout, df
+def parse_pdf_layout(doc, layout):
+    with stage("parse"):
+        if layout in LINE_PARSERS:
+            return layout, LINE_PARSERS[layout](doc.lines)
+        if layout in DOC_PARSERS:
+            return layout, DOC_PARSERS[layout](doc)
+
+        bb_layout, df = parse_bb_auto(doc.lines, sample=doc.page_lines(0))
+    if layout == "bb" or not df.empty:
+        return bb_layout, df
 
     return "desconhecido", pd.DataFrame(columns=["Data", "Descrição", "Documento", "Valor"])
 
@@ -1345,49 +1917,537 @@ def parse_one_file(file_path):
     return parse_one_pdf(file_path)
 
 
+# ---------------- Cache de resultados ----------------
+
+# Ao alterar um parser, incremente a versão do layout correspondente:
+# só as entradas de cache daquele layout deixam de valer.
+STANDARDIZE_VERSION = 2
+PARSER_VERSIONS = {
+    "ofx": 4,
+    "bb_layout1": 1,
+    "bb_layout2": 1,
+    "bb_layout3": 1,
+    "bb_layout4": 1,
+    "bb_report": 1,
+    "abc": 1,
+    "banrisul": 1,
+    "sicredi": 1,
+    "inter": 1,
+    "santander": 3,
+    "itau": 1,
+    "unicred": 5,
+    "efi": 1,
+}
+BB_LAYOUTS = ("bb_layout1", "bb_layout2", "bb_layout3", "bb_layout4", "bb_report")
+CACHE_DIRNAME = "_cache_extratos"
+
+
+def parser_version(layout):
+    if layout.startswith("bb_") or layout in {"", "desconhecido"}:
+        # o vencedor do parse_bb_auto (e o fallback final) depende dos cinco parsers do BB
+        versoes = [str(PARSER_VERSIONS[k]) for k in BB_LAYOUTS]
+    else:
+        versoes = [str(PARSER_VERSIONS.get(layout, 0))]
+    return f"{STANDARDIZE_VERSION}:" + ".".join(versoes)
+
+
+def file_sha256(file_path):
+    h = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for bloco in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(bloco)
+    return h.hexdigest()
+
+
+def cache_path(cache_dir, digest):
+    return os.path.join(cache_dir, digest[:2], digest + ".pkl")
+
+
+def cache_load(cache_dir, digest):
+    try:
+        with open(cache_path(cache_dir, digest), "rb") as f:
+            entry = pickle.load(f)
+    except Exception:
+        return None
+    if entry.get("versao") != parser_version(entry.get("layout", "")):
+        return None
+    return entry
+
+
+def cache_store(cache_dir, digest, layout, df, pages=None, notes=()):
+    path = cache_path(cache_dir, digest)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        entry = {"layout": layout, "versao": parser_version(layout), "df": df, "paginas": pages,
+                 "observacoes": list(notes)}
+        with open(tmp, "wb") as f:
+            pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+    except Exception:
+        pass
+
+
+def parse_one_file_cached(file_path, cache_dir=None):
+    if not cache_dir:
+        return parse_one_file(file_path)
+
+    with stage("abertura"):
+        digest = file_sha256(file_path)
+        entry = cache_load(cache_dir, digest)
+    if _CLOCK is not None:
+        _CLOCK.digest = digest
+    if entry is not None:
+        if _CLOCK is not None:
+            _CLOCK.cache_hit = True
+        note_pages(entry.get("paginas"))
+        for msg in entry.get("observacoes", ()):
+            note(msg)
+        return entry["layout"], entry["df"]
+
+    layout, df = parse_one_file(file_path)
+    if _CLOCK is not None:
+        cache_store(cache_dir, digest, layout, df, _CLOCK.pages, _CLOCK.notes)
+    else:
+        cache_store(cache_dir, digest, layout, df)
+    return layout, df
+
+
+# ---------------- Retomada ----------------
+
+def consolidado_frame(df, nome, layout):
+    # resultado de um arquivo como vai para a saída: com Arquivo, Conta (só o
+    # OFX traz a conta do extrato) e layout
+    df.insert(0, "Arquivo", nome)
+    if "Conta" not in df.columns:
+        df["Conta"] = ""
+    df["layout"] = layout
+    return df
+
+
+CHECKPOINT_DIRNAME = "_retomada_extratos"
+
+
+class Checkpoint:
+    """
+    Registro dos arquivos já concluídos numa rodada, para --retomar.
+
+    Cada arquivo concluído (com transações ou com erro) ganha uma linha no
+    manifesto.jsonl com a linha do Logs. O resultado em si já está no cache
+    de resultados (cache_dir), e a linha guarda só o sha256 do arquivo; sem
+    cache (--sem-cache) o resultado vai num pickle, gravado antes da linha.
+    Uma linha pela metade no fim (rodada derrubada no meio da gravação), um
+    pickle perdido ou uma entrada que saiu do cache fazem o arquivo ser lido
+    de novo. A pasta é apagada quando a rodada termina.
+    """
+
+    def __init__(self, folder, cache_dir=None):
+        self.folder = folder
+        self.cache_dir = cache_dir
+        self.manifest = os.path.join(folder, "manifesto.jsonl")
+        self._file = None
+        self._seq = 0
+
+    @staticmethod
+    def _key(file_path):
+        return os.path.normcase(os.path.abspath(file_path))
+
+    @staticmethod
+    def _stat(file_path):
+        st = os.stat(file_path)
+        return st.st_size, st.st_mtime_ns
+
+    def load(self):
+        """arquivo -> (layout, df, linha do Logs) dos concluídos que não mudaram desde então."""
+        done = {}
+        try:
+            with open(self.manifest, encoding="utf-8") as f:
+                lines = f.readlines()
+        except OSError:
+            return done
+        for line in lines:
+            try:
+                entry = json.loads(line)
+                if [entry["tamanho"], entry["mtime_ns"]] != list(self._stat(entry["arquivo"])):
+                    continue
+                if "parte" in entry:
+                    with open(os.path.join(self.folder, entry["parte"]), "rb") as f:
+                        done[self._key(entry["arquivo"])] = pickle.load(f)
+                    self._seq = max(self._seq, int(entry["parte"].split(".")[0]) + 1)
+                    continue
+                df = None
+                if "sha256" in entry:
+                    cached = cache_load(self.cache_dir, entry["sha256"]) if self.cache_dir else None
+                    if cached is None:
+                        continue
+                    df = consolidado_frame(cached["df"], os.path.basename(entry["arquivo"]), entry["layout"])
+                done[self._key(entry["arquivo"])] = (entry["layout"], df, entry["log"])
+            except Exception:
+                # última linha pela metade, pickle perdido ou arquivo alterado: lê de novo
+                continue
+        return done
+
+    def start(self, resume=False):
+        if not resume:
+            shutil.rmtree(self.folder, ignore_errors=True)
+        os.makedirs(self.folder, exist_ok=True)
+        self._file = open(self.manifest, "a", encoding="utf-8")
+
+    def get(self, done, file_path):
+        return done.get(self._key(file_path))
+
+    def add(self, file_path, layout, df, log, digest=None):
+        size, mtime_ns = self._stat(file_path)
+        entry = {"arquivo": os.path.abspath(file_path), "tamanho": size, "mtime_ns": mtime_ns,
+                 "layout": layout, "log": log}
+        if df is not None:
+            if digest and self.cache_dir and os.path.exists(cache_path(self.cache_dir, digest)):
+                entry["sha256"] = digest
+            else:
+                parte = f"{self._seq:05d}.pkl"
+                self._seq += 1
+                path = os.path.join(self.folder, parte)
+                with open(path + ".tmp", "wb") as f:
+                    pickle.dump((layout, df, log), f, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(path + ".tmp", path)
+                entry["parte"] = parte
+        # flush sem fsync: contra Ctrl+C ou erro do programa basta a linha
+        # estar no sistema operacional
+        self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def remove(self):
+        self.close()
+        shutil.rmtree(self.folder, ignore_errors=True)
+
+
 # ---------------- XLSX e fluxo ----------------
 
-def export_xlsx(out_path, df_all, df_logs):
-    engine = "xlsxwriter"
+# Conta: banco/agência/conta do extrato OFX (em branco nos PDFs); vai no fim
+# para não mudar a posição das colunas de antes
+CONSOLIDADO_COLUMNS = ["Arquivo", "Data", "Descrição", "Documento", "Valor", "Tipo", "Débito", "Crédito", "Conta"]
+CONSOLIDADO_WIDTHS = [35, 12, 110, 22, 16, 6, 16, 16, 22]
+LOGS_WIDTHS = [35, 20] + [14] * 10 + [80]
+MONEY_FORMAT = "R$ #,##0.00;[Red]-R$ #,##0.00"
+DATE_FORMAT = "dd/mm/yyyy"
+# formato de cada coluna do Consolidado (aplicado uma vez na coluna, não célula a célula)
+CONSOLIDADO_FORMATS = {"Data": DATE_FORMAT, "Valor": MONEY_FORMAT, "Débito": MONEY_FORMAT, "Crédito": MONEY_FORMAT}
+EXPORT_CHUNK_ROWS = 20_000
+# linhas por aba no Excel, contando o cabeçalho
+EXCEL_MAX_ROWS = 1_048_576
+
+
+def xlsx_engine():
     try:
         __import__("xlsxwriter")
+        return "xlsxwriter"
     except Exception:
-        engine = "openpyxl"
-
-    with pd.ExcelWriter(out_path, engine=engine) as writer:
-        df_all.to_excel(writer, index=False, sheet_name="Consolidado")
-        df_logs.to_excel(writer, index=False, sheet_name="Logs")
-
-        if engine == "xlsxwriter":
-            wb = writer.book
-            ws = writer.sheets["Consolidado"]
-            ws_logs = writer.sheets["Logs"]
-
-            money_fmt = wb.add_format({"num_format": "R$ #,##0.00;[Red]-R$ #,##0.00"})
-            date_fmt = wb.add_format({"num_format": "dd/mm/yyyy"})
-
-            ws.set_column("A:A", 35)
-            ws.set_column("B:B", 12, date_fmt)
-            ws.set_column("C:C", 110)
-            ws.set_column("D:D", 22)
-            ws.set_column("E:E", 16, money_fmt)
-            ws.set_column("F:F", 6)
-            ws.set_column("G:H", 16, money_fmt)
-
-            ws_logs.set_column("A:A", 35)
-            ws_logs.set_column("B:B", 20)
+        return "openpyxl"
+
+
+def _excel_col(idx):
+    nome = ""
+    idx += 1
+    while idx:
+        idx, resto = divmod(idx - 1, 26)
+        nome = chr(65 + resto) + nome
+    return nome
+
+
+def iter_excel_rows(df):
+    # em blocos, para não criar a cópia object do frame inteiro de uma vez
+    for inicio in range(0, len(df), EXPORT_CHUNK_ROWS):
+        bloco = df.iloc[inicio:inicio + EXPORT_CHUNK_ROWS].astype(object)
+        yield from bloco.where(bloco.notna(), None).itertuples(index=False, name=None)
+
+
+class XlsxExporter:
+    """
+    Grava o XLSX em fluxo, linha a linha, sem montar a planilha na memória.
+
+    Com xlsxwriter usa constant_memory; sem ele, openpyxl em modo
+    write_only. Larguras e formatos de data/moeda ficam na coluna, então
+    não há passada extra célula a célula depois de gravar.
+
+    O Consolidado é dividido quando passa do limite de linhas do Excel:
+    Consolidado, Consolidado_2, Consolidado_3... Com max_file_rows, além
+    disso, cada arquivo recebe no máximo essa quantidade de linhas e os
+    seguintes saem como <nome>_parte2.xlsx, <nome>_parte3.xlsx... (o Logs
+    vai no último). Cada aba é gravada à medida que enche.
+
+        with XlsxExporter(out_path) as xlsx:
+            xlsx.append(df)          # quantas vezes for preciso
+            xlsx.close(df_logs)
+    """
+
+    def __init__(self, out_path, engine=None, max_sheet_rows=EXCEL_MAX_ROWS - 1, max_file_rows=None):
+        self.out_path = out_path
+        self.engine = engine or xlsx_engine()
+        self.max_sheet_rows = max_sheet_rows
+        self.max_file_rows = max_file_rows
+        self.rows = 0
+        self.parts = []
+        self.sheets = []
+        self.book = None
+        self._open_book()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        elif self.book is not None:
+            # não deixa planilhas pela metade no lugar do resultado
+            self._save()
+            for path in self.parts:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def _open_book(self):
+        if self.parts:
+            base, ext = os.path.splitext(self.out_path)
+            path = f"{base}_parte{len(self.parts) + 1}{ext}"
+        else:
+            path = self.out_path
+        if self.engine == "xlsxwriter":
+            import xlsxwriter
+            self.book = xlsxwriter.Workbook(path, {
+                "constant_memory": True,
+                # descrições de extrato são texto: sem conversão para link ou fórmula
+                "strings_to_urls": False,
+                "strings_to_formulas": False,
+            })
+            self._formats = {}
+            self._header = self.book.add_format({"bold": True, "border": 1, "align": "center", "valign": "top"})
+        else:
+            from openpyxl import Workbook
+            self.book = Workbook(write_only=True)
+            self._styled = {}
+        self.parts.append(path)
+        self.file_rows = 0
+        self._open_sheet()
+
+    def _open_sheet(self):
+        name = "Consolidado" if not self.sheets else f"Consolidado_{len(self.sheets) + 1}"
+        self.ws = self._add_sheet(name, CONSOLIDADO_COLUMNS, CONSOLIDADO_WIDTHS, CONSOLIDADO_FORMATS)
+        self.sheets.append(name)
+        self.sheet_rows = 0
+
+    def _add_sheet(self, name, columns, widths, formats=None):
+        formats = formats or {}
+        if self.engine == "xlsxwriter":
+            ws = self.book.add_worksheet(name)
+            for idx, (col, width) in enumerate(zip(columns, widths)):
+                fmt = formats.get(col)
+                if fmt and fmt not in self._formats:
+                    self._formats[fmt] = self.book.add_format({"num_format": fmt})
+                ws.set_column(idx, idx, width, self._formats.get(fmt))
+            ws.write_row(0, 0, columns, self._header)
+            return ws
+
+        from openpyxl.cell import WriteOnlyCell
+        from openpyxl.styles import Alignment, Border, Font, Side
+        ws = self.book.create_sheet(name)
+        # o Excel só usa o estilo da coluna em células novas; as gravadas levam o
+        # estilo numa célula-modelo por coluna, reaproveitada em todas as linhas
+        self._styled[name] = []
+        for idx, (col, width) in enumerate(zip(columns, widths)):
+            dim = ws.column_dimensions[_excel_col(idx)]
+            dim.width = width
+            if col in formats:
+                dim.number_format = formats[col]
+                modelo = WriteOnlyCell(ws)
+                modelo.number_format = formats[col]
+                self._styled[name].append((idx, modelo))
+        fino = Side(style="thin")
+        header = []
+        for col in columns:
+            cell = WriteOnlyCell(ws, value=col)
+            cell.font = Font(bold=True)
+            cell.border = Border(left=fino, right=fino, top=fino, bottom=fino)
+            cell.alignment = Alignment(horizontal="center", vertical="top")
+            header.append(cell)
+        ws.append(header)
+        return ws
+
+    def _write_frame(self, ws, df, first_row):
+        n = first_row
+        if self.engine == "xlsxwriter":
+            write_row = ws.write_row
+            for row in iter_excel_rows(df):
+                write_row(n, 0, row)
+                n += 1
         else:
-            ws = writer.sheets["Consolidado"]
-            ws_logs = writer.sheets["Logs"]
-            widths = {"A": 35, "B": 12, "C": 110, "D": 22, "E": 16, "F": 6, "G": 16, "H": 16}
-            for col, width in widths.items():
-                ws.column_dimensions[col].width = width
-            ws_logs.column_dimensions["A"].width = 35
-            ws_logs.column_dimensions["B"].width = 20
-            for row in ws.iter_rows(min_row=2):
-                row[1].number_format = 'DD/MM/YYYY'
-                for idx in (4, 6, 7):
-                    row[idx].number_format = 'R$ #,##0.00;[Red]-R$ #,##0.00'
+            append = ws.append
+            styled = self._styled[ws.title]
+            for row in iter_excel_rows(df):
+                if styled:
+                    row = list(row)
+                    for idx, modelo in styled:
+                        if row[idx] is not None:
+                            modelo.value = row[idx]
+                            row[idx] = modelo
+                append(row)
+                n += 1
+        return n
+
+    def _room(self):
+        room = self.max_sheet_rows - self.sheet_rows
+        if self.max_file_rows:
+            room = min(room, self.max_file_rows - self.file_rows)
+        return room
+
+    def known(self, file_path):
+        # só o banco SQLite guarda arquivos de rodadas anteriores
+        return None
+
+    def add_file(self, file_path, layout, df, metricas):
+        self.append(df)
+
+    def append(self, df):
+        # frame sem alguma coluna (ex.: sem Conta) sai com ela em branco
+        df = df.reindex(columns=CONSOLIDADO_COLUMNS, fill_value="")
+        inicio = 0
+        while inicio < len(df):
+            if self._room() <= 0:
+                if self.max_file_rows and self.file_rows >= self.max_file_rows:
+                    self._save()
+                    self._open_book()
+                else:
+                    self._open_sheet()
+            parte = df.iloc[inicio:inicio + self._room()]
+            self._write_frame(self.ws, parte, self.sheet_rows + 1)
+            self.sheet_rows += len(parte)
+            self.file_rows += len(parte)
+            self.rows += len(parte)
+            inicio += len(parte)
+
+    def _save(self):
+        if self.engine == "xlsxwriter":
+            self.book.close()
+        else:
+            self.book.save(self.parts[-1])
+        self.book = None
+
+    def close(self, df_logs=None):
+        if self.book is None:
+            return
+        if df_logs is not None:
+            ws_logs = self._add_sheet("Logs", list(df_logs.columns), LOGS_WIDTHS)
+            self._write_frame(ws_logs, df_logs, 1)
+        self._save()
+
+
+def export_xlsx(out_path, df_all, df_logs):
+    with XlsxExporter(out_path) as xlsx:
+        xlsx.append(df_all)
+        xlsx.close(df_logs)
+
+
+class ColumnarExporter:
+    """
+    Mesma interface do XlsxExporter, gravando Parquet, Feather ou CSV
+    (extratos_comum.saida). O consolidado ganha a coluna layout e, com
+    particionar, sai em pastas layout=<layout>/ano_mes=<aaaa-mm>.
+    """
+
+    def __init__(self, out_base, formato, particionar=False):
+        self.saida = SaidaColunar(
+            out_base, formato,
+            particoes=("layout", "ano_mes") if particionar else (),
+            datas=("Data",), valores=("Valor", "Débito", "Crédito"),
+            colunas=CONSOLIDADO_COLUMNS + ["layout"],
+        )
+        self.out_path = self.saida.caminho
+        self.rows = 0
+        self.parts = [self.out_path]
+        self.sheets = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+
+    def known(self, file_path):
+        return None
+
+    def add_file(self, file_path, layout, df, metricas):
+        self.append(df)
+
+    def append(self, df):
+        self.saida.escrever(df.reindex(columns=CONSOLIDADO_COLUMNS + ["layout"], fill_value=""))
+        self.rows += len(df)
+
+    def close(self, df_logs=None):
+        if self.saida is not None:
+            self.parts = self.saida.fechar(df_logs)
+            self.saida = None
+
+
+class SqliteExporter:
+    """
+    Grava no banco SQLite da pasta (extratos_comum.banco) em vez de gerar
+    um arquivo por rodada. Arquivos cujo conteúdo já está no banco, lidos
+    pela mesma versão do parser, não são lidos de novo (known).
+    """
+
+    def __init__(self, db_path):
+        self.banco = BancoTransacoes(db_path)
+        self.out_path = db_path
+        self.rows = 0
+        self.parts = [db_path]
+        self.sheets = []
+        self._digests = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _digest(self, file_path):
+        if file_path not in self._digests:
+            self._digests[file_path] = file_sha256(file_path)
+        return self._digests[file_path]
+
+    def known(self, file_path):
+        registro = self.banco.registrado(self._digest(file_path))
+        if registro is None:
+            return None
+        layout, n, versao = registro
+        if versao != parser_version(layout or ""):
+            return None
+        return layout, n
+
+    def add_file(self, file_path, layout, df, metricas):
+        self.rows += self.banco.gravar_arquivo(
+            self._digest(file_path), os.path.basename(file_path), layout, df, MAPA_V41,
+            versao=parser_version(layout), paginas=metricas.get("paginas"), metricas=metricas,
+        )
+
+    def close(self, df_logs=None):
+        # o Logs de cada arquivo já está na tabela arquivos
+        if self.banco is not None:
+            self.banco.fechar()
+            self.banco = None
+
+
+def open_exporter(out_base, formato="xlsx", particionar=False, linhas_por_arquivo=None, banco=None):
+    if formato == "xlsx":
+        return XlsxExporter(out_base + ".xlsx", max_file_rows=linhas_por_arquivo)
+    if formato == "sqlite":
+        return SqliteExporter(banco or os.path.join(os.path.dirname(out_base), DB_FILENAME))
+    return ColumnarExporter(out_base, formato, particionar)
 
 
 def escolher_pasta():
@@ -1404,50 +2464,560 @@ def escolher_pasta():
         return None
 
 
-def processar_pasta(folder):
+def parse_one_file_safe(file_path, cache_dir=None):
+    # roda dentro dos processos do pool: a exceção volta como texto para cair no Logs
+    global _CLOCK
+    _CLOCK = clock = StageClock()
+    inicio = time.perf_counter()
+    falha = None
+    try:
+        layout, df = parse_one_file_cached(file_path, cache_dir)
+        erro = None
+    except MemoryError:
+        layout, df, erro, falha = "", None, "memória esgotada (MemoryError)", "oom"
+    except Exception as e:
+        layout, df, erro = "", None, str(e)
+    finally:
+        _CLOCK = None
+
+    metricas = {k: round(v, 4) for k, v in clock.totals.items()}
+    metricas["total"] = round(time.perf_counter() - inicio, 4)
+    metricas["paginas"] = clock.pages
+    metricas["cache"] = clock.cache_hit
+    metricas["sha256"] = clock.digest
+    metricas["observacoes"] = "; ".join(clock.notes)
+    metricas["falha"] = falha or ("erro" if erro is not None else None)
+    return layout, df, erro, metricas
+
+
+def cache_label(cache):
+    # True/False do cache de resultados, ou "banco" para arquivo já gravado no SQLite
+    if isinstance(cache, str):
+        return cache
+    return "sim" if cache else "não"
+
+
+def log_row(nome, n, layout, metricas):
+    total = metricas["total"]
+    rate = round(n / total, 1) if isinstance(n, int) and total > 0 else ""
+    return (
+        [nome, n, layout or "", metricas["paginas"] or "", cache_label(metricas["cache"])]
+        + [metricas[k] for k in STAGES]
+        + [total, rate, metricas.get("observacoes", "")]
+    )
+
+
+def logs_with_summary(df_logs):
+    if df_logs.empty:
+        return df_logs
+    total = {c: round(df_logs[c].sum(), 4) for c in list(STAGE_COLUMNS.values()) + ["t_total_s"]}
+    n = int(pd.to_numeric(df_logs["n_transações_obtidas"], errors="coerce").fillna(0).sum())
+    total.update({
+        "Arquivo": "TOTAL",
+        "n_transações_obtidas": n,
+        "páginas": int(pd.to_numeric(df_logs["páginas"], errors="coerce").fillna(0).sum()),
+        "transações_por_s": round(n / total["t_total_s"], 1) if total["t_total_s"] > 0 else "",
+        "observações": "",
+    })
+    return pd.concat([df_logs, pd.DataFrame([total], columns=LOG_COLUMNS)], ignore_index=True)
+
+
+def print_stage_summary(df_logs, t_export, t_run):
+    print("\nTempo por etapa (soma dos arquivos):")
+    for col in STAGE_COLUMNS.values():
+        print(f"  {col[2:-2]:<12} {df_logs[col].sum():10.2f} s")
+    print(f"  {'exportação':<12} {t_export:10.2f} s")
+    print(f"  {'rodada':<12} {t_run:10.2f} s (relógio)")
+
+
+def iter_parse_results(arquivos, workers=1, cache_dir=None, limite_tempo=None, limite_memoria=None):
+    if limite_memoria and _rss_mb(os.getpid()) is None:
+        print("Aviso: --limite-memoria precisa da biblioteca 'psutil' (pip install psutil); "
+              "rodada segue sem limite de memória")
+        limite_memoria = None
+    if limite_tempo or limite_memoria:
+        yield from iter_isolated_results(arquivos, workers, cache_dir, limite_tempo, limite_memoria)
+        return
+
+    tarefa = partial(parse_one_file_safe, cache_dir=cache_dir)
+    if workers <= 1 or len(arquivos) <= 1:
+        for file_path in arquivos:
+            yield tarefa(file_path)
+        return
+
+    # entrega na ordem de entrada, independente de qual processo termina antes. Ao
+    # contrário de executor.map, só PARSE_AHEAD tarefas por processo ficam em voo:
+    # se um arquivo grande atrasa, os seguintes não se acumulam todos na memória
+    workers = min(workers, len(arquivos))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_mark_pool_worker) as executor:
+        pendentes = deque()
+        proximos = iter(arquivos)
+        for file_path in islice(proximos, workers * PARSE_AHEAD):
+            pendentes.append(executor.submit(tarefa, file_path))
+        while pendentes:
+            resultado = pendentes.popleft().result()
+            for file_path in islice(proximos, 1):
+                pendentes.append(executor.submit(tarefa, file_path))
+            yield resultado
+
+
+# ---------------- Isolamento por arquivo ----------------
+
+# status do Logs (coluna n_transações_obtidas) para arquivos sem resultado
+FAILURE_STATUSES = ("erro", "sem_texto", "timeout", "oom")
+# de quanto em quanto tempo o vigia confere relógio e memória dos processos
+WATCHDOG_POLL_S = 0.2
+
+
+def _rss_mb(pid):
+    try:
+        import psutil
+        return psutil.Process(pid).memory_info().rss / 2**20
+    except Exception:
+        return None
+
+
+def _isolated_worker(conn, cache_dir):
+    # processo de leitura isolado: recebe caminhos, devolve o resultado de parse_one_file_safe
+    _mark_pool_worker()
+    while True:
+        try:
+            file_path = conn.recv()
+        except EOFError:
+            break
+        if file_path is None:
+            break
+        conn.send(parse_one_file_safe(file_path, cache_dir))
+
+
+class IsolatedWorker:
+    """Um processo de leitura, substituído quando é encerrado pelo vigia."""
+
+    def __init__(self, cache_dir, limite_memoria):
+        self.conn, filho = multiprocessing.Pipe()
+        self.proc = multiprocessing.Process(target=_isolated_worker, args=(filho, cache_dir), daemon=True)
+        self.proc.start()
+        filho.close()
+        self.task = None
+        self.limite_memoria = limite_memoria
+        # memória residente do processo ao receber o primeiro arquivo e o arquivo atual
+        self.rss_inicial = self.rss_base = None
+
+    def submit(self, pos, file_path):
+        if self.limite_memoria:
+            self.rss_base = _rss_mb(self.proc.pid)
+            if self.rss_inicial is None:
+                self.rss_inicial = self.rss_base
+        self.conn.send(file_path)
+        self.task = (pos, time.perf_counter())
+
+    def growth_mb(self, desde):
+        # o processo é reaproveitado: conta só o que cresceu desde a base, não o
+        # que sobrou dos arquivos anteriores
+        rss = _rss_mb(self.proc.pid)
+        return rss - desde if rss is not None and desde is not None else 0.0
+
+    def kill(self):
+        self.proc.kill()
+        self.proc.join()
+        self.conn.close()
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.proc.join(timeout=1)
+        if self.proc.is_alive():
+            self.kill()
+
+
+def failed_result(falha, erro, elapsed):
+    metricas = dict.fromkeys(STAGES, 0.0)
+    metricas.update({"total": round(elapsed, 4), "paginas": None, "cache": False,
+                     "observacoes": erro, "falha": falha})
+    return "", None, erro, metricas
+
+
+def iter_isolated_results(arquivos, workers=1, cache_dir=None, limite_tempo=None, limite_memoria=None):
+    """
+    Lê cada arquivo num processo separado, vigiado pelo processo principal.
+
+    Um arquivo que passa de limite_tempo segundos ou de limite_memoria MB
+    (crescimento da memória residente desde que o arquivo foi enviado,
+    medido com psutil) tem o processo encerrado e volta
+    como falha "timeout" ou "oom"; um processo que morre sozinho (PyMuPDF
+    derrubado por um PDF corrompido) volta como "erro". Nos três casos o
+    processo é substituído e a rodada segue. Um processo que termina um
+    arquivo retendo mais que limite_memoria MB além do que tinha ao começar
+    também é substituído, para o próximo arquivo partir de um processo limpo.
+    A ordem de entrega é a de arquivos, como em iter_parse_results.
+    """
+    workers = max(1, min(workers, len(arquivos)))
+    pool = []
+    prontos = {}
+    proximo = entregue = 0
+    try:
+        while entregue < len(arquivos):
+            # distribui arquivos aos processos livres, sem deixar resultados se acumularem
+            for w in pool + [None] * (workers - len(pool)):
+                if proximo >= len(arquivos) or proximo >= entregue + workers * PARSE_AHEAD:
+                    break
+                if w is None:
+                    w = IsolatedWorker(cache_dir, limite_memoria)
+                    pool.append(w)
+                if w.task is None:
+                    w.submit(proximo, arquivos[proximo])
+                    proximo += 1
+
+            ocupados = [w for w in pool if w.task is not None]
+            if entregue not in prontos and ocupados:
+                wait_connections([w.conn for w in ocupados], timeout=WATCHDOG_POLL_S)
+            for w in ocupados:
+                pos, inicio = w.task
+                elapsed = time.perf_counter() - inicio
+                morto = not w.proc.is_alive()
+                if w.conn.poll():
+                    try:
+                        prontos[pos] = w.conn.recv()
+                        w.task = None
+                    except (EOFError, OSError):
+                        morto = True
+                    else:
+                        if limite_memoria and w.growth_mb(w.rss_inicial) > limite_memoria:
+                            w.stop()
+                            pool.remove(w)
+                        continue
+                if morto:
+                    w.proc.join(timeout=1)
+                    resultado = failed_result("erro", f"o processo de leitura terminou (código {w.proc.exitcode})",
+                                              elapsed)
+                elif limite_tempo and elapsed > limite_tempo:
+                    resultado = failed_result("timeout", f"leitura passou de {limite_tempo:g} s", elapsed)
+                elif limite_memoria and w.growth_mb(w.rss_base) > limite_memoria:
+                    resultado = failed_result("oom", f"leitura passou de {limite_memoria:g} MB de memória", elapsed)
+                else:
+                    continue
+                print(f"          {os.path.basename(arquivos[pos])}: {resultado[2]}; processo encerrado")
+                w.kill()
+                pool.remove(w)
+                prontos[pos] = resultado
+
+            while entregue in prontos:
+                yield prontos.pop(entregue)
+                entregue += 1
+    finally:
+        for w in pool:
+            if w.task is None:
+                w.stop()
+            else:
+                w.kill()
+
+
+# ---------------- Triagem (--scan) ----------------
+
+# vazão medida nas rodadas anteriores, por layout, guardada junto do cache
+THROUGHPUT_FILENAME = "vazao.json"
+# estimativas sem histórico (medidas no benchmark com folga para PDFs reais)
+DEFAULT_S_PER_PAGE = 0.02
+DEFAULT_S_PER_MB = 0.5
+SCAN_COLUMNS = ["Arquivo", "tipo", "tamanho_mb", "páginas", "camada_texto", "layout", "t_estimado_s"]
+
+
+def load_throughput(cache_dir):
+    try:
+        with open(os.path.join(cache_dir, THROUGHPUT_FILENAME), encoding="utf-8") as f:
+            return json.load(f)
+    except Exception:
+        return {}
+
+
+def record_throughput(cache_dir, df_logs, arquivos):
+    """Soma tempo, páginas e MB dos arquivos lidos de fato nesta rodada (sem cache) ao histórico de vazão."""
+    vazao = load_throughput(cache_dir)
+    tamanhos = {os.path.basename(f): os.path.getsize(f) / 2**20 for f in arquivos if os.path.exists(f)}
+    lidos = df_logs[df_logs["Arquivo"].isin(list(tamanhos)) & (df_logs["cache"] == "não")
+                    & ~df_logs["n_transações_obtidas"].isin(FAILURE_STATUSES)]
+    for row in lidos.itertuples(index=False):
+        soma = vazao.setdefault(row.layout or "desconhecido", {"arquivos": 0, "s": 0.0, "paginas": 0, "mb": 0.0})
+        soma["arquivos"] += 1
+        soma["s"] += float(row.t_total_s)
+        soma["paginas"] += int(row.páginas or 0)
+        soma["mb"] += tamanhos.get(row.Arquivo, 0.0)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp = os.path.join(cache_dir, f"{THROUGHPUT_FILENAME}.{os.getpid()}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(vazao, f, indent=1)
+        os.replace(tmp, os.path.join(cache_dir, THROUGHPUT_FILENAME))
+    except OSError:
+        pass
+
+
+def estimate_seconds(layout, pages, size_mb, vazao):
+    """Tempo de leitura pela vazão do layout (s/página ou s/MB); sem histórico, pela média geral."""
+    geral = {"s": 0.0, "paginas": 0, "mb": 0.0}
+    for soma in vazao.values():
+        for k in geral:
+            geral[k] += soma.get(k, 0)
+    for soma in (vazao.get(layout), geral):
+        if not soma:
+            continue
+        if pages and soma.get("paginas"):
+            return pages * soma["s"] / soma["paginas"]
+        if not pages and soma.get("mb"):
+            return size_mb * soma["s"] / soma["mb"]
+    return pages * DEFAULT_S_PER_PAGE if pages else size_mb * DEFAULT_S_PER_MB
+
+
+def scan_layout(first_page, name):
+    # mesma detecção da leitura, mas só com a primeira página
+    layout = detect_layout(" ".join(first_page[:250]).lower(), name.lower())
+    if layout not in ("", "bb"):
+        return layout
+    scores = score_bb_layouts(first_page)
+    best = max(scores.values())
+    if best >= BB_MIN_SCORE:
+        # empate: na leitura o desempate é pelo número de transações de cada parser
+        return "/".join(layout for layout in BB_PARSERS if scores[layout] == best)
+    return "bb" if layout == "bb" else "desconhecido"
+
+
+def scan_file(file_path, vazao):
+    """Perfil de um arquivo sem lê-lo: tipo, tamanho, páginas, camada de texto e layout provável."""
+    nome = os.path.basename(file_path)
+    tipo = os.path.splitext(nome)[1].lower().lstrip(".")
+    size_mb = os.path.getsize(file_path) / 2**20
+    pages = None
+    if tipo == "ofx":
+        texto, layout = "sim", "ofx"
+    else:
+        try:
+            with fitz.open(file_path) as doc:
+                pages = doc.page_count
+                # primeira, do meio e última: acha PDFs só de imagem e os escaneados pela metade
+                amostra = sorted({0, pages // 2, pages - 1}) if pages else []
+                com_texto = [page_text_layer(doc[i]) != "imagem" for i in amostra]
+                first_page = page_text_lines(doc[0]) if pages else []
+            texto = "sim" if com_texto and all(com_texto) else "parcial" if any(com_texto) else "não"
+            layout = "sem_texto" if texto == "não" else scan_layout(first_page, nome)
+        except Exception as e:
+            texto, layout = "erro", f"erro: {e}"
+    estimado = estimate_seconds(layout, pages, size_mb, vazao) if not layout.startswith("erro") else None
+    return [nome, tipo, round(size_mb, 2), pages if pages is not None else "", texto, layout,
+            round(estimado, 2) if estimado is not None else ""]
+
+
+def scan_folder(folder, cache_dir=None):
+    """
+    Triagem da pasta antes de uma rodada: nada é lido além da primeira página
+    (e de mais duas para conferir a camada de texto). Grava triagem_<data>.csv
+    na pasta e mostra o resumo por layout e o tempo estimado por nº de processos.
+    """
+    arquivos = list_input_files(folder)
+    if not arquivos:
+        raise FileNotFoundError(f"Não encontrei arquivos PDF/OFX em: {folder}")
+    vazao = load_throughput(cache_dir or os.path.join(folder, CACHE_DIRNAME))
+    if not vazao:
+        print("Sem histórico de vazão nesta pasta: tempos estimados pelos valores padrão")
+
+    inicio = time.perf_counter()
+    rows = []
+    for idx, file_path in enumerate(arquivos, start=1):
+        rows.append(scan_file(file_path, vazao))
+        nome, tipo, mb, pages, texto, layout, estimado = rows[-1]
+        print(f"[{idx}/{len(arquivos)}] {nome} | {tipo} | {mb:.2f} MB | {pages or '-'} pág. | "
+              f"texto: {texto} | {layout} | ~{estimado or 0:.1f} s")
+    df = pd.DataFrame(rows, columns=SCAN_COLUMNS)
+
+    out_path = os.path.join(folder, f"triagem_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv")
+    df.to_csv(out_path, sep=";", decimal=",", index=False, encoding="utf-8-sig")
+
+    estimados = pd.to_numeric(df["t_estimado_s"], errors="coerce").fillna(0)
+    print(f"\nTriagem de {len(df)} arquivo(s) em {time.perf_counter() - inicio:.1f} s")
+    resumo = df.assign(t=estimados, pg=pd.to_numeric(df["páginas"], errors="coerce")).groupby("layout").agg(
+        arquivos=("Arquivo", "size"), paginas=("pg", "sum"), estimado_s=("t", "sum"))
+    print(resumo.to_string())
+    sem_texto = df[df["camada_texto"].isin(["não", "parcial"])]
+    if len(sem_texto):
+        print(f"\n{len(sem_texto)} PDF(s) sem camada de texto (ou só em parte), que não têm como ser lidos sem OCR:")
+        for row in sem_texto.itertuples(index=False):
+            print(f"  {row.Arquivo} ({row.camada_texto})")
+    # o arquivo mais demorado limita o ganho de mais processos
+    total, maior = estimados.sum(), estimados.max()
+    print("\nTempo estimado de leitura (sem contar o cache):")
+    for workers in sorted({1, 2, 4, 8, os.cpu_count() or 1}):
+        print(f"  --workers {workers:<3} ~{max(total / workers, maior):8.1f} s")
+    print(f"\nTriagem gravada em: {out_path}")
+    return df, out_path
+
+
+def processar_pasta(folder, workers=1, cache_dir=None, usar_cache=True, linhas_por_arquivo=None,
+                    formato="xlsx", particionar=False, banco=None, reter=True, retomar=False,
+                    limite_tempo=None, limite_memoria=None):
+    """
+    Lê os arquivos da pasta e grava cada um na saída assim que termina de ler.
+
+    Com reter=False nada do consolidado fica na memória além do arquivo em
+    gravação (só as linhas do Logs) e df_all volta como None; o total de
+    transações está no Logs. Se a rodada for interrompida (erro inesperado,
+    Ctrl+C), a saída é fechada com o que já foi gravado e o Logs marca onde parou.
+
+    Os arquivos concluídos ficam registrados em <pasta>\\_retomada_extratos até o
+    fim da rodada. Com retomar=True eles não são lidos de novo: os resultados
+    guardados vão direto para a nova saída e a leitura segue do primeiro
+    arquivo não concluído. No formato sqlite o próprio banco faz esse papel.
+
+    Com limite_tempo (s) e/ou limite_memoria (MB), cada arquivo é lido num
+    processo isolado e encerrado se passar do limite (iter_isolated_results).
+    """
     arquivos = list_input_files(folder)
     if not arquivos:
         raise FileNotFoundError(f"Não encontrei arquivos PDF/OFX em: {folder}")
 
+    stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    out_base = os.path.join(folder, f"consolidado_lancamentos_{stamp}")
+
     dados = []
     logs = []
     total = len(arquivos)
-
-    for idx, file_path in enumerate(arquivos, start=1):
-        nome = os.path.basename(file_path)
+    inicio = time.perf_counter()
+    if workers == 0:
+        workers = os.cpu_count() or 1
+    if usar_cache:
+        cache_dir = cache_dir or os.path.join(folder, CACHE_DIRNAME)
+    else:
+        cache_dir = None
+
+    checkpoint = Checkpoint(os.path.join(folder, CHECKPOINT_DIRNAME), cache_dir) if formato != "sqlite" else None
+    feitos = {}
+    if checkpoint is not None:
+        if retomar:
+            feitos = checkpoint.load()
+            print(f"Retomando: {len(feitos)} arquivo(s) já concluído(s) na rodada anterior")
+        checkpoint.start(resume=retomar)
+
+    # cada arquivo lido já vai para a saída (e para a próxima aba/parte quando a atual enche)
+    t_export = 0.0
+    with open_exporter(out_base, formato, particionar, linhas_por_arquivo, banco) as saida:
+        registrados = {file_path: saida.known(file_path) for file_path in arquivos}
+        guardados = {file_path: checkpoint.get(feitos, file_path) for file_path in arquivos} if feitos else {}
+        pendentes = [f for f in arquivos if registrados[f] is None and guardados.get(f) is None]
+        resultados = iter_parse_results(pendentes, workers, cache_dir, limite_tempo, limite_memoria)
+        idx, nome = 0, ""
         try:
-            layout, df = parse_one_file(file_path)
-            if df.empty:
-                logs.append([nome, "erro"])
-                print(f"[{idx}/{total}] ERRO - {nome} | sem transações extraídas")
-                continue
-
-            df.insert(0, "Arquivo", nome)
-            dados.append(df)
-            logs.append([nome, int(len(df))])
-            print(f"[{idx}/{total}] OK   - {nome} | {layout} | {len(df)} transação(ões)")
-
-        except Exception as e:
-            logs.append([nome, "erro"])
-            print(f"[{idx}/{total}] ERRO - {nome} | {e}")
-
-    if dados:
+            for idx, file_path in enumerate(arquivos, start=1):
+                nome = os.path.basename(file_path)
+                if guardados.get(file_path) is not None:
+                    # concluído antes da interrupção: resultado guardado no checkpoint
+                    layout, df, log = guardados[file_path]
+                    logs.append(log)
+                    if df is None:
+                        print(f"[{idx}/{total}] RETOMADO - {nome} | {log[1]}")
+                        continue
+                    if reter:
+                        dados.append(df)
+                    print(f"[{idx}/{total}] RETOMADO - {nome} | {layout} | {len(df)} transação(ões)")
+                    t0 = time.perf_counter()
+                    saida.add_file(file_path, layout, df, {})
+                    t_export += time.perf_counter() - t0
+                    continue
+
+                if registrados[file_path] is not None:
+                    layout, n = registrados[file_path]
+                    metricas = dict.fromkeys(STAGES, 0.0)
+                    metricas.update({"total": 0.0, "paginas": None, "cache": "banco"})
+                    logs.append(log_row(nome, n, layout, metricas))
+                    print(f"[{idx}/{total}] BANCO - {nome} | {layout} | {n} transação(ões) já gravadas")
+                    continue
+
+                layout, df, erro, metricas = next(resultados)
+                if erro is not None or df.empty:
+                    falha = metricas.get("falha") or ("sem_texto" if layout == "sem_texto" else "erro")
+                    logs.append(log_row(nome, falha, layout, metricas))
+                    if checkpoint is not None:
+                        checkpoint.add(file_path, layout, None, logs[-1])
+                    if erro is None:
+                        erro = metricas["observacoes"] if falha == "sem_texto" else "sem transações extraídas"
+                    print(f"[{idx}/{total}] {falha.upper()} - {nome} | {erro}")
+                    continue
+
+                df = consolidado_frame(df, nome, layout)
+                if reter:
+                    dados.append(df)
+                logs.append(log_row(nome, int(len(df)), layout, metricas))
+                print(f"[{idx}/{total}] OK   - {nome} | {layout} | {len(df)} transação(ões)")
+                if metricas["observacoes"]:
+                    print(f"          aviso: {metricas['observacoes']}")
+
+                t0 = time.perf_counter()
+                saida.add_file(file_path, layout, df, metricas)
+                t_export += time.perf_counter() - t0
+                if checkpoint is not None:
+                    checkpoint.add(file_path, layout, df, logs[-1], metricas.get("sha256"))
+        except BaseException as e:
+            # fecha a saída com os arquivos já gravados, para não perder a rodada inteira
+            resultados.close()
+            logs.append([f"INTERROMPIDO em {idx}/{total}: {nome}", "erro", "", "", ""]
+                        + [0.0] * len(STAGES) + [0.0, "", repr(e)])
+            saida.close(logs_with_summary(pd.DataFrame(logs, columns=LOG_COLUMNS)))
+            print(f"\nRodada interrompida em {nome}; {saida.rows} transação(ões) gravadas em {saida.out_path}")
+            if checkpoint is not None:
+                checkpoint.close()
+                print("Para continuar deste ponto, rode de novo com --retomar")
+            raise
+        resultados.close()
+
+        df_logs = pd.DataFrame(logs, columns=LOG_COLUMNS)
+        t0 = time.perf_counter()
+        saida.close(logs_with_summary(df_logs))
+        t_export += time.perf_counter() - t0
+
+    if checkpoint is not None:
+        checkpoint.remove()
+    if cache_dir:
+        record_throughput(cache_dir, df_logs, pendentes)
+
+    if not reter:
+        df_all = None
+    elif dados:
         df_all = pd.concat(dados, ignore_index=True)
-        df_all = df_all[["Arquivo", "Data", "Descrição", "Documento", "Valor", "Tipo", "Débito", "Crédito"]]
+        df_all = df_all.reindex(columns=CONSOLIDADO_COLUMNS, fill_value="")
     else:
-        df_all = pd.DataFrame(columns=["Arquivo", "Data", "Descrição", "Documento", "Valor", "Tipo", "Débito", "Crédito"])
-
-    df_logs = pd.DataFrame(logs, columns=["Arquivo", "n_transações_obtidas"])
+        df_all = pd.DataFrame(columns=CONSOLIDADO_COLUMNS)
 
-    stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    out_path = os.path.join(folder, f"consolidado_lancamentos_{stamp}.xlsx")
-    export_xlsx(out_path, df_all, df_logs)
-    return df_all, df_logs, out_path
+    if len(saida.sheets) > 1:
+        print(f"\nConsolidado dividido em {len(saida.sheets)} abas ({', '.join(saida.sheets)})")
+    for extra in saida.parts[1:]:
+        print(f"Também gerado: {extra}")
+    print_stage_summary(df_logs, t_export, time.perf_counter() - inicio)
+    return df_all, df_logs, saida.out_path
 
 
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--pasta", help="Pasta com PDFs (se omitido, abre seletor)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Processos paralelos para ler os arquivos (0 = todos os núcleos; padrão 1)")
+    parser.add_argument("--cache-dir", help=f"Pasta do cache de resultados (padrão: <pasta>\\{CACHE_DIRNAME})")
+    parser.add_argument("--sem-cache", action="store_true", help="Relê todos os arquivos, sem usar o cache")
+    parser.add_argument("--linhas-por-arquivo", type=int, default=None,
+                        help="Divide o XLSX em partes com no máximo N transações cada "
+                             "(padrão: um arquivo; as abas já se dividem no limite do Excel)")
+    parser.add_argument("--formato", choices=FORMATOS, default="xlsx",
+                        help="Formato da saída (parquet/feather precisam do pyarrow; padrão xlsx)")
+    parser.add_argument("--particionar", action="store_true",
+                        help="Em parquet/feather/csv, grava em pastas por layout e ano-mês")
+    parser.add_argument("--retomar", action="store_true",
+                        help="Continua a rodada interrompida nesta pasta, sem reler os arquivos já concluídos")
+    parser.add_argument("--limite-tempo", type=float, metavar="SEG",
+                        help="Encerra a leitura de um arquivo que passar de SEG segundos (fica como timeout no Logs)")
+    parser.add_argument("--limite-memoria", type=float, metavar="MB",
+                        help="Encerra a leitura de um arquivo que passar de MB de memória (fica como oom no Logs; "
+                             "precisa do psutil)")
+    parser.add_argument("--scan", action="store_true",
+                        help="Só faz a triagem da pasta (tipo, páginas, camada de texto, layout, tempo estimado), sem ler")
+    parser.add_argument("--banco", help=f"Com --formato sqlite, caminho do banco (padrão: <pasta>\\{DB_FILENAME})")
     args = parser.parse_args()
 
     folder = args.pasta or escolher_pasta()
@@ -1455,12 +3025,25 @@ def main():
         print("Nenhuma pasta selecionada.")
         return
 
+    if args.scan:
+        try:
+            scan_folder(folder, cache_dir=args.cache_dir)
+        except Exception as e:
+            print("\nERRO GERAL:")
+            print(str(e))
+        return
+
     try:
-        df_all, df_logs, out_path = processar_pasta(folder)
+        df_all, df_logs, out_path = processar_pasta(
+            folder, workers=args.workers, cache_dir=args.cache_dir, usar_cache=not args.sem_cache,
+            linhas_por_arquivo=args.linhas_por_arquivo, formato=args.formato, particionar=args.particionar,
+            banco=args.banco, reter=False, retomar=args.retomar,
+            limite_tempo=args.limite_tempo, limite_memoria=args.limite_memoria,
+        )
         print("\nArquivo gerado:")
         print(out_path)
-        print(f"Total de transações: {len(df_all)}")
-        print(f"Arquivos com erro: {(df_logs['n_transações_obtidas'] == 'erro').sum()}")
+        print(f"Total de transações: {int(pd.to_numeric(df_logs['n_transações_obtidas'], errors='coerce').sum())}")
+        print(f"Arquivos com erro: {df_logs['n_transações_obtidas'].isin(FAILURE_STATUSES).sum()}")
     except Exception as e:
         print("\nERRO GERAL:")
         print(str(e))
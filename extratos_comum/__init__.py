@@ -0,0 +1,14 @@
+# -*- coding: utf-8 -*-
+"""
+Rotinas compartilhadas pelos scripts de extratos (PDF e OFX).
+
+    valores     valores monetários brasileiros / OFX em centavos inteiros (int64)
+    datas       datas OFX (AAAAMMDD...) e brasileiras (dd/mm/aaaa, dd.mm.aaaa, dd/mm) em lote
+    sinais      sinal C/D de lançamentos sem indicação, pelo saldo do bloco (subset-sum)
+    saida       saída colunar (Parquet/Feather/CSV) do consolidado, opcionalmente particionada
+    banco       banco SQLite acumulado das transações, com upsert pelo hash do arquivo
+    leitor_ofx  transações de um OFX (SGML ou XML) numa passada só, lendo o arquivo aos pedaços
+
+Os scripts da pasta importam daqui, por isso esta pasta precisa ficar ao
+lado deles.
+"""
@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""
+Banco SQLite local com os lançamentos de todos os extratos já lidos.
+
+Diferente da planilha (uma por rodada), o banco acumula: cada arquivo é
+identificado pelo SHA-256 do conteúdo e, numa nova rodada sobre a mesma
+pasta, só os arquivos novos ou alterados são lidos e gravados. Gravar de
+novo o mesmo arquivo substitui as transações dele (upsert pelo hash).
+
+    banco = BancoTransacoes(r"C:\\caso\\extratos.sqlite")
+    if banco.registrado(digest) is None:
+        banco.gravar_arquivo(digest, "extrato.pdf", "bb_layout1", df, MAPA_V41, versao=versao)
+    banco.fechar()
+
+Tabelas:
+    arquivos    hash, nome, layout, versao, paginas, n_transacoes,
+                t_total_s, metricas (JSON com os tempos por etapa), processado_em
+    transacoes  arquivo_hash, seq, data (aaaa-mm-dd), descricao, documento,
+                valor_centavos, tipo, fitid, conta (banco/agência/conta do
+                extrato OFX; vazia nos PDFs)
+    v_transacoes  visão com o nome do arquivo, o layout e o valor em reais
+
+Consultas por data, valor, documento e arquivo usam índices, por exemplo:
+    SELECT * FROM v_transacoes WHERE data BETWEEN '2023-01-01' AND '2023-12-31' AND valor < -10000
+"""
+
+import json
+import sqlite3
+import hashlib
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+
+# nome do banco dentro da pasta do caso (o mesmo para o v41 e os scripts de OFX)
+NOME_PADRAO = "extratos.sqlite"
+
+# coluna do banco -> coluna do DataFrame de cada script
+MAPA_V41 = {"data": "Data", "descricao": "Descrição", "documento": "Documento", "valor": "Valor", "tipo": "Tipo",
+            "conta": "Conta"}
+MAPA_OFX = {"data": "DATA", "descricao": "HISTORICO", "documento": "DOCUMENTO", "valor": "VALOR", "tipo": "TIPO",
+            "fitid": "FITID", "conta": "CONTA"}
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS arquivos (
+    hash          TEXT PRIMARY KEY,
+    nome          TEXT NOT NULL,
+    layout        TEXT,
+    versao        TEXT,
+    paginas       INTEGER,
+    n_transacoes  INTEGER NOT NULL,
+    t_total_s     REAL,
+    metricas      TEXT,
+    processado_em TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS transacoes (
+    arquivo_hash   TEXT NOT NULL REFERENCES arquivos(hash) ON DELETE CASCADE,
+    seq            INTEGER NOT NULL,
+    data           TEXT,
+    descricao      TEXT,
+    documento      TEXT,
+    valor_centavos INTEGER NOT NULL,
+    tipo           TEXT,
+    fitid          TEXT,
+    conta          TEXT,
+    PRIMARY KEY (arquivo_hash, seq)
+) WITHOUT ROWID;
+-- a chave primária já atende às buscas por arquivo
+CREATE INDEX IF NOT EXISTS ix_transacoes_data ON transacoes (data);
+CREATE INDEX IF NOT EXISTS ix_transacoes_valor ON transacoes (valor_centavos);
+CREATE INDEX IF NOT EXISTS ix_transacoes_documento ON transacoes (documento);
+CREATE INDEX IF NOT EXISTS ix_transacoes_conta ON transacoes (conta);
+CREATE INDEX IF NOT EXISTS ix_arquivos_nome ON arquivos (nome);
+CREATE VIEW IF NOT EXISTS v_transacoes AS
+    SELECT a.nome AS arquivo, a.layout, t.data, t.descricao, t.documento,
+           t.valor_centavos / 100.0 AS valor, t.tipo, t.fitid, t.conta, t.arquivo_hash, t.seq
+    FROM transacoes t JOIN arquivos a ON a.hash = t.arquivo_hash;
+"""
+
+
+def sha256_arquivo(caminho):
+    h = hashlib.sha256()
+    with open(caminho, "rb") as f:
+        for bloco in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(bloco)
+    return h.hexdigest()
+
+
+def _texto(serie):
+    return [v or None for v in serie.fillna("").astype(str).tolist()]
+
+
+def _coluna(df, mapa, chave, n):
+    # colunas opcionais (fitid, conta) podem faltar no DataFrame de algum script
+    return _texto(df[mapa[chave]]) if chave in mapa and mapa[chave] in df.columns else [None] * n
+
+
+def linhas_transacoes(digest, df, mapa, formato_data="%d/%m/%Y"):
+    """Tuplas prontas para o INSERT: datas em ISO e valores em centavos inteiros."""
+    n = len(df)
+    datas = pd.to_datetime(df[mapa["data"]], format=formato_data, errors="coerce")
+    valores = pd.to_numeric(df[mapa["valor"]], errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+    validos = ~np.isnan(valores)
+    colunas = [
+        [digest] * n,
+        range(n),
+        [d if isinstance(d, str) else None for d in datas.dt.strftime("%Y-%m-%d").tolist()],
+        _texto(df[mapa["descricao"]]) if "descricao" in mapa else [None] * n,
+        _texto(df[mapa["documento"]]) if "documento" in mapa else [None] * n,
+        np.rint(np.where(validos, valores, 0) * 100).astype("int64").tolist(),
+        _texto(df[mapa["tipo"]]) if "tipo" in mapa else [None] * n,
+        _coluna(df, mapa, "fitid", n),
+        _coluna(df, mapa, "conta", n),
+    ]
+    linhas = zip(*colunas)
+    return [linha for linha, ok in zip(linhas, validos) if ok]
+
+
+class BancoTransacoes:
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self.con = sqlite3.connect(caminho)
+        self.con.execute("PRAGMA journal_mode=WAL")
+        self.con.execute("PRAGMA synchronous=NORMAL")
+        self.con.execute("PRAGMA foreign_keys=ON")
+        self._migrar()
+        self.con.executescript(ESQUEMA)
+
+    def _migrar(self):
+        # bancos criados antes da coluna conta: acrescenta a coluna e refaz a visão
+        colunas = [linha[1] for linha in self.con.execute("PRAGMA table_info(transacoes)")]
+        if colunas and "conta" not in colunas:
+            with self.con:
+                self.con.execute("ALTER TABLE transacoes ADD COLUMN conta TEXT")
+                self.con.execute("DROP VIEW IF EXISTS v_transacoes")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.fechar()
+
+    def registrado(self, digest):
+        """(layout, n_transacoes, versao) do arquivo já gravado com este conteúdo, ou None."""
+        return self.con.execute(
+            "SELECT layout, n_transacoes, versao FROM arquivos WHERE hash = ?", (digest,)
+        ).fetchone()
+
+    def gravar_arquivo(self, digest, nome, layout, df, mapa, versao=None, paginas=None, metricas=None):
+        """Insere ou substitui o arquivo e todas as transações dele, numa única transação."""
+        linhas = linhas_transacoes(digest, df, mapa) if df is not None and len(df) else []
+        metricas = metricas or {}
+        with self.con:
+            self.con.execute("DELETE FROM transacoes WHERE arquivo_hash = ?", (digest,))
+            self.con.execute(
+                """
+                INSERT INTO arquivos (hash, nome, layout, versao, paginas, n_transacoes, t_total_s, metricas, processado_em)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (hash) DO UPDATE SET
+                    nome = excluded.nome, layout = excluded.layout, versao = excluded.versao,
+                    paginas = excluded.paginas, n_transacoes = excluded.n_transacoes,
+                    t_total_s = excluded.t_total_s, metricas = excluded.metricas,
+                    processado_em = excluded.processado_em
+                """,
+                (digest, nome, layout, versao, paginas, len(linhas), metricas.get("total"),
+                 json.dumps(metricas, ensure_ascii=False, default=str), datetime.now().isoformat(timespec="seconds")),
+            )
+            self.con.executemany("INSERT INTO transacoes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", linhas)
+        return len(linhas)
+
+    def fechar(self):
+        if self.con is not None:
+            self.con.close()
+            self.con = None
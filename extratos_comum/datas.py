@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+"""
+Datas de lançamentos em lote, uma coluna inteira por vez.
+
+Dois formatos de texto são aceitos:
+
+    "ofx"  DTPOSTED, DTASOF e similares: AAAAMMDD[HHMMSS[.XXX]][fuso].
+           "20240105", "20240105120000", "20240105120000.000[-3:BRT]"
+           Vale a primeira sequência de 8 dígitos do texto; hora e fuso
+           são ignorados (o extrato é por dia).
+    "br"   extratos em PDF: "05/01/2024", "05.01.2024" e "05/01", este
+           último com o ano de contexto (ano=, número ou coluna alinhada).
+
+serie_datas devolve datetime64 com NaT onde o texto não é uma data válida
+(31/02, mês 13...), em vez do ValueError do strptime linha a linha;
+serie_texto volta para "dd/mm/aaaa", com "" no lugar de NaT.
+"""
+
+import pandas as pd
+
+
+RE_SERIE_OFX = r"(?P<data>\d{8})"
+RE_SERIE_BR = r"^\s*(?P<dia>\d{2})[/.](?P<mes>\d{2})(?:[/.](?P<ano>\d{4}))?\s*$"
+
+
+def serie_datas(serie, formato="ofx", ano=None):
+    """Coluna de textos -> coluna datetime64 (NaT onde o texto não é data)."""
+    s = pd.Series(serie, copy=False).astype("string")
+    if formato == "ofx":
+        aaaammdd = s.str.extract(RE_SERIE_OFX)["data"]
+    elif formato == "br":
+        partes = s.str.extract(RE_SERIE_BR)
+        anos = partes["ano"]
+        if ano is not None:
+            contexto = pd.Series(ano if pd.api.types.is_scalar(ano) else list(ano), index=s.index)
+            anos = anos.fillna(contexto.astype("string"))
+        aaaammdd = anos + partes["mes"] + partes["dia"]
+    else:
+        raise ValueError(f"formato desconhecido: {formato}")
+    # muitas linhas repetem a mesma data: to_datetime converte cada texto distinto uma vez (cache)
+    return pd.to_datetime(aaaammdd, format="%Y%m%d", errors="coerce")
+
+
+def serie_texto(datas):
+    """Coluna datetime64 -> "dd/mm/aaaa" (object), com "" onde é NaT."""
+    d = pd.Series(datas, copy=False)
+    return d.dt.strftime("%d/%m/%Y").fillna("").astype(object)
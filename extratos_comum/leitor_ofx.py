@@ -0,0 +1,268 @@
+# -*- coding: utf-8 -*-
+"""
+Leitura de OFX numa passada só, em fluxo.
+
+Em vez de separar os blocos <STMTTRN> e procurar cada tag com um re.search
+(DTPOSTED, TRNAMT, MEMO, NAME...), o arquivo é lido aos pedaços e percorrido
+uma vez por uma única regex de tag: cada <TAG> vem com o texto que a segue
+até o próximo "<". Isso cobre tanto o SGML (tags-folha sem fechamento,
+<TRNAMT>-10.00) quanto o XML (<TRNAMT>-10.00</TRNAMT>).
+
+    for trn in ler_transacoes("extrato.ofx"):
+        trn.get("DTPOSTED"), trn.get("TRNAMT"), trn.get("MEMO")
+
+Cada transação é um dict TAG (maiúscula) -> texto cru, com a primeira
+ocorrência de cada tag dentro do bloco, como fazia o re.search. O texto não
+é normalizado (espaços, quebras de linha): isso fica com quem usa.
+
+Na mesma passada saem os extratos (<STMTRS>/<CCSTMTRS>) de cada conta: um
+OFX exportado de várias contas de uma vez traz um bloco por conta, cada um
+com o seu <BANKACCTFROM> e o seu <LEDGERBAL>. trn[EXTRATO] é o dict do
+extrato a que a transação pertence, com as tags do extrato fora das
+transações (BANKID, BRANCHID, ACCTID, ACCTTYPE, CURDEF, DTSTART, DTEND...)
+e os saldos como "LEDGERBAL.BALAMT", "LEDGERBAL.DTASOF", "AVAILBAL.BALAMT".
+O saldo vem depois das transações no OFX, então só está no dict quando o
+extrato fecha; para ter cada extrato já completo, com a lista das suas
+transações:
+
+    for extrato, trns in ler_extratos("combinado.ofx"):
+        extrato.get("ACCTID"), extrato.get("LEDGERBAL.BALAMT"), len(trns)
+
+O arquivo é mapeado em memória (mmap) e decodificado uma vez só, em fluxo,
+com o charset que o próprio cabeçalho declara: ENCODING/CHARSET no SGML
+(OFX 1.x), encoding="..." do <?xml?> no XML (OFX 2.x), ou o BOM. Sem
+declaração vale latin-1, como sempre foi. O pico de memória fica no tamanho
+de um pedaço, mesmo nos OFX de 100 MB+ de alguns bancos.
+
+Há bancos que declaram UTF-8 e gravam o corpo em cp1252/latin-1. A partir
+do primeiro byte que não vale no charset declarado, cada byte inválido sai
+como cp1252 ("CONCESSION\xc1RIA" -> "CONCESSIONÁRIA", em vez de perder a
+letra), e o fato vai para a lista `avisos`, quando dada:
+
+    avisos = []
+    for trn in ler_transacoes("extrato.ofx", avisos=avisos): ...
+"""
+
+import os
+import re
+import mmap
+import codecs
+from itertools import chain
+
+
+# <TAG> e o texto até o próximo "<". Dos fechamentos só interessam os da
+# transação e do extrato; os das tags-folha do XML (</MEMO>...) ficam de fora
+# da regex e são só saltados
+RE_TAG = re.compile(r"<(/(?:STMTTRN|STMTRS|CCSTMTRS)|[^<>/\s]+)>([^<]*)", re.I)
+# bytes decodificados por vez do arquivo
+TAMANHO_PEDACO = 1 << 20
+
+# início do arquivo onde se procura a declaração do charset
+TAMANHO_CABECALHO = 4096
+ENCODING_PADRAO = "latin1"
+RE_XML_ENCODING = re.compile(r"""^\s*<\?xml[^>]*?encoding\s*=\s*["']([\w.:-]+)["']""", re.I)
+RE_CAMPO_CABECALHO = re.compile(r"^\s*(ENCODING|CHARSET)\s*:\s*([\w.-]+)", re.I | re.M)
+# CHARSET do cabeçalho SGML -> codec do Python (NONE: o ENCODING decide)
+CHARSETS = {"1252": "cp1252", "WINDOWS-1252": "cp1252", "ISO-8859-1": "latin1", "8859-1": "latin1",
+            "LATIN1": "latin1", "NONE": None}
+ERROS_CP1252 = "extratos_ofx_cp1252"
+
+# chave, em cada transação, do dict do extrato a que ela pertence
+EXTRATO = "_EXTRATO"
+INICIO_EXTRATO = ("STMTRS", "CCSTMTRS")
+FIM_EXTRATO = ("/STMTRS", "/CCSTMTRS")
+# agregados do extrato; BALAMT e DTASOF aparecem nos dois saldos, por isso
+# dentro deles a tag vai com o nome do saldo na frente
+AGREGADOS = ("BANKACCTFROM", "CCACCTFROM", "BANKTRANLIST", "LEDGERBAL", "AVAILBAL")
+SALDOS = ("LEDGERBAL", "AVAILBAL")
+
+
+def _eventos(pedacos):
+    """
+    A transação a cada </STMTTRN> e o extrato a cada </STMTRS> ou
+    </CCSTMTRS>, a partir de pedaços de texto (só a transação tem EXTRATO).
+
+    Como no re.findall(r"<STMTTRN>(.*?)</STMTTRN>") de antes, o bloco vai do
+    <STMTTRN> até o primeiro </STMTTRN>, e um bloco sem fechamento no fim do
+    arquivo fica de fora. Transações fora de qualquer <STMTRS> (OFX montado
+    à mão) ficam num extrato sem conta, numerado como os outros.
+    """
+    atual = None
+    extrato = None
+    agregado = None
+    seq = 0
+    resto = ""
+    for pedaco in chain(pedacos, (None,)):
+        if pedaco is None:
+            texto, fim = resto, len(resto)
+        else:
+            texto = resto + pedaco
+            # o texto de uma tag só termina no próximo "<": o trecho a partir do
+            # último "<" espera o pedaço seguinte
+            fim = texto.rfind("<")
+            if fim <= 0:
+                resto = texto
+                continue
+        for m in RE_TAG.finditer(texto, 0, fim):
+            tag = m.group(1).upper()
+            if tag == "STMTTRN":
+                if atual is None:
+                    if extrato is None:
+                        extrato = {"SEQ": seq, "TIPO": ""}
+                        seq += 1
+                    atual = {EXTRATO: extrato}
+            elif tag == "/STMTTRN":
+                if atual is not None:
+                    yield atual
+                    atual = None
+            elif atual is not None:
+                # dentro da transação tudo é dela, até o </STMTTRN>
+                if tag not in atual:
+                    atual[tag] = m.group(2)
+            elif tag in INICIO_EXTRATO:
+                if extrato is not None:
+                    yield extrato
+                extrato = {"SEQ": seq, "TIPO": tag}
+                seq += 1
+                agregado = None
+            elif tag in FIM_EXTRATO:
+                if extrato is not None:
+                    yield extrato
+                    extrato = None
+            elif extrato is not None:
+                if tag in AGREGADOS:
+                    agregado = tag
+                elif agregado in SALDOS:
+                    extrato.setdefault(f"{agregado}.{tag}", m.group(2))
+                else:
+                    extrato.setdefault(tag, m.group(2))
+        resto = texto[fim:]
+    if extrato is not None:
+        yield extrato
+
+
+def transacoes(pedacos):
+    """Um dict por bloco <STMTTRN>...</STMTTRN>, a partir de pedaços de texto."""
+    for dado in _eventos(pedacos):
+        if EXTRATO in dado:
+            yield dado
+
+
+def extratos(pedacos):
+    """(extrato, lista de transações) de cada extrato, na ordem do arquivo, já com os saldos."""
+    pendentes = {}
+    for dado in _eventos(pedacos):
+        if EXTRATO in dado:
+            pendentes.setdefault(dado[EXTRATO]["SEQ"], []).append(dado)
+        else:
+            yield dado, pendentes.pop(dado["SEQ"], [])
+
+
+def transacoes_texto(texto):
+    return transacoes((texto,))
+
+
+def _codec(nome):
+    try:
+        return codecs.lookup(nome).name
+    except LookupError:
+        return None
+
+
+def _bytes_cp1252(erro):
+    """Handler de erro do codecs: os bytes inválidos no charset declarado saem como cp1252."""
+    if not isinstance(erro, UnicodeDecodeError):
+        raise erro
+    ruins = erro.object[erro.start:erro.end]
+    # 0x81, 0x8D, 0x8F, 0x90 e 0x9D não existem no cp1252: ficam como no latin-1
+    return "".join(bytes((b,)).decode("cp1252", errors="ignore") or chr(b) for b in ruins), erro.end
+
+
+codecs.register_error(ERROS_CP1252, _bytes_cp1252)
+
+
+def encoding_declarado(cabecalho: bytes):
+    """Codec declarado no início do OFX (BOM, <?xml encoding?> ou ENCODING/CHARSET), ou None."""
+    if cabecalho.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    if cabecalho.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return "utf-16"
+    texto = cabecalho.decode("latin1")
+    m = RE_XML_ENCODING.match(texto)
+    if m:
+        return _codec(m.group(1))
+    # só o cabeçalho antes do <OFX>, para não confundir com o texto de um MEMO
+    fim = texto.upper().find("<OFX>")
+    campos = {k.upper(): v.upper() for k, v in RE_CAMPO_CABECALHO.findall(texto if fim < 0 else texto[:fim])}
+    charset = CHARSETS.get(campos.get("CHARSET"), campos.get("CHARSET"))
+    if campos.get("ENCODING") in ("UTF-8", "UTF8", "UNICODE"):
+        return "utf-8"
+    if charset:
+        return _codec(charset)
+    if "<?OFX" in texto.upper():
+        # OFX 2.x sem encoding no <?xml?>: o padrão do XML
+        return "utf-8"
+    return None
+
+
+def encoding_ofx(caminho):
+    """Codec com que o OFX deve ser lido: o declarado no cabeçalho ou latin-1."""
+    with open(caminho, "rb") as f:
+        return encoding_declarado(f.read(TAMANHO_CABECALHO)) or ENCODING_PADRAO
+
+
+def pedacos_arquivo(caminho, encoding=None, tamanho=TAMANHO_PEDACO, avisos=None):
+    """
+    Texto do arquivo em pedaços de `tamanho` bytes, decodificado uma vez só.
+
+    Sem `encoding`, vale o declarado no cabeçalho. O decodificador é
+    incremental: um caractere de vários bytes partido entre dois pedaços
+    sai inteiro no pedaço seguinte. No primeiro byte inválido, o pedaço é
+    decodificado de novo, do mesmo estado, com os bytes inválidos como
+    cp1252 (ERROS_CP1252); o aviso vai para `avisos`.
+    """
+    with open(caminho, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            # mmap não aceita arquivo vazio
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            encoding = encoding or encoding_declarado(mm[:TAMANHO_CABECALHO]) or ENCODING_PADRAO
+            decodificador = codecs.getincrementaldecoder(encoding)()
+
+            def decodificar(pedaco, final=False):
+                nonlocal decodificador
+                estado = decodificador.getstate()
+                try:
+                    return decodificador.decode(pedaco, final)
+                except UnicodeDecodeError as e:
+                    # o decode que falha não consome nada: refeito do mesmo estado
+                    decodificador = codecs.getincrementaldecoder(encoding)(errors=ERROS_CP1252)
+                    decodificador.setstate(estado)
+                    if avisos is not None:
+                        avisos.append(f"bytes inválidos em {encoding} (posição {inicio - len(estado[0]) + e.start}); lidos como cp1252")
+                    return decodificador.decode(pedaco, final)
+
+            inicio = 0
+            for inicio in range(0, len(mm), tamanho):
+                texto = decodificar(mm[inicio:inicio + tamanho])
+                if texto:
+                    yield texto
+            inicio = len(mm)
+            texto = decodificar(b"", final=True)
+            if texto:
+                yield texto
+
+
+def texto_ofx(caminho, encoding=None, avisos=None):
+    """O arquivo inteiro como texto, com o mesmo charset e os mesmos avisos de pedacos_arquivo."""
+    return "".join(pedacos_arquivo(caminho, encoding, avisos=avisos))
+
+
+def ler_transacoes(caminho, encoding=None, tamanho=TAMANHO_PEDACO, avisos=None):
+    """Transações do arquivo, decodificado de `tamanho` em `tamanho` bytes."""
+    yield from transacoes(pedacos_arquivo(caminho, encoding, tamanho, avisos))
+
+
+def ler_extratos(caminho, encoding=None, tamanho=TAMANHO_PEDACO, avisos=None):
+    """Extratos do arquivo, cada um com as suas transações, numa passada só."""
+    yield from extratos(pedacos_arquivo(caminho, encoding, tamanho, avisos))
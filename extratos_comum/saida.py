@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""
+Saída colunar (Parquet, Feather ou CSV) para os consolidados de lançamentos.
+
+A planilha continua sendo a saída padrão dos scripts; estes formatos são
+para quem vai reabrir o resultado no pandas/Power BI, onde ler um XLSX
+grande demora mais do que gerá-lo. As colunas saem tipadas (datas como
+datetime, valores como float, textos como string).
+
+    saida = SaidaColunar("consolidado_20240301", "parquet", particoes=("layout", "ano_mes"),
+                         datas=("Data",), valores=("Valor", "Débito", "Crédito"))
+    saida.escrever(df)       # quantas vezes for preciso
+    saida.fechar(df_logs)    # devolve os caminhos gravados
+
+Sem partições o consolidado vai num arquivo só (<destino>.parquet). Com
+partições vira uma pasta no formato hive (<destino>/layout=bb/ano_mes=2024-03/
+parte-00000.parquet), que pd.read_parquet(<destino>) lê de uma vez. O Logs,
+quando informado, vai em <destino>_logs.<ext>.
+
+Parquet e Feather precisam do pyarrow; CSV sai com ";" e vírgula decimal,
+para abrir direto no Excel em português.
+"""
+
+import os
+
+import pandas as pd
+
+
+# formatos aceitos pelos scripts (xlsx é gravado por eles; sqlite por extratos_comum.banco)
+FORMATOS = ("xlsx", "parquet", "feather", "csv", "sqlite")
+EXTENSOES = {"parquet": ".parquet", "feather": ".feather", "csv": ".csv"}
+# linhas acumuladas antes de gravar (tamanho dos row groups / arquivos das partições)
+LOTE_LINHAS = 200_000
+SEM_DATA = "sem_data"
+
+
+def exigir_pyarrow(formato):
+    if formato not in ("parquet", "feather"):
+        return
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        raise RuntimeError(
+            f"o formato {formato} precisa da biblioteca 'pyarrow'. Instale com:\n    pip install pyarrow"
+        ) from None
+
+
+def tipar(df, datas=(), valores=(), formato_data="%d/%m/%Y", inferir_numeros=False):
+    """
+    Datas dd/mm/aaaa -> datetime64, valores -> float64 ("" vira NaN), demais textos -> string.
+
+    Com inferir_numeros, colunas object só com números (e "") viram numéricas;
+    serve para o Logs, não para o consolidado, onde Documento é texto.
+    """
+    out = df.copy()
+    for col in datas:
+        if col in out.columns and not pd.api.types.is_datetime64_any_dtype(out[col]):
+            out[col] = pd.to_datetime(out[col], format=formato_data, errors="coerce")
+    for col in valores:
+        if col in out.columns:
+            out[col] = pd.to_numeric(out[col].replace("", None), errors="coerce").astype("float64")
+    for col in out.columns:
+        if col in datas or col in valores or out[col].dtype != object:
+            continue
+        serie = out[col]
+        if inferir_numeros:
+            preenchida = serie[serie.notna() & (serie.astype(str) != "")]
+            if len(preenchida) and pd.to_numeric(preenchida, errors="coerce").notna().all():
+                # colunas do Logs como páginas: números com "" onde não se aplica
+                out[col] = pd.to_numeric(serie.replace("", None), errors="coerce")
+                continue
+        out[col] = serie.astype("string")
+    return out
+
+
+def _gravar(df, caminho, formato, cabecalho=True):
+    if formato == "parquet":
+        df.to_parquet(caminho, index=False)
+    elif formato == "feather":
+        df.reset_index(drop=True).to_feather(caminho)
+    else:
+        df.to_csv(caminho, sep=";", decimal=",", index=False, date_format="%d/%m/%Y",
+                  mode="w" if cabecalho else "a", header=cabecalho,
+                  encoding="utf-8-sig" if cabecalho else "utf-8")
+
+
+class SaidaColunar:
+    def __init__(self, destino, formato, particoes=(), datas=(), valores=(), coluna_data=None, colunas=None):
+        if formato not in EXTENSOES:
+            raise ValueError(f"formato desconhecido: {formato}")
+        exigir_pyarrow(formato)
+        self.destino = destino
+        self.formato = formato
+        self.ext = EXTENSOES[formato]
+        self.particoes = tuple(particoes)
+        self.datas = tuple(datas)
+        self.valores = tuple(valores)
+        # ano_mes sai desta coluna (a primeira data, se não informada)
+        self.coluna_data = coluna_data or (datas[0] if datas else None)
+        self.colunas = list(colunas) if colunas is not None else None
+        self.caminho = destino if self.particoes else destino + self.ext
+        self.linhas = 0
+        self._lote = []
+        self._linhas_lote = 0
+        self._parte = 0
+        self._writer = None
+        self._schema = None
+
+    def escrever(self, df):
+        if df is None or df.empty:
+            return
+        self._lote.append(df)
+        self._linhas_lote += len(df)
+        if self._linhas_lote >= LOTE_LINHAS:
+            self._descarregar()
+
+    def _descarregar(self):
+        if not self._lote:
+            return
+        df = tipar(pd.concat(self._lote, ignore_index=True), self.datas, self.valores)
+        self._lote = []
+        self._linhas_lote = 0
+        if "ano_mes" in self.particoes and "ano_mes" not in df.columns:
+            df["ano_mes"] = df[self.coluna_data].dt.strftime("%Y-%m").fillna(SEM_DATA)
+        self.linhas += len(df)
+
+        if self.particoes:
+            for chave, grupo in df.groupby(list(self.particoes), sort=False, dropna=False):
+                chave = chave if isinstance(chave, tuple) else (chave,)
+                pasta = os.path.join(self.destino, *(
+                    f"{col}={SEM_DATA if pd.isna(v) or v == '' else v}" for col, v in zip(self.particoes, chave)
+                ))
+                os.makedirs(pasta, exist_ok=True)
+                grupo = grupo.drop(columns=list(self.particoes))
+                _gravar(grupo, os.path.join(pasta, f"parte-{self._parte:05d}{self.ext}"), self.formato)
+            self._parte += 1
+        elif self.formato == "csv":
+            _gravar(df, self.caminho, "csv", cabecalho=self._parte == 0)
+            self._parte += 1
+        else:
+            self._gravar_arrow(df)
+
+    def _gravar_arrow(self, df):
+        # um arquivo só, com um row group / record batch por lote
+        import pyarrow as pa
+        tabela = pa.Table.from_pandas(df, preserve_index=False)
+        if self._writer is None:
+            self._schema = tabela.schema
+            if self.formato == "parquet":
+                import pyarrow.parquet as pq
+                self._writer = pq.ParquetWriter(self.caminho, self._schema)
+            else:
+                self._writer = pa.ipc.new_file(self.caminho, self._schema)
+        else:
+            tabela = tabela.cast(self._schema)
+        self._writer.write_table(tabela)
+
+    def fechar(self, logs=None):
+        """Grava o que falta e o Logs; devolve a lista de caminhos gerados."""
+        self._descarregar()
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        caminhos = []
+        if self.linhas or not self.particoes:
+            if not self.linhas and not self.particoes:
+                # consolidado vazio: arquivo só com as colunas, para não quebrar quem lê
+                vazio = tipar(pd.DataFrame(columns=self.colunas or []), self.datas, self.valores)
+                _gravar(vazio, self.caminho, self.formato)
+            caminhos.append(self.caminho)
+        if logs is not None:
+            caminho_logs = self.destino + "_logs" + self.ext
+            _gravar(tipar(logs, inferir_numeros=True), caminho_logs, self.formato)
+            caminhos.append(caminho_logs)
+        return caminhos
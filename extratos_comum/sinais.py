@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+"""
+Sinal (C/D) de lançamentos sem indicação, a partir do saldo que fecha o bloco.
+
+Dado o saldo de abertura, o saldo informado ao fim do bloco e os valores
+(em centavos, todos positivos) dos lançamentos sem C/D, o problema é achar
+quais são créditos: a soma dos créditos tem de ser (alvo - base + total) / 2.
+É um subset-sum, resolvido por meet-in-the-middle: cada metade dos
+lançamentos gera o dicionário soma -> (nº de combinações, primeira
+combinação), e as duas metades se encontram pela soma que falta.
+
+Como somas iguais se fundem no dicionário, blocos com muitos valores
+pequenos ou repetidos ficam limitados pelo número de somas distintas (o
+mesmo que uma DP limitada), e não por 2^n.
+
+Entre várias soluções vale a mesma escolha da força bruta antiga
+(itertools.product(["C", "D"])): a primeira em ordem, com C antes de D.
+"""
+
+import time
+
+
+OK = "ok"
+AMBIGUO = "ambiguo"
+SEM_SOLUCAO = "sem_solucao"
+TEMPO_ESGOTADO = "tempo_esgotado"
+
+# tempo máximo por bloco; acima disso o bloco fica sem sinal e é reportado
+LIMITE_BLOCO_S = 2.0
+# de quantas em quantas combinações o relógio é consultado
+_PASSO_RELOGIO = 1 << 14
+
+
+class _TempoEsgotado(Exception):
+    pass
+
+
+def _somas(valores, prazo):
+    """
+    soma dos créditos -> [nº de combinações, máscara da primeira combinação].
+
+    Na máscara o primeiro valor é o bit mais alto e bit 1 = D, então a menor
+    máscara é a primeira combinação na ordem da força bruta.
+    """
+    somas = {0: [1, 0]}
+    passos = 0
+    for v in valores:
+        novas = {}
+        for s, (n, mascara) in somas.items():
+            for soma, m in ((s + v, mascara << 1), (s, (mascara << 1) | 1)):
+                atual = novas.get(soma)
+                if atual is None:
+                    novas[soma] = [n, m]
+                else:
+                    atual[0] += n
+                    if m < atual[1]:
+                        atual[1] = m
+            passos += 1
+            if prazo is not None and passos % _PASSO_RELOGIO == 0 and time.perf_counter() > prazo:
+                raise _TempoEsgotado
+        somas = novas
+    return somas
+
+
+def resolver_sinais(valores, base, alvo, tolerancia=0, limite_s=LIMITE_BLOCO_S):
+    """
+    Escolhe C ou D para cada valor de modo que base + créditos - débitos
+    fique a no máximo `tolerancia` de `alvo` (tudo em centavos inteiros).
+
+    Os valores vão sem sinal (>= 0): o sinal é o que se procura. Um valor
+    negativo (em geral uma linha mal lida) levanta ValueError com o valor,
+    em vez de virar SEM_SOLUCAO.
+
+    Devolve (tipos, n_solucoes, status):
+        tipos       lista de "C"/"D" na ordem de `valores`, ou None
+        n_solucoes  número de combinações que fecham o saldo (0 se o tempo acabou)
+        status      OK, AMBIGUO (mais de uma solução; tipos traz a primeira),
+                    SEM_SOLUCAO ou TEMPO_ESGOTADO
+    """
+    valores = [int(v) for v in valores]
+    negativos = [v for v in valores if v < 0]
+    if negativos:
+        raise ValueError(f"valor negativo entre os lançamentos sem sinal: {negativos[0]} centavos")
+    total = sum(valores)
+    # base + 2*creditos - total deve cair em [alvo - tol, alvo + tol]
+    minimo = -((total + alvo - tolerancia - base) // -2)
+    maximo = (total + alvo + tolerancia - base) // 2
+    if minimo > maximo or maximo < 0 or minimo > total:
+        return None, 0, SEM_SOLUCAO
+
+    meio = len(valores) // 2
+    esquerda, direita = valores[:meio], valores[meio:]
+    prazo = time.perf_counter() + limite_s if limite_s is not None else None
+    try:
+        somas_esq = _somas(esquerda, prazo)
+        somas_dir = _somas(direita, prazo)
+    except _TempoEsgotado:
+        return None, 0, TEMPO_ESGOTADO
+
+    n_solucoes = 0
+    melhor = None
+    bits_dir = len(direita)
+    for s, (n_esq, m_esq) in somas_esq.items():
+        for alvo_dir in range(max(minimo - s, 0), maximo - s + 1):
+            par = somas_dir.get(alvo_dir)
+            if par is None:
+                continue
+            n_solucoes += n_esq * par[0]
+            mascara = (m_esq << bits_dir) | par[1]
+            if melhor is None or mascara < melhor:
+                melhor = mascara
+
+    if melhor is None:
+        return None, 0, SEM_SOLUCAO
+
+    n = len(valores)
+    tipos = ["D" if (melhor >> (n - 1 - i)) & 1 else "C" for i in range(n)]
+    return tipos, n_solucoes, OK if n_solucoes == 1 else AMBIGUO
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""
+Valores monetários em centavos inteiros.
+
+Dois formatos de texto são aceitos:
+
+    "br"   padrão dos extratos em PDF: ponto é milhar e vírgula é decimal.
+           "R$ 1.234,56", "1.234,56-", "- 1.234,56", "−73,26", "+17,05"
+    "ofx"  campo TRNAMT e similares: o último separador ("." ou ",") é o
+           decimal e os anteriores são milhar.
+           "-1234.56", "1.343.00", "1.234,56", "150"
+           Notação científica ("1E3", "-1.5e2") é lida como número, com
+           Decimal, e não pelos dígitos soltos.
+
+Cada formato tem um caminho escalar (centavos_br / centavos_ofx), para os
+parsers linha a linha, e um caminho em lote (serie_centavos), para colunas
+inteiras. Casas além da segunda são arredondadas para cima a partir de 5
+(meio para longe do zero). Texto inválido vira None / <NA>.
+"""
+
+import re
+from decimal import Decimal, ROUND_HALF_UP
+
+import numpy as np
+import pandas as pd
+
+
+RE_OFX_DESCARTE = re.compile(r"[^0-9\-.,]")
+RE_SERIE_BR = r"^(?:(?P<neg1>-)|\+)?\s*(?P<int>\d*)(?:,(?P<frac>\d*))?\s*(?P<neg2>-)?$"
+RE_SERIE_OFX = r"^(?P<neg1>-)?(?P<int>[\d.,]*?)(?:[.,](?P<frac>\d*))?(?P<neg2>-)?$"
+RE_OFX_EXPOENTE = r"^\s*[+-]?(?:\d+[.,]?\d*|[.,]\d+)[eE][+-]?\d+\s*$"
+
+
+RE_DIGITOS = re.compile(r"[0-9]*")
+
+
+def _montar(inteiro, frac, neg):
+    if not (inteiro or frac) or not RE_DIGITOS.fullmatch(inteiro) or not RE_DIGITOS.fullmatch(frac):
+        return None
+    frac = (frac + "000")[:3]
+    centavos = int(inteiro or "0") * 100 + int(frac[:2]) + (frac[2] >= "5")
+    return -centavos if neg else centavos
+
+
+def centavos_br(texto):
+    if texto is None:
+        return None
+    t = str(texto).replace("R$", "").replace("−", "-").strip()
+    neg = False
+    if t.endswith("-"):
+        neg = True
+        t = t[:-1]
+    if t.startswith("-"):
+        neg = True
+        t = t[1:]
+    elif t.startswith("+"):
+        t = t[1:]
+    inteiro, _, frac = t.strip().replace(".", "").partition(",")
+    return _montar(inteiro, frac, neg)
+
+
+def _centavos_expoente(texto):
+    try:
+        centavos = (Decimal(texto.strip().replace(",", ".")) * 100).quantize(Decimal(1), rounding=ROUND_HALF_UP)
+    except ArithmeticError:
+        # expoente grande demais para o Decimal (InvalidOperation, Overflow)
+        return None
+    return int(centavos)
+
+
+def centavos_ofx(texto):
+    if texto is None:
+        return None
+    if re.match(RE_OFX_EXPOENTE, str(texto)):
+        return _centavos_expoente(str(texto))
+    t = RE_OFX_DESCARTE.sub("", str(texto))
+    neg = False
+    if t.endswith("-"):
+        neg = True
+        t = t[:-1]
+    if t.startswith("-"):
+        neg = True
+        t = t[1:]
+    t = t.replace(",", ".")
+    inteiro, sep, frac = t.rpartition(".")
+    if not sep:
+        inteiro, frac = frac, ""
+    return _montar(inteiro.replace(".", ""), frac, neg)
+
+
+def serie_centavos(serie, formato="br"):
+    """Coluna de textos -> coluna Int64 de centavos (<NA> onde o texto não é valor)."""
+    s = pd.Series(serie, copy=False).astype("string")
+    if formato == "br":
+        s = s.str.replace("R$", "", regex=False).str.replace("−", "-", regex=False).str.strip().str.replace(".", "", regex=False)
+        partes = s.str.extract(RE_SERIE_BR)
+    elif formato == "ofx":
+        partes = s.str.replace(r"[^0-9\-.,]", "", regex=True).str.extract(RE_SERIE_OFX)
+        partes["int"] = partes["int"].str.replace(r"[.,]", "", regex=True)
+    else:
+        raise ValueError(f"formato desconhecido: {formato}")
+
+    inteiro = partes["int"].fillna("")
+    frac = partes["frac"].fillna("")
+    valido = (inteiro != "") | (frac != "")
+
+    frac3 = pd.to_numeric(frac.str.pad(3, side="right", fillchar="0").str[:3], errors="coerce")
+    centavos = pd.to_numeric(inteiro.replace("", "0"), errors="coerce") * 100 + frac3 // 10 + (frac3 % 10 >= 5)
+    neg = partes["neg1"].notna() | partes["neg2"].notna()
+    centavos = centavos.where(~neg, -centavos)
+    centavos = centavos.where(valido & centavos.notna()).astype("Int64")
+    if formato == "ofx":
+        # "1E3" não é 13 reais: os poucos valores em notação científica vão pelo caminho escalar
+        expoente = s.str.match(RE_OFX_EXPOENTE).fillna(False).astype(bool)
+        if expoente.any():
+            centavos[expoente] = s[expoente].map(_centavos_expoente).astype("Int64")
+    return centavos
+
+
+def reais(centavos):
+    return None if centavos is None else centavos / 100
+
+
+def serie_reais(centavos):
+    """Coluna de centavos (Int64) -> float64 em reais, com NaN no lugar de <NA>."""
+    c = pd.Series(centavos, copy=False)
+    return pd.Series(c.to_numpy(dtype="float64", na_value=np.nan) / 100, index=c.index)
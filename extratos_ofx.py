@@ -7,12 +7,20 @@ from pathlib import Path
 from datetime import datetime
 import re
 import uuid
+import argparse
 import xml.etree.ElementTree as ET
+from xml.sax.saxutils import escape
 import pandas as pd
 import tkinter as tk
 from tkinter import filedialog
 from openpyxl import load_workbook
 
+from extratos_comum.valores import centavos_ofx, reais
+from extratos_comum.saida import FORMATOS, SaidaColunar
+from extratos_comum.banco import BancoTransacoes, MAPA_OFX, NOME_PADRAO, sha256_arquivo
+from extratos_comum.leitor_ofx import ler_extratos
+from extratos_comum.datas import serie_datas
+
 # ============================================================
 # UTILITÁRIOS DE NORMALIZAÇÃO (BLINDADOS)
 # ============================================================
@@ -23,32 +31,11 @@ def normalizar_valor_br(valor: str) -> float | None:
     - aceita "- 1.234,56"
     - aceita "1.234.567,89"
     - aceita "-1234.56"
-    Retorna float ou None
+    Retorna float ou None (conversão exata via centavos, ver extratos_comum.valores)
     """
     if not valor:
         return None
-
-    v = valor.strip()
-
-    # remove espaços entre sinal e número
-    v = re.sub(r'^-\s+', '-', v)
-
-    # mantém apenas dígitos, ponto, vírgula e sinal
-    v = re.sub(r'[^\d\-,\.]', '', v)
-
-    # se tiver vírgula, assume padrão brasileiro
-    if ',' in v:
-        v = v.replace('.', '').replace(',', '.')
-    else:
-        # se houver mais de um ponto, mantém só o último como decimal
-        if v.count('.') > 1:
-            partes = v.split('.')
-            v = ''.join(partes[:-1]) + '.' + partes[-1]
-
-    try:
-        return float(v)
-    except:
-        return None
+    return reais(centavos_ofx(valor))
 
 
 def normalizar_data(dt: str) -> str:
@@ -69,92 +56,155 @@ def normalizar_data(dt: str) -> str:
 
 
 # ============================================================
-# 1. CORREÇÃO / RECONSTRUÇÃO OFX → XML
+# 1. CORREÇÃO / RECONSTRUÇÃO OFX → XML (EM MEMÓRIA)
 # ============================================================
 
-def corrigir_ofx_para_xml(ofx: Path, xml_saida: Path) -> bool:
-    texto = ofx.read_text(encoding="latin1", errors="ignore")
-    texto = texto[texto.find("<"):]
-
-    stmts = re.findall(r'<STMTTRN>(.*?)</STMTTRN>', texto, flags=re.S | re.I)
-    transacoes = []
+# caracteres de controle não cabem em XML 1.0 (só tab e quebras de linha)
+RE_CONTROLE_XML = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
 
-    for raw in stmts:
-        def campo(tag):
-            m = re.search(rf'<{tag}>(.*?)($|<)', raw, flags=re.I | re.S)
-            return m.group(1).strip() if m else ""
 
-        valor = normalizar_valor_br(campo("TRNAMT"))
+def texto_xml(valor) -> str:
+    """Valor pronto para ir entre tags: "PAG C&A" não pode quebrar o XML inteiro."""
+    return escape(RE_CONTROLE_XML.sub("", str(valor)))
 
-        transacoes.append({
-            "DTPOSTED": normalizar_data(campo("DTPOSTED")),
-            "TRNAMT": valor,
-            "MEMO": campo("MEMO"),
-            "CHECKNUM": campo("CHECKNUM"),
-            "FITID": campo("FITID") or uuid.uuid4().hex
-        })
 
-    if not transacoes:
-        return False
+def corrigir_ofx_para_xml(ofx: Path) -> ET.Element | None:
+    """
+    Reconstrói o OFX como XML e o valida, sem gravar nada na pasta.
+    Devolve a raiz já lida (usada direto em extrair_dataframe) ou None.
+    Cada extrato do arquivo (um por conta, nos OFX exportados de várias
+    contas juntas) vira um <STMTRS> com a sua conta e o seu saldo.
+    """
+    xml = ['<?xml version="1.0" encoding="UTF-8"?>', '<OFX>']
+    total = 0
+
+    # uma passada só pelo arquivo, em fluxo (extratos_comum.leitor_ofx)
+    avisos = []
+    for extrato, trns in ler_extratos(ofx, avisos=avisos):
+        transacoes = []
+        for raw in trns:
+            def campo(tag):
+                return raw.get(tag, "").strip()
+
+            valor = normalizar_valor_br(campo("TRNAMT"))
+
+            transacoes.append({
+                "DTPOSTED": normalizar_data(campo("DTPOSTED")),
+                "TRNAMT": valor,
+                "MEMO": campo("MEMO"),
+                "CHECKNUM": campo("CHECKNUM"),
+                "FITID": campo("FITID") or uuid.uuid4().hex
+            })
+
+        if not transacoes:
+            continue
+        total += len(transacoes)
 
-    dtstart = min(t["DTPOSTED"] for t in transacoes if t["DTPOSTED"])
-    dtend = max(t["DTPOSTED"] for t in transacoes if t["DTPOSTED"])
+        def conta(tag):
+            return extrato.get(tag, "").strip()
 
-    xml = [
-        '<?xml version="1.0" encoding="UTF-8"?>',
-        '<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS>',
-        '<BANKACCTFROM><BANKID>000</BANKID><ACCTID>000</ACCTID><ACCTTYPE>CHECKING</ACCTTYPE></BANKACCTFROM>',
-        f'<BANKTRANLIST><DTSTART>{dtstart}</DTSTART><DTEND>{dtend}</DTEND>'
-    ]
+        datas = [t["DTPOSTED"] for t in transacoes if t["DTPOSTED"]]
+        dtstart = min(datas, default="")
+        dtend = max(datas, default="")
 
-    for t in transacoes:
+        # só as tags que o OFX trouxe; sem elas a conta fica em branco na planilha
+        origem = "".join(
+            f'<{tag}>{texto_xml(conta(tag))}</{tag}>' for tag in ("BANKID", "BRANCHID", "ACCTID") if conta(tag)
+        )
         xml.extend([
-            '<STMTTRN>',
-            '<TRNTYPE>OTHER</TRNTYPE>',
-            f'<DTPOSTED>{t["DTPOSTED"]}</DTPOSTED>',
-            f'<TRNAMT>{t["TRNAMT"]}</TRNAMT>',
-            f'<FITID>{t["FITID"]}</FITID>',
-            f'<MEMO>{t["MEMO"]}</MEMO>',
-            f'<CHECKNUM>{t["CHECKNUM"]}</CHECKNUM>',
-            '</STMTTRN>'
+            '<BANKMSGSRSV1><STMTTRNRS><STMTRS>',
+            f'<CURDEF>{texto_xml(conta("CURDEF") or "BRL")}</CURDEF>',
+            f'<BANKACCTFROM>{origem}<ACCTTYPE>{texto_xml(conta("ACCTTYPE") or "CHECKING")}</ACCTTYPE></BANKACCTFROM>',
+            f'<BANKTRANLIST><DTSTART>{dtstart}</DTSTART><DTEND>{dtend}</DTEND>'
         ])
 
-    xml.extend([
-        '</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>'
-    ])
+        for t in transacoes:
+            xml.extend([
+                '<STMTTRN>',
+                '<TRNTYPE>OTHER</TRNTYPE>',
+                f'<DTPOSTED>{t["DTPOSTED"]}</DTPOSTED>',
+                f'<TRNAMT>{t["TRNAMT"]}</TRNAMT>',
+                f'<FITID>{texto_xml(t["FITID"])}</FITID>',
+                f'<MEMO>{texto_xml(t["MEMO"])}</MEMO>',
+                f'<CHECKNUM>{texto_xml(t["CHECKNUM"])}</CHECKNUM>',
+                '</STMTTRN>'
+            ])
+
+        xml.append('</BANKTRANLIST>')
+        saldo = normalizar_valor_br(conta("LEDGERBAL.BALAMT"))
+        if saldo is not None:
+            xml.append(f'<LEDGERBAL><BALAMT>{saldo}</BALAMT>'
+                       f'<DTASOF>{normalizar_data(conta("LEDGERBAL.DTASOF"))}</DTASOF></LEDGERBAL>')
+        xml.append('</STMTRS></STMTTRNRS></BANKMSGSRSV1>')
+
+    # corpo fora do charset do cabeçalho (ex.: ENCODING:UTF-8 com texto cp1252)
+    for aviso in avisos:
+        print("  Aviso:", aviso)
+
+    if not total:
+        return None
 
-    xml_saida.write_text("\n".join(xml), encoding="utf-8")
+    xml.append('</OFX>')
 
     try:
-        ET.parse(xml_saida)
-        return True
-    except:
-        return False
+        return ET.fromstring("\n".join(xml))
+    except ET.ParseError:
+        return None
 
 
 # ============================================================
 # 2. EXTRAÇÃO XML → DATAFRAME
 # ============================================================
 
-def extrair_dataframe(xml: Path) -> pd.DataFrame | None:
-    tree = ET.parse(xml)
-    root = tree.getroot()
+def conta_extrato(stmtrs: ET.Element) -> str:
+    """banco/agência/conta do <BANKACCTFROM> (ou <CCACCTFROM>) do extrato, o que houver."""
+    origem = stmtrs.find("BANKACCTFROM")
+    if origem is None:
+        origem = stmtrs.find("CCACCTFROM")
+    if origem is None:
+        return ""
+    partes = [(origem.findtext(tag) or "").strip() for tag in ("BANKID", "BRANCHID", "ACCTID")]
+    return "/".join(p for p in partes if p)
 
-    rows = []
-    for t in root.findall(".//STMTTRN"):
-        get = lambda x: (t.findtext(x) or "").strip()
 
-        valor = normalizar_valor_br(get("TRNAMT"))
+def extrair_dataframe(xml: Path | ET.Element) -> pd.DataFrame | None:
+    # XML da pasta (lido aqui) ou raiz já validada por corrigir_ofx_para_xml
+    root = xml if isinstance(xml, ET.Element) else ET.parse(xml).getroot()
+
+    # um bloco por extrato; XML sem <STMTRS> é lido inteiro, sem conta
+    extratos = [e for e in root.iter() if e.tag in ("STMTRS", "CCSTMTRS")] or [root]
 
-        rows.append({
-            "DATA": pd.to_datetime(normalizar_data(get("DTPOSTED")), format="%Y%m%d", errors="coerce"),
-            "VALOR": valor,
-            "HISTORICO": get("MEMO"),
-            "DOCUMENTO": get("CHECKNUM"),
-            "FITID": get("FITID")
-        })
+    rows = []
+    for stmtrs in extratos:
+        conta = conta_extrato(stmtrs) if stmtrs is not root else ""
+        n = len(rows)
+        for t in stmtrs.iter("STMTTRN"):
+            get = lambda x: (t.findtext(x) or "").strip()
+
+            valor = normalizar_valor_br(get("TRNAMT"))
+
+            rows.append({
+                "DATA": normalizar_data(get("DTPOSTED")),
+                "VALOR": valor,
+                "HISTORICO": get("MEMO"),
+                "DOCUMENTO": get("CHECKNUM"),
+                "FITID": get("FITID"),
+                "CONTA": conta
+            })
+
+        if len(extratos) > 1:
+            saldo = (stmtrs.findtext("LEDGERBAL/BALAMT") or "").strip()
+            data_saldo = normalizar_data(stmtrs.findtext("LEDGERBAL/DTASOF") or "")
+            print(f"  conta {conta or '-'}: {len(rows) - n} lançamentos"
+                  + (f", saldo {saldo} em {data_saldo}" if saldo else ""))
+
+    if not rows:
+        return None
 
-    df = pd.DataFrame(rows).dropna(subset=["VALOR", "DATA"])
+    df = pd.DataFrame(rows)
+    # AAAAMMDD -> data numa conversão só da coluna (extratos_comum.datas)
+    df["DATA"] = serie_datas(df["DATA"], "ofx")
+    df = df.dropna(subset=["VALOR", "DATA"])
 
     # DÉBITO / CRÉDITO
     df["CREDITO"] = df["VALOR"].apply(lambda x: x if x > 0 else "")
@@ -170,7 +220,13 @@ def extrair_dataframe(xml: Path) -> pd.DataFrame | None:
 # 3. PROCESSO PRINCIPAL (SELEÇÃO DE PASTA)
 # ============================================================
 
-def processar_pasta():
+def processar_pasta(formato="xlsx", particionar=False):
+    """
+    formato: xlsx (uma aba por arquivo + CONSOLIDADO) ou parquet/feather/csv
+    (só o CONSOLIDADO, tipado; com particionar, em pastas ano_mes=aaaa-mm).
+    sqlite grava cada arquivo no banco extratos.sqlite da pasta (upsert pelo
+    SHA-256 do conteúdo) e pula os que já estão lá.
+    """
     root = tk.Tk()
     root.withdraw()
     pasta = filedialog.askdirectory(title="Selecione a pasta com arquivos OFX/XML")
@@ -180,43 +236,82 @@ def processar_pasta():
         return
 
     arquivos = list(Path(pasta).glob("*.ofx")) + list(Path(pasta).glob("*.xml"))
-
-    saida = Path(pasta) / f"consolidado_ofx_{datetime.now():%Y%m%d_%H%M%S}.xlsx"
-    writer = pd.ExcelWriter(saida, engine="openpyxl")
+    # .corrigido.xml são sobras de versões antigas, que gravavam o XML ao lado do OFX
+    arquivos = [a for a in arquivos if not a.name.lower().endswith(".corrigido.xml")]
+
+    base = Path(pasta) / f"consolidado_ofx_{datetime.now():%Y%m%d_%H%M%S}"
+    writer = None
+    colunar = None
+    banco = None
+    if formato == "sqlite":
+        banco = BancoTransacoes(str(Path(pasta) / NOME_PADRAO))
+    elif formato == "xlsx":
+        saida = base.with_suffix(".xlsx")
+        writer = pd.ExcelWriter(saida, engine="openpyxl")
+    else:
+        colunar = SaidaColunar(
+            str(base), formato, particoes=("ano_mes",) if particionar else (),
+            datas=("DATA",), valores=("VALOR", "CREDITO", "DEBITO"),
+        )
 
     todos = []
 
     for arq in arquivos:
+        if banco is not None:
+            digest = sha256_arquivo(arq)
+            if banco.registrado(digest) is not None:
+                print("Já no banco:", arq.name)
+                continue
+
         print("Processando:", arq.name)
 
         if arq.suffix.lower() == ".ofx":
-            xml = arq.with_suffix(".corrigido.xml")
-            if not corrigir_ofx_para_xml(arq, xml):
+            xml = corrigir_ofx_para_xml(arq)
+            if xml is None:
+                print("  Ignorado: nenhuma transação aproveitável ou XML inválido:", arq.name)
                 continue
         else:
             xml = arq
 
         df = extrair_dataframe(xml)
         if df is None or df.empty:
+            print("  Ignorado: nenhuma transação com data e valor válidos:", arq.name)
             continue
 
         df["ARQUIVO"] = arq.name
+        if banco is not None:
+            banco.gravar_arquivo(digest, arq.name, "ofx", df, MAPA_OFX)
+            continue
         todos.append(df)
 
-        df.to_excel(writer, sheet_name=arq.stem[:31], index=False)
+        if writer is not None:
+            df.to_excel(writer, sheet_name=arq.stem[:31], index=False)
 
     if todos:
         consolidado = pd.concat(todos, ignore_index=True)
 
-        # DEDUPLICAÇÃO DEFINITIVA
+        # DEDUPLICAÇÃO DEFINITIVA (o FITID só é único dentro da conta)
         consolidado = consolidado.drop_duplicates(
-            subset=["FITID", "DATA", "VALOR"]
+            subset=["CONTA", "FITID", "DATA", "VALOR"]
         )
 
-        ordem = ["ARQUIVO", "DATA", "VALOR", "TIPO", "HISTORICO", "DOCUMENTO", "CREDITO", "DEBITO", "FITID"]
+        ordem = ["ARQUIVO", "CONTA", "DATA", "VALOR", "TIPO", "HISTORICO", "DOCUMENTO", "CREDITO", "DEBITO", "FITID"]
         consolidado = consolidado[ordem]
 
-        consolidado.to_excel(writer, sheet_name="CONSOLIDADO", index=False)
+        if writer is not None:
+            consolidado.to_excel(writer, sheet_name="CONSOLIDADO", index=False)
+        else:
+            colunar.escrever(consolidado)
+
+    if banco is not None:
+        banco.fechar()
+        print("Banco atualizado:", banco.caminho)
+        return
+
+    if writer is None:
+        for caminho in colunar.fechar():
+            print("Arquivo final gerado com sucesso:", caminho)
+        return
 
     writer.close()
 
@@ -229,4 +324,10 @@ def processar_pasta():
 # ============================================================
 
 if __name__ == "__main__":
-    processar_pasta()
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--formato", choices=FORMATOS, default="xlsx",
+                        help="Formato da saída (parquet/feather precisam do pyarrow; padrão xlsx)")
+    parser.add_argument("--particionar", action="store_true",
+                        help="Em parquet/feather/csv, grava o consolidado em pastas por ano-mês")
+    args = parser.parse_args()
+    processar_pasta(args.formato, args.particionar)
@@ -6,10 +6,18 @@
 from tkinter import Tk, filedialog
 from pathlib import Path
 from datetime import datetime
+import argparse
+import io
 import re
 import xml.etree.ElementTree as ET
 import pandas as pd
 
+from extratos_comum.valores import centavos_ofx, reais, serie_centavos, serie_reais
+from extratos_comum.saida import FORMATOS, SaidaColunar
+from extratos_comum.banco import BancoTransacoes, MAPA_OFX, NOME_PADRAO, sha256_arquivo
+from extratos_comum.leitor_ofx import texto_ofx
+from extratos_comum.datas import serie_datas
+
 
 # ======================================================
 # ?? Utilitrio: normalizar TRNAMT (valores monetrios)
@@ -27,33 +35,7 @@ def parse_trnamt_to_float(x) -> float | None:
 
     Regra: se houver mais de um separador ('.' ou ','), o ltimo  decimal e os anteriores so milhar.
     """
-    if x is None:
-        return None
-    s = str(x).strip()
-    if not s:
-        return None
-
-    # mantm apenas dgitos, sinal e separadores
-    s = re.sub(r"[^0-9\-\.,]", "", s)
-    if not s or s in {"-", ".", ",", "-.", "-,"}:
-        return None
-
-    neg = s.startswith("-")
-    s = s[1:] if neg else s
-
-    # normaliza vrgula para ponto
-    s = s.replace(",", ".")
-
-    # se tiver vrios pontos, mantm s o ltimo como decimal
-    if s.count(".") > 1:
-        parts = s.split(".")
-        s = "".join(parts[:-1]) + "." + parts[-1]
-
-    try:
-        val = float(s)
-        return -val if neg else val
-    except ValueError:
-        return None
+    return reais(centavos_ofx(x))
 
 
 # ======================================================
@@ -61,7 +43,7 @@ def parse_trnamt_to_float(x) -> float | None:
 # ======================================================
 def extrair_dataframe_sgml(caminho_ofx: Path) -> pd.DataFrame | None:
     try:
-        txt = Path(caminho_ofx).read_text(encoding="latin1", errors="ignore")
+        txt = io.StringIO(texto_ofx(caminho_ofx), newline=None).read()
     except Exception:
         return None
 
@@ -104,20 +86,11 @@ def extrair_dataframe_sgml(caminho_ofx: Path) -> pd.DataFrame | None:
         return None
 
     if 'DTPOSTED' in df.columns:
-        df['DTPOSTED'] = (
-            df['DTPOSTED']
-            .astype(str)
-            .str.extract(r'(\d{8,14})')[0]
-            .apply(lambda x: pd.to_datetime(
-                x,
-                format='%Y%m%d%H%M%S' if pd.notna(x) and len(x) > 8 else '%Y%m%d',
-                errors='coerce'
-            ))
-            .dt.strftime('%d/%m/%Y')
-        )
+        # AAAAMMDD[HHMMSS][fuso] convertido de uma vez (extratos_comum.datas)
+        df['DTPOSTED'] = serie_datas(df['DTPOSTED'], "ofx").dt.strftime('%d/%m/%Y')
 
     if 'TRNAMT' in df.columns:
-        df['TRNAMT'] = df['TRNAMT'].map(parse_trnamt_to_float)
+        df['TRNAMT'] = serie_reais(serie_centavos(df['TRNAMT'], "ofx"))
         df['CREDITO'] = df['TRNAMT'].apply(lambda x: x if pd.notna(x) and x > 0 else "")
         df['DEBITO']  = df['TRNAMT'].apply(lambda x: x if pd.notna(x) and x < 0 else "")
         df['TIPO']    = df['TRNAMT'].apply(
@@ -134,11 +107,20 @@ def extrair_dataframe_sgml(caminho_ofx: Path) -> pd.DataFrame | None:
 
 
 # ======================================================
-# ?? Funo 1: Corrigir arquivo OFX para XML vlido
+# ?? Funo 1: Corrigir arquivo OFX para XML vlido (em memria)
 # ======================================================
-def corrigir_ofx_para_xml(caminho_ofx: Path, caminho_xml: Path) -> bool:
-    with open(caminho_ofx, 'r', encoding='latin1', errors='ignore') as f:
-        linhas = f.readlines()
+def corrigir_ofx_para_xml(caminho_ofx: Path) -> ET.Element | None:
+    """
+    Corrige o OFX para XML em memria e valida com um nico parse.
+    Devolve a raiz (para extrair_dataframe) ou None se o XML for invlido.
+    Nada  gravado na pasta do cliente.
+    """
+    # charset do cabealho do OFX (ENCODING/CHARSET ou <?xml encoding?>), latin-1 se no houver
+    # bytes fora desse charset (cabealho UTF-8 com corpo cp1252) saem como cp1252, com aviso
+    avisos = []
+    linhas = io.StringIO(texto_ofx(caminho_ofx, avisos=avisos), newline=None).readlines()
+    for aviso in avisos:
+        print(f"   Aviso: {aviso}")
 
     for i, ln in enumerate(linhas):
         if re.match(r'<\s*ofx\s*>', ln.strip(), re.IGNORECASE):
@@ -156,26 +138,25 @@ def corrigir_ofx_para_xml(caminho_ofx: Path, caminho_xml: Path) -> bool:
         else:
             corr.append(ln)
 
-    with open(caminho_xml, 'w', encoding='utf-8') as f:
-        f.write("\n".join(corr))
-
     try:
-        ET.parse(caminho_xml)
-        return True
+        return ET.fromstring("\n".join(corr))
     except ET.ParseError:
-        return False
+        return None
 
 
 # ======================================================
-# ?? Funo 2: Extrair transaes para DataFrame (via XML corrigido)
+# ?? Funo 2: Extrair transaes para DataFrame (do XML corrigido em memria)
 # ======================================================
-def extrair_dataframe(caminho_xml: Path):
-    try:
-        tree = ET.parse(caminho_xml)
-    except ET.ParseError:
-        return None
+def extrair_dataframe(xml):
+    # raiz j validada por corrigir_ofx_para_xml, ou caminho de um XML
+    if isinstance(xml, ET.Element):
+        root = xml
+    else:
+        try:
+            root = ET.parse(xml).getroot()
+        except ET.ParseError:
+            return None
 
-    root = tree.getroot()
     trans = root.findall(".//STMTTRN")
     if not trans:
         return None
@@ -186,20 +167,11 @@ def extrair_dataframe(caminho_xml: Path):
     df = pd.DataFrame(rows)
 
     if 'DTPOSTED' in df.columns:
-        df['DTPOSTED'] = (
-            df['DTPOSTED']
-            .astype(str)
-            .str.extract(r'(\d{8,14})')[0]
-            .apply(lambda x: pd.to_datetime(
-                x,
-                format='%Y%m%d%H%M%S' if pd.notna(x) and len(x) > 8 else '%Y%m%d',
-                errors='coerce'
-            ))
-            .dt.strftime('%d/%m/%Y')
-        )
+        # AAAAMMDD[HHMMSS][fuso] convertido de uma vez (extratos_comum.datas)
+        df['DTPOSTED'] = serie_datas(df['DTPOSTED'], "ofx").dt.strftime('%d/%m/%Y')
 
     if 'TRNAMT' in df.columns:
-        df['TRNAMT'] = df['TRNAMT'].map(parse_trnamt_to_float)
+        df['TRNAMT'] = serie_reais(serie_centavos(df['TRNAMT'], "ofx"))
         df['CREDITO'] = df['TRNAMT'].apply(lambda x: x if pd.notna(x) and x > 0 else "")
         df['DEBITO']  = df['TRNAMT'].apply(lambda x: x if pd.notna(x) and x < 0 else "")
         df['TIPO']    = df['TRNAMT'].apply(
@@ -218,7 +190,13 @@ def extrair_dataframe(caminho_xml: Path):
 # ======================================================
 # ?? Funo 3: Selecionar pasta e processar arquivos
 # ======================================================
-def process_dir() -> Path:
+def process_dir(formato: str = "xlsx", particionar: bool = False) -> Path:
+    """
+    formato: xlsx (uma aba por arquivo + CONSOLIDADO) ou parquet/feather/csv
+    (s o CONSOLIDADO, tipado; com particionar, em pastas ano_mes=aaaa-mm).
+    sqlite grava cada arquivo no banco extratos.sqlite da pasta (upsert pelo
+    SHA-256 do contedo) e pula os que j esto l.
+    """
     Tk().withdraw()
     pasta_selecionada = filedialog.askdirectory(title="Selecione a pasta com arquivos .OFX")
 
@@ -236,46 +214,76 @@ def process_dir() -> Path:
     ts = datetime.now().strftime("%Y%m%d_%H%M%S")
     saida = pasta / f"consolidado_ofx_{ts}.xlsx"
 
-    writer = pd.ExcelWriter(saida, engine="openpyxl")
+    writer = pd.ExcelWriter(saida, engine="openpyxl") if formato == "xlsx" else None
+    banco = BancoTransacoes(str(pasta / NOME_PADRAO)) if formato == "sqlite" else None
     dfs = []
 
     for arq in arquivos:
+        if banco is not None:
+            digest = sha256_arquivo(arq)
+            if banco.registrado(digest) is not None:
+                print(f"?? J no banco: {arq.name}")
+                continue
         print(f"?? Processando: {arq.name}")
-        xml_corr = arq.with_name(arq.stem + "_corrigido.xml")
-        ok_xml = corrigir_ofx_para_xml(arq, xml_corr)
+        xml = corrigir_ofx_para_xml(arq)
 
-        df = extrair_dataframe(xml_corr) if ok_xml else None
+        df = extrair_dataframe(xml) if xml is not None else None
 
         if df is None or df.empty:
             df = extrair_dataframe_sgml(arq)
 
         if df is not None and not df.empty:
-            df.to_excel(writer, sheet_name=arq.stem[:31], index=False)
+            if writer is not None:
+                df.to_excel(writer, sheet_name=arq.stem[:31], index=False)
             df['ARQUIVO'] = arq.name
+            if banco is not None:
+                banco.gravar_arquivo(digest, arq.name, "ofx", df, MAPA_OFX)
+                continue
             dfs.append(df)
         else:
             print(f"?? Nenhuma transao extrada de: {arq.name}")
 
+    if banco is not None:
+        banco.fechar()
+        print(f"? Banco atualizado: {banco.caminho}")
+        return Path(banco.caminho)
+
     if dfs:
         total = pd.concat(dfs, ignore_index=True)
         ordem = ['ARQUIVO', 'DATA', 'VALOR', 'TIPO', 'HISTORICO', 'DOCUMENTO', 'CREDITO', 'DEBITO']
         total = total[[c for c in ordem if c in total.columns]]
-        total.to_excel(writer, sheet_name="CONSOLIDADO", index=False)
+        if writer is not None:
+            total.to_excel(writer, sheet_name="CONSOLIDADO", index=False)
+        else:
+            colunar = SaidaColunar(
+                str(pasta / f"consolidado_ofx_{ts}"), formato, particoes=("ano_mes",) if particionar else (),
+                datas=("DATA",), valores=("VALOR", "CREDITO", "DEBITO"),
+            )
+            colunar.escrever(total)
+            saida = Path(colunar.fechar()[0])
 
     if not dfs:
-        writer.close()
+        if writer is not None:
+            writer.close()
         raise RuntimeError(
             "Nenhum arquivo gerou dados para exportao. "
             "Verifique se os OFX so vlidos e/ou se o fallback SGML capturou <STMTTRN>."
         )
 
-    writer.close()
+    if writer is not None:
+        writer.close()
     print(f"? Consolidado salvo em: {saida}")
     return saida
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--formato", choices=FORMATOS, default="xlsx",
+                        help="Formato da sada (parquet/feather precisam do pyarrow; padro xlsx)")
+    parser.add_argument("--particionar", action="store_true",
+                        help="Em parquet/feather/csv, grava o consolidado em pastas por ano-ms")
+    args = parser.parse_args()
     try:
-        process_dir()
+        process_dir(args.formato, args.particionar)
     except Exception as e:
         print(f"? Erro: {e}")
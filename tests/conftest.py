@@ -0,0 +1,6 @@
+# -*- coding: utf-8 -*-
+# os testes importam extratos_comum da raiz do repositório, como os scripts
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
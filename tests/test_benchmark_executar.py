@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+"""
+Fumaça do benchmark (benchmark.executar): medir_arquivo tem de ler e
+exportar um PDF sintético pequeno e um OFX, para que uma mudança no
+formato do Consolidado não deixe o benchmark quebrado sem ninguém ver.
+"""
+
+from benchmark import sinteticos
+from benchmark.executar import medir_arquivo
+
+
+def test_medir_arquivo_pdf(tmp_path):
+    caminho = str(tmp_path / "bb_layout1_1p.pdf")
+    esperado = sinteticos.gerar_pdf("bb_layout1", 1, caminho)
+    r = medir_arquivo(caminho)
+    assert r["layout_detectado"] == sinteticos.LAYOUT_ESPERADO["bb_layout1"]
+    assert r["transacoes"] == esperado
+    assert r["exportacao_s"] >= 0 and r["total_s"] > 0
+
+
+def test_medir_arquivo_ofx(tmp_path):
+    caminho = str(tmp_path / "ofx_xml_20.ofx")
+    sinteticos.gerar_ofx(20, caminho, sgml=False)
+    r = medir_arquivo(caminho)
+    assert (r["layout_detectado"], r["transacoes"]) == ("ofx", 20)
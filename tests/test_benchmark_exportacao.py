@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+"""
+Fumaça da comparação de exportação (benchmark.exportacao): as duas
+variantes exportam um Consolidado sintético pequeno sem erro.
+"""
+
+import pytest
+
+from benchmark.exportacao import VARIANTES, consolidado_sintetico, medir
+from benchmark import carregar_v41
+
+
+def test_consolidado_sintetico_no_formato_do_v41():
+    df = consolidado_sintetico(2000)
+    assert len(df) == 2000
+    assert list(df.columns) == carregar_v41().CONSOLIDADO_COLUMNS
+
+
+@pytest.mark.parametrize("variante", VARIANTES)
+def test_medir_2000_linhas(variante):
+    r = medir(variante, "xlsxwriter", 2000)
+    assert r["linhas"] == 2000 and r["arquivo_mb"] > 0
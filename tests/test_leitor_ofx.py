@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+"""
+leitor_ofx lendo aos pedaços: o texto de uma tag e as próprias tags podem
+ficar partidos entre dois pedaços (fim = texto.rfind("<") / resto). Com
+pedaços de 1 a 7 bytes o resultado tem de ser o mesmo da leitura inteira.
+"""
+
+import pytest
+
+from extratos_comum.leitor_ofx import EXTRATO, ler_extratos, ler_transacoes
+
+
+SGML = """OFXHEADER:100
+DATA:OFXSGML
+VERSION:102
+ENCODING:USASCII
+CHARSET:1252
+
+<OFX>
+<BANKMSGSRSV1>
+<STMTTRNRS>
+<STMTRS>
+<CURDEF>BRL
+<BANKACCTFROM>
+<BANKID>001
+<BRANCHID>1234
+<ACCTID>111-1
+<ACCTTYPE>CHECKING
+</BANKACCTFROM>
+<BANKTRANLIST>
+<DTSTART>20240101
+<DTEND>20240131
+<STMTTRN>
+<TRNTYPE>DEBIT
+<DTPOSTED>20240105120000[-3:BRT]
+<TRNAMT>-10.00
+<FITID>1
+<MEMO>PAGAMENTO CONCESSIONÁRIA
+</STMTTRN>
+<STMTTRN>
+<TRNTYPE>CREDIT
+<DTPOSTED>20240106
+<TRNAMT>1.234,56
+<FITID>2
+<NAME>TED RECEBIDA
+<MEMO>AÇÃO
+<MEMO>segunda ocorrência, ignorada
+</STMTTRN>
+</BANKTRANLIST>
+<LEDGERBAL>
+<BALAMT>1500.00
+<DTASOF>20240131
+</LEDGERBAL>
+<AVAILBAL>
+<BALAMT>1400.00
+<DTASOF>20240131
+</AVAILBAL>
+</STMTRS>
+</STMTTRNRS>
+<STMTTRNRS>
+<STMTRS>
+<CURDEF>BRL
+<BANKACCTFROM>
+<BANKID>001
+<ACCTID>222-2
+</BANKACCTFROM>
+<BANKTRANLIST>
+<STMTTRN>
+<DTPOSTED>20240107
+<TRNAMT>-5.00
+<FITID>1
+</STMTTRN>
+</BANKTRANLIST>
+<LEDGERBAL>
+<BALAMT>-30.50
+<DTASOF>20240131
+</LEDGERBAL>
+</STMTRS>
+</STMTTRNRS>
+</BANKMSGSRSV1>
+<CREDITCARDMSGSRSV1>
+<CCSTMTTRNRS>
+<CCSTMTRS>
+<CCACCTFROM>
+<ACCTID>4444
+</CCACCTFROM>
+<BANKTRANLIST>
+<STMTTRN>
+<DTPOSTED>20240110
+<TRNAMT>-99.90
+<MEMO>LOJA
+</STMTTRN>
+<STMTTRN>
+<DTPOSTED>20240111
+<TRNAMT>-1.00
+<MEMO>sem fechamento no fim do arquivo
+"""
+
+XML = """<?xml version="1.0" encoding="UTF-8"?>
+<?OFX OFXHEADER="200" VERSION="211"?>
+<OFX><BANKMSGSRSV1>
+<STMTTRNRS><STMTRS><CURDEF>BRL</CURDEF>
+<BANKACCTFROM><BANKID>341</BANKID><BRANCHID>0001</BRANCHID><ACCTID>12345-6</ACCTID></BANKACCTFROM>
+<BANKTRANLIST><DTSTART>20240101</DTSTART><DTEND>20240131</DTEND>
+<STMTTRN><TRNTYPE>DEBIT</TRNTYPE><DTPOSTED>20240102</DTPOSTED><TRNAMT>-1.50</TRNAMT>
+<FITID>A1</FITID><MEMO>PIX SÃO JOSÉ</MEMO></STMTTRN>
+<STMTTRN><TRNTYPE>CREDIT</TRNTYPE><DTPOSTED>20240103</DTPOSTED><TRNAMT>2.50</TRNAMT>
+<FITID>A2</FITID><MEMO>€ crédito</MEMO></STMTTRN>
+</BANKTRANLIST>
+<LEDGERBAL><BALAMT>10.00</BALAMT><DTASOF>20240131</DTASOF></LEDGERBAL>
+</STMTRS></STMTTRNRS>
+<STMTTRNRS><STMTRS><CURDEF>BRL</CURDEF>
+<BANKACCTFROM><BANKID>341</BANKID><ACCTID>99999-9</ACCTID></BANKACCTFROM>
+<BANKTRANLIST>
+<STMTTRN><DTPOSTED>20240104</DTPOSTED><TRNAMT>-3.00</TRNAMT><FITID>A1</FITID></STMTTRN>
+</BANKTRANLIST>
+<LEDGERBAL><BALAMT>-3.00</BALAMT><DTASOF>20240131</DTASOF></LEDGERBAL>
+</STMTRS></STMTTRNRS>
+</BANKMSGSRSV1></OFX>
+"""
+
+
+def _resumo(caminho, tamanho):
+    out = []
+    for extrato, trns in ler_extratos(caminho, tamanho=tamanho):
+        out.append((extrato, [{k: v for k, v in t.items() if k != EXTRATO} for t in trns]))
+    return out
+
+
+def _arquivo(pasta, texto, encoding):
+    caminho = pasta / "extrato.ofx"
+    caminho.write_bytes(texto.encode(encoding))
+    return caminho
+
+
+@pytest.mark.parametrize("texto, encoding", [(SGML, "cp1252"), (XML, "utf-8")], ids=["sgml", "xml"])
+@pytest.mark.parametrize("tamanho", range(1, 8))
+def test_pedacos_pequenos_iguais_a_leitura_inteira(tmp_path, texto, encoding, tamanho):
+    caminho = _arquivo(tmp_path, texto, encoding)
+    inteiro = _resumo(caminho, caminho.stat().st_size)
+    assert _resumo(caminho, tamanho) == inteiro
+    assert [t for t in ler_transacoes(caminho, tamanho=tamanho)] == [t for _, ts in ler_extratos(caminho) for t in ts]
+
+
+def test_extratos_sgml(tmp_path):
+    extratos = _resumo(_arquivo(tmp_path, SGML, "cp1252"), 3)
+    assert [(e["TIPO"], e["ACCTID"].strip(), len(ts)) for e, ts in extratos] == [
+        ("STMTRS", "111-1", 2), ("STMTRS", "222-2", 1), ("CCSTMTRS", "4444", 1),
+    ]
+    primeiro, trns = extratos[0]
+    assert primeiro["BANKID"].strip() == "001" and primeiro["BRANCHID"].strip() == "1234"
+    assert primeiro["LEDGERBAL.BALAMT"].strip() == "1500.00"
+    assert primeiro["AVAILBAL.BALAMT"].strip() == "1400.00"
+    assert extratos[1][0]["LEDGERBAL.BALAMT"].strip() == "-30.50"
+    # a primeira ocorrência da tag vale; o bloco sem </STMTTRN> no fim fica de fora
+    assert trns[0]["MEMO"].strip() == "PAGAMENTO CONCESSIONÁRIA"
+    assert trns[1]["MEMO"].strip() == "AÇÃO"
+    assert trns[1]["TRNAMT"].strip() == "1.234,56"
+
+
+def test_extratos_xml(tmp_path):
+    extratos = _resumo(_arquivo(tmp_path, XML, "utf-8"), 2)
+    assert [(e["ACCTID"], e.get("LEDGERBAL.BALAMT"), len(ts)) for e, ts in extratos] == [
+        ("12345-6", "10.00", 2), ("99999-9", "-3.00", 1),
+    ]
+    trns = extratos[0][1]
+    # caracteres de vários bytes partidos entre pedaços saem inteiros
+    assert [t["MEMO"] for t in trns] == ["PIX SÃO JOSÉ", "€ crédito"]
+
+
+def test_cabecalho_utf8_com_corpo_cp1252(tmp_path):
+    # o cabeçalho diz UTF-8, mas o banco gravou o corpo em cp1252: nenhuma letra some
+    texto = SGML.replace("ENCODING:USASCII\nCHARSET:1252", "ENCODING:UTF-8\nCHARSET:NONE")
+    caminho = _arquivo(tmp_path, texto, "cp1252")
+    for tamanho in (1, 2, 3, caminho.stat().st_size):
+        avisos = []
+        trns = list(ler_transacoes(caminho, tamanho=tamanho, avisos=avisos))
+        assert [t["MEMO"].strip() for t in trns[:2]] == ["PAGAMENTO CONCESSIONÁRIA", "AÇÃO"]
+        assert len(avisos) == 1 and "utf-8" in avisos[0]
+
+
+def test_utf8_valido_sem_aviso(tmp_path):
+    avisos = []
+    list(ler_transacoes(_arquivo(tmp_path, XML, "utf-8"), tamanho=3, avisos=avisos))
+    assert avisos == []
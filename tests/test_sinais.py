@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""resolver_sinais (meet-in-the-middle) contra a força bruta de itertools.product."""
+
+import random
+from itertools import product
+
+import pytest
+
+from extratos_comum.sinais import resolver_sinais, OK, AMBIGUO, SEM_SOLUCAO, TEMPO_ESGOTADO
+
+
+def forca_bruta(valores, base, alvo, tolerancia):
+    solucoes = [
+        list(tipos) for tipos in product(["C", "D"], repeat=len(valores))
+        if abs(base + sum(v if t == "C" else -v for v, t in zip(valores, tipos)) - alvo) <= tolerancia
+    ]
+    if not solucoes:
+        return None, 0, SEM_SOLUCAO
+    return solucoes[0], len(solucoes), OK if len(solucoes) == 1 else AMBIGUO
+
+
+def test_igual_a_forca_bruta():
+    rnd = random.Random(20240301)
+    for _ in range(600):
+        n = rnd.randint(0, 10)
+        # valores pequenos e repetidos geram empates e blocos ambíguos
+        teto = rnd.choice([5, 50, 100_000])
+        valores = [rnd.randint(1, teto) for _ in range(n)]
+        base = rnd.randint(-teto, teto)
+        if rnd.random() < 0.7:
+            # alvo alcançável por alguma combinação
+            alvo = base + sum(v if rnd.random() < 0.5 else -v for v in valores)
+        else:
+            alvo = rnd.randint(-teto * n - 1, teto * n + 1)
+        tolerancia = rnd.choice([0, 0, 1, 3])
+        esperado = forca_bruta(valores, base, alvo, tolerancia)
+        assert resolver_sinais(valores, base, alvo, tolerancia, limite_s=None) == esperado, \
+            (valores, base, alvo, tolerancia)
+
+
+def test_bloco_vazio():
+    assert resolver_sinais([], 100, 100) == ([], 1, OK)
+    assert resolver_sinais([], 100, 101) == (None, 0, SEM_SOLUCAO)
+
+
+def test_tempo_esgotado():
+    rnd = random.Random(7)
+    # valores distintos e grandes: nenhuma soma se funde e cada metade tem 2^20 somas
+    valores = [rnd.randint(10**9, 10**10) for _ in range(40)]
+    tipos, n, status = resolver_sinais(valores, 0, sum(valores) // 3, tolerancia=1, limite_s=0)
+    assert (tipos, n, status) == (None, 0, TEMPO_ESGOTADO)
+
+
+def test_valor_zero_vale_como_c_e_como_d():
+    assert resolver_sinais([0, 500], 0, -500) == (["C", "D"], 2, AMBIGUO)
+
+
+def test_valor_negativo_levanta_erro():
+    # linha mal lida: o erro diz qual valor, em vez de um SEM_SOLUCAO sem explicação
+    with pytest.raises(ValueError, match="-250"):
+        resolver_sinais([100, -250], 0, 350)
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""centavos_ofx e serie_centavos(..., "ofx"): o caminho escalar e o em lote dão o mesmo valor."""
+
+import pandas as pd
+import pytest
+
+from extratos_comum.valores import centavos_br, centavos_ofx, serie_centavos
+
+
+CASOS_OFX = [
+    ("-1234.56", -123456),
+    ("1.343.00", 134300),
+    ("1.234,56", 123456),
+    ("150", 15000),
+    ("10.005", 1001),
+    ("-10.005", -1001),
+    # notação científica: o float do v41 de antes lia 1E3 como 1000.00, não 13,00
+    ("1E3", 100000),
+    ("-1.5e2", -15000),
+    ("1,5E+2", 15000),
+    ("2.345e1", 2345),
+    ("5E-3", 1),
+    (" 1E3 ", 100000),
+    ("1E999999", None),
+    ("abc", None),
+    ("", None),
+]
+
+
+def _lista(serie):
+    return [None if v is pd.NA else v for v in serie.tolist()]
+
+
+@pytest.mark.parametrize("texto, centavos", CASOS_OFX)
+def test_centavos_ofx(texto, centavos):
+    assert centavos_ofx(texto) == centavos
+
+
+def test_serie_ofx_igual_ao_escalar():
+    textos = [t for t, _ in CASOS_OFX]
+    serie = serie_centavos(textos, "ofx")
+    assert _lista(serie) == [c for _, c in CASOS_OFX]
+
+
+@pytest.mark.parametrize("texto, centavos", [
+    ("R$ 1.234,56", 123456), ("1.234,56-", -123456), ("- 1.234,56", -123456),
+    ("−73,26", -7326), ("+17,05", 1705), ("x", None),
+])
+def test_centavos_br(texto, centavos):
+    assert centavos_br(texto) == centavos
+    assert _lista(serie_centavos([texto], "br")) == [centavos]